@@ -0,0 +1,41 @@
+"""
+gunicorn 設定 - master 預先載入程式並檢查一次資料庫結構，worker fork 後才建立連線
+
+啟動：gunicorn main:app -c gunicorn.conf.py
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# master 匯入一次 main（套件、handler、指令註冊），worker 以 copy-on-write 共用這些記憶體
+preload_app = True
+
+# 重新部署時給 worker 排空佇列的時間（需大於 SHUTDOWN_DRAIN_SECONDS）
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+def on_starting(server):
+    """master 啟動時執行一次資料庫結構升級並預先載入所有 handler，worker 啟動時不再檢查"""
+    from main import prepare_database, SCHEMA_READY_ENV
+    from models.database import engine
+    from handlers.registry import preload
+
+    prepare_database()
+    # 指令 handler 平常第一次使用才匯入；master 先載入，worker fork 後直接共用
+    preload()
+    os.environ[SCHEMA_READY_ENV] = "1"
+    # master 不保留任何連線，避免 fork 後多個 worker 共用同一條連線
+    engine.dispose()
+
+def post_fork(server, worker):
+    """worker fork 後捨棄從 master 繼承的連線池狀態，第一次查詢時才建立自己的連線"""
+    from models.database import engine
+
+    engine.dispose(close=False)
+
+def on_exit(server):
+    """master 結束時（所有 worker 都已停止）刪除頻率限制的共享記憶體區段"""
+    from services.rate_limit import unlink_segment
+
+    unlink_segment()
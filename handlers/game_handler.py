@@ -1,14 +1,16 @@
 """
-遊戲指令處理器 - 處理 /開局 指令
+遊戲指令處理器 - 處理 /開局 與 /設定預設 指令
 """
-from sqlalchemy.orm import sessionmaker
-from models.database import engine
+from models.database import SessionLocal
 from models.game import Game
+from models.player import Player
 from utils.parser import parse_game_command, validate_game_params
+from services.game_lookup import find_seated_game, list_active_games, next_table_code
+from services.session_stats import open_session
+from services.presets import delete_preset, get_preset, save_preset
 from services.line_api import send_text_message
-
-# 建立資料庫會話
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from services.group_lock import lock_group
+from services.invalidation import touch_group
 
 def handle_game_command(event, line_bot_api, command_text, group_id):
     """
@@ -26,40 +28,54 @@ def handle_game_command(event, line_bot_api, command_text, group_id):
         send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
         return
     
-    # 解析指令參數
-    try:
-        params = parse_game_command(command_text)
-        
-        # 驗證參數
-        errors = validate_game_params(params)
-        if errors:
-            error_message = "❌ 參數錯誤：\n" + "\n".join(f"• {error}" for error in errors)
-            send_text_message(line_bot_api, event, error_message)
+    # 解析指令參數；不帶參數時使用群組預設規則
+    params = None
+    if command_text.replace("/開局", "", 1).strip():
+        params = _parse_rules(line_bot_api, event, command_text)
+        if params is None:
             return
-            
-    except Exception as e:
-        send_text_message(line_bot_api, event, f"❌ 指令解析失敗：{str(e)}")
-        return
     
-    # 檢查群組是否已有進行中的對局
+    # 檢查群組內進行中的對局（同一群組可同時開多桌）
     db = SessionLocal()
     try:
-        existing_game = db.query(Game).filter(
-            Game.group_id == group_id,
-            Game.status.in_(["created", "playing"])
-        ).first()
+        lock_group(db, group_id)
+        touch_group(db, group_id)
+        from_preset = False
+        if params is None:
+            params = get_preset(db, group_id)
+            from_preset = params is not None
+            params = params or parse_game_command(command_text)
         
-        if existing_game:
+        seated_game = find_seated_game(db, group_id, event.source.user_id)
+        if seated_game:
             send_text_message(
                 line_bot_api, 
                 event, 
-                f"❌ 此群組已有進行中的對局（ID: {existing_game.id}）\n請先完成當前對局或使用 /結束對局 指令"
+                f"❌ 你目前在 {seated_game.table_code} 桌對局中（ID: {seated_game.id}）\n請先完成當前對局或使用 /結算 指令"
             )
             return
         
-        # 建立新對局
+        # 避免重複開局：已有尚無玩家加入的桌時不再開新桌
+        for existing_game in list_active_games(db, group_id):
+            if existing_game.status == "created" and not db.query(Player).filter(Player.game_id == existing_game.id).count():
+                send_text_message(
+                    line_bot_api, 
+                    event, 
+                    f"❌ {existing_game.table_code} 桌尚無玩家加入\n請先使用 `/加入 #{existing_game.table_code}` 加入該桌"
+                )
+                return
+        
+        table_code = next_table_code(db, group_id)
+        if not table_code:
+            send_text_message(line_bot_api, event, "❌ 此群組同時進行的對局已達上限，請先結算其他桌")
+            return
+        
+        # 建立新對局，歸入群組目前的聚會場次
+        session = open_session(db, group_id)
         new_game = Game(
             group_id=group_id,
+            table_code=table_code,
+            session_id=session.id,
             mode=params["mode"],
             per_point=params["per_point"],
             base_score=params["base_score"],
@@ -73,10 +89,87 @@ def handle_game_command(event, line_bot_api, command_text, group_id):
         
         # 發送成功訊息
         success_message = new_game.get_summary_text()
+        if from_preset:
+            success_message += "\n\n📌 已套用群組預設規則（/設定預設 可修改）"
         send_text_message(line_bot_api, event, success_message)
         
     except Exception as e:
         db.rollback()
         send_text_message(line_bot_api, event, f"❌ 建立對局失敗：{str(e)}")
+    finally:
+        db.close()
+
+def _parse_rules(line_bot_api, event, command_text):
+    """解析並驗證開局規則，失敗時回覆錯誤訊息並回傳 None"""
+    try:
+        params = parse_game_command(command_text)
+        
+        # 驗證參數
+        errors = validate_game_params(params)
+        if errors:
+            error_message = "❌ 參數錯誤：\n" + "\n".join(f"• {error}" for error in errors)
+            send_text_message(line_bot_api, event, error_message)
+            return None
+            
+    except Exception as e:
+        send_text_message(line_bot_api, event, f"❌ 指令解析失敗：{str(e)}")
+        return None
+    return params
+
+def _rules_text(params):
+    """預設規則摘要"""
+    collect_text = "收莊錢" if params["collect_money"] else "不收莊錢"
+    return f"{params['mode']} 每台{params['per_point']} 底{params['base_score']} {collect_text}"
+
+def handle_preset_command(event, line_bot_api, command_text, group_id):
+    """
+    處理 /設定預設 指令 - 儲存群組預設開局規則
+
+    Args:
+        command_text: 例如 "/設定預設 台麻 每台10 底30 收莊錢"、"/設定預設"（查看）、"/設定預設 清除"
+    """
+    
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+    
+    args = command_text.replace("/設定預設", "", 1).strip()
+    params = None
+    if args and args != "清除":
+        params = _parse_rules(line_bot_api, event, args)
+        if params is None:
+            return
+    
+    db = SessionLocal()
+    try:
+        if not args:
+            # 只查看：讀快取，不加群組鎖也不遞增版本號
+            preset = get_preset(db, group_id)
+            if preset is None:
+                message = "📌 此群組尚未設定預設規則\n\n💡 範例：/設定預設 台麻 每台10 底30 收莊錢"
+            else:
+                message = f"📌 群組預設規則：{_rules_text(preset)}\n\n💡 直接輸入 /開局 即可套用"
+            send_text_message(line_bot_api, event, message)
+            return
+        
+        # 儲存與清除才需要群組鎖；save_preset／delete_preset 只遞增預設規則的失效鍵
+        lock_group(db, group_id)
+        if params is None:
+            delete_preset(db, group_id)
+            db.commit()
+            send_text_message(line_bot_api, event, "✅ 已清除群組預設規則")
+            return
+        
+        save_preset(db, group_id, params, event.source.user_id)
+        db.commit()
+        send_text_message(
+            line_bot_api,
+            event,
+            f"✅ 已設定群組預設規則：{_rules_text(params)}\n\n💡 之後直接輸入 /開局 即可套用"
+        )
+        
+    except Exception as e:
+        db.rollback()
+        send_text_message(line_bot_api, event, f"❌ 設定預設規則失敗：{str(e)}")
     finally:
         db.close()
\ No newline at end of file
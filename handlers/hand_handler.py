@@ -0,0 +1,323 @@
+"""
+胡牌記錄與結算處理器 - 處理 /胡、/流局 與 /結算 指令
+"""
+from datetime import datetime, timezone
+from sqlalchemy import func, update
+
+from models.database import SessionLocal
+from models.player import Player
+from models.hand import Hand
+from models.user import User
+from services.dealer import dealer_money, round_label, seat_wind, unpack_round_state
+from services.event_store import append_event
+from services.game_lookup import find_active_game, release_seats, AmbiguousTableError
+from services.scoring import calculate_tai, compute_payments
+from services.leaderboard import record_game_buckets
+from services.hand_index import index_hands
+from services.ledger import game_totals, post_game
+from services.percentile import record_net_amounts
+from services.rating import apply_game_rating
+from services.session_stats import record_game_totals
+from services.user_stats import apply_game_stats
+from utils.parser import parse_win_command
+from utils.money import format_amount
+from utils.tiles import format_tiles
+from services.line_api import send_text_message
+from services.group_lock import lock_group
+from services.invalidation import touch_group
+
+def handle_win_command(event, line_bot_api, command_text, group_id, table_code=None):
+    """
+    處理 /胡 指令 - 依牌面自動計算台數並結算本手
+
+    Args:
+        event: LINE 事件物件
+        line_bot_api: LINE Bot API 實例
+        command_text: 完整指令文字，例如 "/胡 123m456m789p東東東11s 碰555z 吃345s 自摸"
+        group_id: LINE 群組 ID
+    """
+
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+
+    user_id = event.source.user_id
+
+    try:
+        params = parse_win_command(command_text)
+    except ValueError as e:
+        send_text_message(
+            line_bot_api,
+            event,
+            f"❌ 指令解析失敗：{str(e)}\n\n💡 範例：/胡 123m456m789p東東東11s 碰555z 吃345s 自摸"
+        )
+        return
+
+    db = SessionLocal()
+    try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
+        try:
+            current_game = find_active_game(db, group_id, user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
+
+        if not current_game:
+            send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
+            return
+
+        if current_game.status != "playing":
+            send_text_message(line_bot_api, event, "❌ 遊戲尚未開始，請先完成選風與設定莊家")
+            return
+
+        players = db.query(Player).filter(
+            Player.game_id == current_game.id
+        ).order_by(Player.seat_number).all()
+
+        winner = next((p for p in players if p.line_user_id == user_id), None)
+        if not winner:
+            send_text_message(line_bot_api, event, "❌ 你尚未加入此局遊戲")
+            return
+
+        loser = None
+        if params["loser_nickname"]:
+            loser = next((p for p in players if p.nickname == params["loser_nickname"]), None)
+            if not loser:
+                send_text_message(line_bot_api, event, f"❌ 找不到玩家「{params['loser_nickname']}」")
+                return
+            if loser.id == winner.id:
+                send_text_message(line_bot_api, event, "❌ 放槍玩家不可以是自己")
+                return
+
+        dealer = next((p for p in players if p.is_dealer == "yes"), None)
+        round_state = current_game.round_state or 0
+        current_round = unpack_round_state(round_state)
+
+        try:
+            result = calculate_tai(
+                params["concealed"],
+                exposed=params["exposed"],
+                flowers=params["flowers"],
+                self_drawn=params["self_drawn"],
+                seat_wind=seat_wind(round_state, winner.wind_position),
+                round_wind=current_round.round_wind if current_round else 0,
+                dealer_streak=current_round.streak if current_round else 0,
+                kong_draw=params["kong_draw"],
+                last_tile=params["last_tile"]
+            )
+        except ValueError as e:
+            send_text_message(line_bot_api, event, f"❌ 台數計算失敗：{str(e)}")
+            return
+
+        # 不收莊錢的對局：莊家與連莊台不計
+        if not current_game.collect_money:
+            result = result._replace(dealer_tai=0, dealer_patterns=())
+
+        deltas = compute_payments(
+            current_game.per_point,
+            current_game.base_score,
+            result,
+            winner.id,
+            loser.id if loser else None,
+            [p.id for p in players],
+            dealer.id if dealer else None
+        )
+
+        hand_number = db.query(Hand).filter(Hand.game_id == current_game.id).count() + 1
+
+        # 記錄胡牌事件（同時更新玩家分數並建立胡牌記錄）
+        append_event(db, current_game, "hand", {
+            "hand_number": hand_number,
+            "winner": winner.line_user_id,
+            "nickname": winner.nickname,
+            "loser": loser.line_user_id if loser else None,
+            "dealer": dealer.line_user_id if dealer else None,
+            "tai": result.tai,
+            "dealer_tai": result.dealer_tai,
+            "pattern_mask": result.pattern_mask,
+            "tiles": format_tiles(params["concealed"]),
+            "deltas": {p.line_user_id: deltas[p.id] for p in players}
+        })
+        db.commit()
+
+        # 生成結算訊息
+        win_type = "自摸" if params["self_drawn"] else f"放槍：{loser.nickname}"
+        pattern_text = "、".join(f"{name} {tai}台" for name, tai in result.patterns) or "無台型（只算底）"
+
+        hand_message = f"""🀄 第 {hand_number} 手：{winner.nickname} 胡牌（{win_type}）
+
+📋 台型：{pattern_text}
+🔢 合計：{result.tai} 台"""
+
+        if dealer and result.dealer_tai and (dealer.id == winner.id or loser is None or dealer.id == loser.id):
+            dealer_text = "、".join(f"{name} {tai}台" for name, tai in result.dealer_patterns)
+            money = dealer_money(current_game.per_point, round_state, current_game.collect_money)
+            hand_message += f"\n👑 莊錢：{dealer_text}，共 {money} 元（{dealer.nickname}）"
+
+        hand_message += "\n\n💰 本手輸贏："
+        for p in players:
+            if deltas[p.id]:
+                hand_message += f"\n{p.nickname}: {deltas[p.id]:+d} 元"
+
+        hand_message += "\n\n📊 目前分數："
+        for p in players:
+            hand_message += f"\n{p.seat_number}號 {p.nickname}: {p.score:+d} 元"
+
+        hand_message += _next_hand_text(current_game, players)
+
+        send_text_message(line_bot_api, event, hand_message)
+
+    except Exception as e:
+        db.rollback()
+        send_text_message(line_bot_api, event, f"❌ 記錄胡牌失敗：{str(e)}")
+    finally:
+        db.close()
+
+def _next_hand_text(game, players):
+    """產生下一手的圈風與莊家提示"""
+    new_dealer = next((p for p in players if p.is_dealer == "yes"), None)
+    text = f"\n\n🀄 下一手：{round_label(game.round_state)}"
+    if new_dealer:
+        text += f"，莊家：{new_dealer.nickname}"
+
+    current_round = unpack_round_state(game.round_state)
+    if current_round and current_round.completed:
+        text += "\n🏁 四圈已打完，請輸入 /結算 結束對局"
+    return text
+
+def handle_draw_command(event, line_bot_api, group_id, table_code=None):
+    """
+    處理 /流局 指令 - 記錄流局，莊家連莊
+    """
+
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+
+    user_id = event.source.user_id
+
+    db = SessionLocal()
+    try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
+        try:
+            current_game = find_active_game(db, group_id, user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
+
+        if not current_game:
+            send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
+            return
+
+        if current_game.status != "playing":
+            send_text_message(line_bot_api, event, "❌ 遊戲尚未開始，請先完成選風與設定莊家")
+            return
+
+        players = db.query(Player).filter(
+            Player.game_id == current_game.id
+        ).order_by(Player.seat_number).all()
+
+        player = next((p for p in players if p.line_user_id == user_id), None)
+        if not player:
+            send_text_message(line_bot_api, event, "❌ 你尚未加入此局遊戲")
+            return
+
+        append_event(db, current_game, "draw", {"line_user_id": user_id, "nickname": player.nickname})
+        db.commit()
+
+        send_text_message(line_bot_api, event, "🌊 流局，莊家連莊" + _next_hand_text(current_game, players))
+
+    except Exception as e:
+        db.rollback()
+        send_text_message(line_bot_api, event, f"❌ 記錄流局失敗：{str(e)}")
+    finally:
+        db.close()
+
+def handle_settle_command(event, line_bot_api, group_id, table_code=None):
+    """
+    處理 /結算 指令 - 結束對局並寫入個人統計
+    """
+
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+
+    user_id = event.source.user_id
+
+    db = SessionLocal()
+    try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
+        try:
+            current_game = find_active_game(db, group_id, user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
+
+        if not current_game:
+            send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
+            return
+
+        players = db.query(Player).filter(
+            Player.game_id == current_game.id
+        ).order_by(Player.score.desc(), Player.seat_number).all()
+
+        if not any(p.line_user_id == user_id for p in players):
+            send_text_message(line_bot_api, event, "❌ 只有本局玩家可以結算")
+            return
+
+        # 尚未開始的對局直接關閉，不列入統計
+        was_playing = current_game.status == "playing"
+        current_game.status = "finished"
+        current_game.finished_at = datetime.now(timezone.utc)
+        release_seats(db, current_game)
+
+        hands = []
+        if was_playing:
+            hands = db.query(Hand).filter(Hand.game_id == current_game.id).all()
+
+            # 同一位玩家可能同時在別的群組結算，以單一 UPDATE 原地累加
+            db.execute(
+                update(User)
+                .where(User.line_user_id.in_(sorted(p.line_user_id for p in players)))
+                .values(total_games=func.coalesce(User.total_games, 0) + 1)
+                .execution_options(synchronize_session=False)
+            )
+
+            # 每一手寫成一批帳本分錄，並累加個人收支彙總
+            balances = post_game(db, current_game, players)
+            record_net_amounts(db, [b.net_amount for b in balances.values()])
+            index_hands(db, players, hands)
+
+            apply_game_stats(db, current_game, players, hands)
+            apply_game_rating(db, players)
+            record_game_totals(db, current_game, players)
+            record_game_buckets(db, current_game, players)
+
+        db.commit()
+
+        if not was_playing:
+            send_text_message(line_bot_api, event, "✅ 對局已取消（尚未開始，不列入統計）")
+            return
+
+        totals = game_totals(db, current_game.id)
+        players.sort(key=lambda p: (-totals.get(p.line_user_id, 0), p.seat_number))
+
+        settle_message = f"""🏁 對局結算（共 {len(hands)} 手）
+
+"""
+        for i, p in enumerate(players, 1):
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else "📊"
+            settle_message += f"{medal} {p.nickname}: {format_amount(totals.get(p.line_user_id, 0), signed=True)} 元\n"
+
+        settle_message += "\n💡 使用 /今日戰績 查看本場累計，/我的統計 查看個人戰績"
+
+        send_text_message(line_bot_api, event, settle_message)
+
+    except Exception as e:
+        db.rollback()
+        send_text_message(line_bot_api, event, f"❌ 結算失敗：{str(e)}")
+    finally:
+        db.close()
@@ -0,0 +1,119 @@
+"""
+撤銷與重做處理器 - 處理 /撤銷 與 /重做 指令
+"""
+from models.database import SessionLocal
+from models.player import Player
+from services.event_store import undo_last_event, redo_event, describe_event
+from services.game_lookup import find_active_game, AmbiguousTableError
+from services.line_api import send_text_message
+from services.group_lock import lock_group
+from services.invalidation import touch_group
+
+def _format_players(db, game):
+    """產生目前玩家與分數列表"""
+    players = db.query(Player).filter(
+        Player.game_id == game.id
+    ).order_by(Player.seat_number).all()
+
+    if not players:
+        return "📝 目前無玩家"
+
+    lines = []
+    for p in players:
+        wind_info = f" ({p.wind_position}風)" if p.wind_position else ""
+        dealer_info = " 👑" if p.is_dealer == "yes" else ""
+        score_info = f" {p.score:+d} 元" if game.status == "playing" else ""
+        lines.append(f"{p.seat_number}號: {p.nickname}{wind_info}{dealer_info}{score_info}")
+    return "\n".join(lines)
+
+def handle_undo_command(event, line_bot_api, group_id, table_code=None):
+    """
+    處理 /撤銷 指令 - 撤銷對局的最後一個動作
+    """
+
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+
+    db = SessionLocal()
+    try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
+        try:
+            current_game = find_active_game(db, group_id, event.source.user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
+
+        if not current_game:
+            send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
+            return
+
+        undone = undo_last_event(db, current_game)
+        if not undone:
+            send_text_message(line_bot_api, event, "❌ 沒有可以撤銷的動作")
+            return
+
+        db.commit()
+
+        send_text_message(
+            line_bot_api,
+            event,
+            f"""↩️ 已撤銷：{describe_event(*undone)}
+
+📋 目前狀態：
+{_format_players(db, current_game)}
+
+💡 輸入 /重做 可以恢復剛才撤銷的動作"""
+        )
+
+    except Exception as e:
+        db.rollback()
+        send_text_message(line_bot_api, event, f"❌ 撤銷失敗：{str(e)}")
+    finally:
+        db.close()
+
+def handle_redo_command(event, line_bot_api, group_id, table_code=None):
+    """
+    處理 /重做 指令 - 恢復最近一次撤銷的動作
+    """
+
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+
+    db = SessionLocal()
+    try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
+        try:
+            current_game = find_active_game(db, group_id, event.source.user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
+
+        if not current_game:
+            send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
+            return
+
+        redone = redo_event(db, current_game)
+        if not redone:
+            send_text_message(line_bot_api, event, "❌ 沒有可以重做的動作")
+            return
+
+        db.commit()
+
+        send_text_message(
+            line_bot_api,
+            event,
+            f"""↪️ 已重做：{describe_event(*redone)}
+
+📋 目前狀態：
+{_format_players(db, current_game)}"""
+        )
+
+    except Exception as e:
+        db.rollback()
+        send_text_message(line_bot_api, event, f"❌ 重做失敗：{str(e)}")
+    finally:
+        db.close()
@@ -1,19 +1,21 @@
 """
 玩家加入指令處理器 - 處理 /加入 指令
 """
-from sqlalchemy.orm import sessionmaker
-from models.database import engine
-from models.game import Game
+from models.database import SessionLocal
 from models.player import Player
 from models.user import User
 from handlers.user_handler import get_or_create_user
+from services.event_store import append_event
 from utils.parser import parse_join_command
+from services.game_lookup import (
+    find_active_game, find_game_by_table, find_seated_game, list_active_games, AmbiguousTableError
+)
+from services.game_view import count_players, load_players
 from services.line_api import send_text_message, send_message_with_quick_reply, create_wind_position_quick_reply
+from services.group_lock import lock_group
+from services.invalidation import touch_group
 
-# 建立資料庫會話
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def handle_join_command(event, line_bot_api, command_text, group_id):
+def handle_join_command(event, line_bot_api, command_text, group_id, table_code=None):
     """
     處理 /加入 指令
     
@@ -84,11 +86,33 @@ def handle_join_command(event, line_bot_api, command_text, group_id):
     
     db = SessionLocal()
     try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
+        # 檢查是否已在此群組的某一桌入座
+        seated_game = find_seated_game(db, group_id, user_id)
+        if seated_game:
+            send_text_message(
+                line_bot_api, 
+                event, 
+                f"❌ 你已經加入 {seated_game.table_code} 桌了！\n💡 如需換桌請先使用 /退出"
+            )
+            return
+        
         # 檢查是否有進行中的對局
-        current_game = db.query(Game).filter(
-            Game.group_id == group_id,
-            Game.status.in_(["created", "playing"])
-        ).first()
+        try:
+            if table_code:
+                current_game = find_game_by_table(db, group_id, table_code)
+            else:
+                # 未指定桌號時，加入唯一一桌尚未開始且未滿的對局
+                waiting = [g for g in list_active_games(db, group_id) if g.status == "created"]
+                player_counts = count_players(db, [g.id for g in waiting])
+                open_games = [g for g in waiting if player_counts.get(g.id, 0) < 4]
+                if len(open_games) > 1:
+                    raise AmbiguousTableError([g.table_code for g in open_games])
+                current_game = open_games[0] if open_games else find_active_game(db, group_id)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
         
         if not current_game:
             send_text_message(
@@ -137,26 +161,20 @@ def handle_join_command(event, line_bot_api, command_text, group_id):
             )
             return
         
-        # 建立新玩家
-        new_player = Player(
-            game_id=current_game.id,
-            line_user_id=user_id,
-            nickname=nickname,
-            seat_number=player_count + 1
-        )
-        
-        db.add(new_player)
+        # 記錄加入事件（同時建立玩家資料）
+        game_id, game_table_code = current_game.id, current_game.table_code
+        state = append_event(db, current_game, "join", {"line_user_id": user_id, "nickname": nickname})
         db.commit()
-        db.refresh(new_player)
         
         # 重新計算目前玩家數
-        updated_player_count = db.query(Player).filter(Player.game_id == current_game.id).count()
+        updated_player_count = len(state["players"])
+        seat_number = state["players"][user_id]["seat_number"]
         
         # 產生成功訊息
-        success_message = f"""✅ 加入成功！
+        success_message = f"""✅ 加入成功！（{game_table_code} 桌）
 
 🎯 玩家：{nickname} ({nickname_source})
-🎲 座位：{new_player.seat_number} 號
+🎲 座位：{seat_number} 號
 👥 目前人數：{updated_player_count}/4 人
 
 """
@@ -167,8 +185,8 @@ def handle_join_command(event, line_bot_api, command_text, group_id):
         
         # 如果滿 4 人，提示可以選擇風位
         if updated_player_count == 4:
-            # 取得所有玩家資訊
-            all_players = db.query(Player).filter(Player.game_id == current_game.id).order_by(Player.seat_number).all()
+            # 取得所有玩家資訊（唯讀檢視，不載入 ORM 實體）
+            all_players = load_players(db, game_id)
             player_list = "\n".join([f"{p.seat_number}號: {p.nickname}" for p in all_players])
             
             success_message += f"""🎉 人數已滿，可以開始遊戲！
@@ -183,7 +201,7 @@ def handle_join_command(event, line_bot_api, command_text, group_id):
             send_message_with_quick_reply(line_bot_api, event, success_message, wind_buttons)
         else:
             # 顯示目前玩家列表
-            current_players = db.query(Player).filter(Player.game_id == current_game.id).order_by(Player.seat_number).all()
+            current_players = load_players(db, game_id)
             player_list = "\n".join([f"{p.seat_number}號: {p.nickname}" for p in current_players])
             
             success_message += f"""👥 目前玩家：
@@ -199,7 +217,22 @@ def handle_join_command(event, line_bot_api, command_text, group_id):
     finally:
         db.close()
 
-def handle_wind_selection(event, line_bot_api, wind, group_id):
+def handle_wind_command(event, line_bot_api, command_text, group_id, table_code=None):
+    """
+    處理 /選風 指令 - 檢查風位後交給 handle_wind_selection
+    
+    Args:
+        command_text: 完整指令文字（例如 /選風 東）
+    """
+    
+    wind = command_text.replace('/選風', '').strip()
+    if wind not in ['東', '南', '西', '北']:
+        send_text_message(line_bot_api, event, "❌ 請選擇正確的風位：東、南、西、北")
+        return
+    
+    handle_wind_selection(event, line_bot_api, wind, group_id, table_code)
+
+def handle_wind_selection(event, line_bot_api, wind, group_id, table_code=None):
     """
     處理風位選擇
     
@@ -218,11 +251,14 @@ def handle_wind_selection(event, line_bot_api, wind, group_id):
     
     db = SessionLocal()
     try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
         # 檢查是否有進行中的對局
-        current_game = db.query(Game).filter(
-            Game.group_id == group_id,
-            Game.status.in_(["created", "playing"])
-        ).first()
+        try:
+            current_game = find_active_game(db, group_id, user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
         
         if not current_game:
             send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
@@ -252,8 +288,8 @@ def handle_wind_selection(event, line_bot_api, wind, group_id):
             )
             return
         
-        # 更新玩家風位
-        player.wind_position = wind
+        # 記錄選風事件
+        append_event(db, current_game, "wind", {"line_user_id": user_id, "nickname": player.nickname, "wind": wind})
         db.commit()
         
         # 檢查是否所有玩家都已選擇風位
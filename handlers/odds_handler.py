@@ -0,0 +1,73 @@
+"""
+胡牌機率處理器 - 處理 /勝率 指令
+"""
+import logging
+
+from utils.parser import parse_odds_command
+from utils.tiles import format_tiles, tile_name, to_counts
+from services.simulator import start_simulation, useful_tiles
+from services.line_api import send_text_message
+
+logger = logging.getLogger(__name__)
+
+def _format_result(params, result):
+    """產生模擬結果訊息"""
+    hand = params["hand"]
+    if result.shanten <= 0:
+        stage = "聽牌" if result.shanten == 0 else "已胡牌"
+    else:
+        stage = f"{result.shanten} 向聽"
+    useful = useful_tiles(to_counts(hand), result.shanten)
+    useful_text = " ".join(tile_name(tile) for tile in useful) or "無"
+
+    message = f"""🎲 胡牌機率模擬（再摸 {params['draws']} 張）
+
+🀄 手牌：{format_tiles(hand)}
+📐 牌型：{stage}
+✅ 有效牌：{useful_text}（剩 {result.useful_tiles} 張）
+"""
+    if result.trials:
+        rate = result.wins * 100 / result.trials
+        message += f"📊 自摸機率：約 {rate:.1f}%（{result.trials} 次模擬）"
+    else:
+        message += "📊 自摸機率：時間內無法完成模擬"
+    if not result.completed:
+        message += "\n⏱️ 已達時間上限，結果僅供參考"
+    return message
+
+def handle_odds_command(event, line_bot_api, command_text):
+    """
+    處理 /勝率 指令 - 以蒙地卡羅模擬估計 N 張內自摸的機率
+
+    模擬在背景程序池執行，完成後再回覆，不會卡住其他指令。
+
+    Args:
+        event: LINE 事件物件
+        line_bot_api: LINE Bot API 實例
+        command_text: 完整指令文字
+    """
+    try:
+        params = parse_odds_command(command_text)
+    except ValueError as e:
+        send_text_message(
+            line_bot_api,
+            event,
+            f"❌ {e}\n\n💡 範例：/勝率 123m456m789p9s123s45s東 見 999p 摸12"
+        )
+        return
+
+    def reply(result):
+        try:
+            send_text_message(line_bot_api, event, _format_result(params, result))
+        except Exception:
+            # 在模擬程序池的 callback 執行緒裡，沒有呼叫者可以接住例外
+            logger.exception("回覆勝率模擬失敗")
+
+    try:
+        cached = start_simulation(to_counts(params["hand"]), to_counts(params["visible"]), params["draws"], reply)
+    except Exception as e:
+        send_text_message(line_bot_api, event, f"❌ 勝率模擬失敗：{str(e)}")
+        return
+
+    if cached is not None:
+        reply(cached)
@@ -0,0 +1,71 @@
+"""
+牌型查詢處理器 - 處理 /查詢牌型 指令
+"""
+from models.database import SessionLocal
+from models.user import User
+from services.hand_index import (ALL_WINS, PATTERN_CODES, count_pattern, pattern_counts,
+                                 period_since, top_feeders)
+from utils.parser import parse_pattern_query
+from services.line_api import send_text_message
+
+def _nicknames(db, line_user_ids):
+    """取得玩家的有效暱稱"""
+    users = db.query(User).filter(User.line_user_id.in_(line_user_ids)).all()
+    return {u.line_user_id: u.get_effective_nickname() for u in users}
+
+def handle_pattern_query_command(event, line_bot_api, command_text):
+    """
+    處理 /查詢牌型 指令 - 查詢自己胡過的台型次數與最常放槍的對手
+
+    Args:
+        command_text: 例如 "/查詢牌型"、"/查詢牌型 清一色 今年"
+    """
+
+    user_id = event.source.user_id
+
+    try:
+        params = parse_pattern_query(command_text)
+    except ValueError as e:
+        send_text_message(line_bot_api, event, f"❌ {e}\n\n💡 範例：/查詢牌型 清一色 今年")
+        return
+
+    pattern_name = params["pattern"]
+    if pattern_name is not None and pattern_name not in PATTERN_CODES:
+        send_text_message(
+            line_bot_api,
+            event,
+            f"❌ 找不到台型「{pattern_name}」\n\n📋 可查詢的台型：{'、'.join(PATTERN_CODES)}"
+        )
+        return
+
+    db = SessionLocal()
+    try:
+        since = period_since(params["period"])
+        period = params["period"]
+        pattern = PATTERN_CODES[pattern_name] if pattern_name else ALL_WINS
+
+        wins = count_pattern(db, user_id, pattern, since)
+        if pattern_name:
+            message = f"🔍 {period}以「{pattern_name}」胡牌：{wins} 次"
+        else:
+            message = f"🔍 {period}胡牌：{wins} 次"
+            counts = pattern_counts(db, user_id, since)
+            if counts:
+                message += "\n\n📋 台型次數："
+                for name, count in counts:
+                    message += f"\n{name}: {count} 次"
+
+        feeders = top_feeders(db, user_id, pattern, since) if wins else []
+        if feeders:
+            names = _nicknames(db, [loser_id for loser_id, _ in feeders])
+            message += "\n\n💥 最常放槍給你："
+            for loser_id, count in feeders:
+                message += f"\n{names.get(loser_id, '未知玩家')}: {count} 次"
+
+        message += "\n\n💡 只統計已結算的對局"
+        send_text_message(line_bot_api, event, message)
+
+    except Exception as e:
+        send_text_message(line_bot_api, event, f"❌ 查詢牌型失敗：{str(e)}")
+    finally:
+        db.close()
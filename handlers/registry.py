@@ -0,0 +1,92 @@
+"""
+指令註冊表 - 指令文字對應到 handler，handler 模組在第一次收到該指令時才匯入
+
+main 啟動時不必載入所有 handler 與它們用到的資料表模型；
+/設定暱稱、/統計、/排行榜 這類少用的指令，只有真的有人使用時才付出匯入成本。
+gunicorn master 可以呼叫 preload() 預先全部載入，讓 worker 以 copy-on-write 共用。
+"""
+import importlib
+
+class Command:
+    """
+    一個指令
+
+    Args:
+        names: 完全相符的指令文字
+        prefix: 以此開頭即符合（與 names 擇一）
+        target: "模組:函式"
+        args: 接在 event、line_bot_api 之後傳給 handler 的參數名稱（text、group_id 或 table_code）
+    """
+
+    __slots__ = ("names", "prefix", "target", "args", "_handler")
+
+    def __init__(self, target, args=(), names=(), prefix=None):
+        self.names = names
+        self.prefix = prefix
+        self.target = target
+        self.args = args
+        self._handler = None
+
+    def handler(self):
+        """第一次呼叫時匯入 handler 模組，之後直接使用"""
+        if self._handler is None:
+            module_name, function_name = self.target.split(":", 1)
+            self._handler = getattr(importlib.import_module(module_name), function_name)
+        return self._handler
+
+# 前綴指令依序比對；完全相符的指令先查
+COMMANDS = (
+    Command("handlers.game_handler:handle_game_command", ("text", "group_id"), prefix="/開局"),
+    Command("handlers.game_handler:handle_preset_command", ("text", "group_id"), prefix="/設定預設"),
+    Command("handlers.join_handler:handle_join_command", ("text", "group_id", "table_code"), prefix="/加入"),
+    Command("handlers.join_handler:handle_wind_command", ("text", "group_id", "table_code"), prefix="/選風"),
+    Command("handlers.status_handler:handle_status_command", ("group_id", "table_code"), names=("/狀態", "/status", "/查詢")),
+    Command("handlers.status_handler:handle_dealer_command", ("group_id", "table_code"), names=("/我當莊", "/當莊")),
+    Command("handlers.status_handler:handle_quit_command", ("group_id", "table_code"), names=("/退出", "/離開")),
+    Command("handlers.hand_handler:handle_win_command", ("text", "group_id", "table_code"), prefix="/胡"),
+    Command("handlers.hand_handler:handle_draw_command", ("group_id", "table_code"), names=("/流局", "/荒莊")),
+    Command("handlers.hand_handler:handle_settle_command", ("group_id", "table_code"), names=("/結算", "/結束對局")),
+    Command("handlers.history_handler:handle_undo_command", ("group_id", "table_code"), names=("/撤銷", "/undo")),
+    Command("handlers.history_handler:handle_redo_command", ("group_id", "table_code"), names=("/重做", "/redo")),
+    Command("handlers.odds_handler:handle_odds_command", ("text",), prefix="/勝率"),
+    Command("handlers.pattern_handler:handle_pattern_query_command", ("text",), prefix="/查詢牌型"),
+    Command("handlers.session_handler:handle_session_report_command", ("group_id",), names=("/今日戰績", "/今日")),
+    Command("handlers.user_handler:handle_set_nickname_command", ("text",), prefix="/設定暱稱"),
+    Command("handlers.user_handler:handle_my_stats_command", names=("/我的統計", "/統計", "/個人記錄")),
+    Command("handlers.user_handler:handle_nickname_info_command", names=("/暱稱資訊", "/我的暱稱")),
+    Command("handlers.user_handler:handle_top_players_command", ("group_id",), names=("/排行榜", "/排行")),
+    Command("handlers.user_handler:handle_weekly_leaderboard_command", ("group_id",), names=("/週排行", "/本週排行")),
+    Command("handlers.user_handler:handle_monthly_leaderboard_command", ("group_id",), names=("/月排行", "/本月排行")),
+)
+
+_EXACT = {name: command for command in COMMANDS for name in command.names}
+_PREFIXED = tuple(command for command in COMMANDS if command.prefix)
+
+def find_command(text):
+    """指令文字 → Command，不是指令時回傳 None"""
+    command = _EXACT.get(text)
+    if command is not None:
+        return command
+    for command in _PREFIXED:
+        if text.startswith(command.prefix):
+            return command
+    return None
+
+def dispatch(event, line_bot_api, text, group_id=None, table_code=None):
+    """
+    依指令文字呼叫對應的 handler
+
+    Returns:
+        bool: 是否為已註冊的指令
+    """
+    command = find_command(text)
+    if command is None:
+        return False
+    context = {"text": text, "group_id": group_id, "table_code": table_code}
+    command.handler()(event, line_bot_api, *(context[name] for name in command.args))
+    return True
+
+def preload():
+    """匯入所有 handler（gunicorn master 預先載入用）"""
+    for command in COMMANDS:
+        command.handler()
@@ -0,0 +1,56 @@
+"""
+聚會場次處理器 - 處理 /今日戰績 指令
+"""
+from models.database import SessionLocal
+from models.game import Game
+from services.game_lookup import ACTIVE_STATUSES
+from services.session_stats import latest_session, session_standings
+from services.line_api import send_text_message
+
+def handle_session_report_command(event, line_bot_api, group_id):
+    """
+    處理 /今日戰績 指令 - 顯示群組本場聚會各桌、各局的累計輸贏
+    
+    Args:
+        event: LINE 事件物件
+        line_bot_api: LINE Bot API 實例
+        group_id: LINE 群組 ID
+    """
+    
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+    
+    db = SessionLocal()
+    try:
+        session = latest_session(db, group_id)
+        if not session:
+            send_text_message(line_bot_api, event, "📊 此群組尚無場次記錄\n\n💡 使用 /開局 開始今天的第一局")
+            return
+        
+        standings = session_standings(db, session.id)
+        running = db.query(Game.table_code).filter(
+            Game.session_id == session.id,
+            Game.status.in_(ACTIVE_STATUSES)
+        ).order_by(Game.table_code).all()
+        
+        status_text = "進行中" if session.status == "open" else "已結束"
+        report = f"📅 今日戰績（{status_text}，已結算 {session.game_count or 0} 局）\n\n"
+        
+        if standings:
+            for i, row in enumerate(standings, 1):
+                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else "📊"
+                report += f"{medal} {row.nickname}: {row.net_amount:+d} 元（{row.games} 局）\n"
+        else:
+            report += "尚無結算完成的對局\n"
+        
+        if running:
+            codes = "、".join(code for (code,) in running)
+            report += f"\n🀄 進行中：{codes} 桌（結算後計入）"
+        
+        send_text_message(line_bot_api, event, report.rstrip())
+        
+    except Exception as e:
+        send_text_message(line_bot_api, event, f"❌ 查詢今日戰績失敗：{str(e)}")
+    finally:
+        db.close()
@@ -1,16 +1,100 @@
 """
 對局狀態查詢和莊家設定處理器
 """
-from sqlalchemy.orm import sessionmaker
-from models.database import engine
-from models.game import Game
+from models.database import SessionLocal
 from models.player import Player
+from services.dealer import dealer_money, round_label
+from services.event_store import append_event
+from services.game_lookup import find_active_game, AmbiguousTableError
+from services.game_view import count_players, find_active_view, get_active_game, list_active_views, load_players
 from services.line_api import send_text_message
+from services.group_lock import lock_group
+from services.invalidation import touch_group
+from utils.templates import MessageTemplate, render_cached
 
-# 建立資料庫會話
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+STATUS_HEADER = MessageTemplate("status", """📊 對局狀態（{table_code} 桌）
 
-def handle_status_command(event, line_bot_api, group_id):
+🀄 遊戲模式：{mode}
+💰 每台：{per_point} 元
+📉 底台：{base_score} 元
+🏯 收莊錢：{collect_text}
+👥 人數：{player_count}/4 人
+
+""")
+
+STATUS_PLAYER = MessageTemplate("status_player", "{seat_number}號: {nickname}{wind_info}{dealer_info}{score_info}\n")
+
+DEALER_SUMMARY = MessageTemplate("dealer_summary", """🎉 遊戲設定完成！
+
+👑 莊家：{dealer_nickname}
+
+🎮 最終配置：
+{player_info}
+
+🀄 遊戲規則：
+• 模式：{mode}
+• 每台：{per_point} 元
+• 底台：{base_score} 元
+• 收莊錢：{collect_text}
+
+✅ 準備開始遊戲！（{round_text}）
+📝 胡牌請輸入 /胡，流局請輸入 /流局""")
+
+def _tables_overview(db, games):
+    """產生群組內各桌的概況"""
+    overview = f"📊 此群組目前有 {len(games)} 桌進行中\n"
+    player_counts = count_players(db, [game.id for game in games])
+    for game in games:
+        if game.status == "playing":
+            progress = round_label(game.round_state)
+        else:
+            progress = f"等待開始（{player_counts.get(game.id, 0)}/4 人）"
+        overview += f"\n🀄 {game.table_code} 桌：{progress}"
+    overview += f"\n\n💡 使用 `/狀態 #{games[0].table_code}` 查看單桌詳細狀態"
+    return overview
+
+def _status_text(game, players):
+    """產生單桌的狀態訊息"""
+    status_message = STATUS_HEADER.render(
+        table_code=game.table_code,
+        mode=game.mode,
+        per_point=game.per_point,
+        base_score=game.base_score,
+        collect_text="是" if game.collect_money else "否",
+        player_count=len(players),
+    )
+    
+    if not players:
+        return status_message + "📝 尚無玩家加入\n💡 使用 `/加入 暱稱` 指令加入遊戲"
+    
+    status_message += "📋 玩家列表：\n"
+    for player in players:
+        status_message += STATUS_PLAYER.render(
+            seat_number=player.seat_number,
+            nickname=player.nickname,
+            wind_info=f" ({player.wind_position}風)" if player.wind_position else "",
+            dealer_info=" 👑莊家" if player.is_dealer == "yes" else "",
+            score_info=f" {player.score or 0:+d}元" if game.status == "playing" else "",
+        )
+    
+    # 檢查遊戲進度
+    if len(players) < 4:
+        status_message += f"\n⏳ 等待玩家加入（還需 {4 - len(players)} 人）"
+    elif not all(p.wind_position for p in players):
+        unassigned = [p.nickname for p in players if not p.wind_position]
+        status_message += f"\n🎲 等待選擇風位：{', '.join(unassigned)}"
+    elif not any(p.is_dealer == "yes" for p in players):
+        status_message += "\n👑 等待設定莊家（輸入 `/我當莊`）"
+    elif game.status == "playing":
+        status_message += f"\n🀄 目前：{round_label(game.round_state)}"
+        if game.collect_money:
+            money = dealer_money(game.per_point, game.round_state, True)
+            status_message += f"\n👑 莊錢：{money} 元"
+    else:
+        status_message += "\n✅ 準備完成，可以開始遊戲！"
+    return status_message
+
+def handle_status_command(event, line_bot_api, group_id, table_code=None):
     """
     處理 /狀態 指令 - 顯示當前對局狀態
     """
@@ -21,13 +105,15 @@ def handle_status_command(event, line_bot_api, group_id):
     
     db = SessionLocal()
     try:
-        # 檢查是否有進行中的對局
-        current_game = db.query(Game).filter(
-            Game.group_id == group_id,
-            Game.status.in_(["created", "playing"])
-        ).first()
+        # 檢查是否有進行中的對局（唯讀，不載入 ORM 實體）
+        try:
+            found = find_active_view(db, group_id, event.source.user_id, table_code)
+        except AmbiguousTableError:
+            # 多桌進行中且未指定桌號：顯示各桌概況
+            send_text_message(line_bot_api, event, _tables_overview(db, list_active_views(db, group_id)))
+            return
         
-        if not current_game:
+        if not found:
             send_text_message(
                 line_bot_api, 
                 event, 
@@ -35,41 +121,13 @@ def handle_status_command(event, line_bot_api, group_id):
             )
             return
         
-        # 取得所有玩家
-        players = db.query(Player).filter(
-            Player.game_id == current_game.id
-        ).order_by(Player.seat_number).all()
-        
-        # 生成狀態訊息
-        status_message = f"""📊 對局狀態
-
-🀄 遊戲模式：{current_game.mode}
-💰 每台：{current_game.per_point} 元
-📉 底台：{current_game.base_score} 元
-🏯 收莊錢：{'是' if current_game.collect_money else '否'}
-👥 人數：{len(players)}/4 人
-
-"""
+        # 取得對局與所有玩家（群組沒有變動時直接使用快取）
+        active = get_active_game(db, found.id, group_id)
+        current_game, players = active.game, active.players
         
-        if players:
-            status_message += "📋 玩家列表：\n"
-            for player in players:
-                wind_info = f" ({player.wind_position}風)" if player.wind_position else ""
-                dealer_info = " 👑莊家" if player.is_dealer == "yes" else ""
-                status_message += f"{player.seat_number}號: {player.nickname}{wind_info}{dealer_info}\n"
-            
-            # 檢查遊戲進度
-            if len(players) < 4:
-                status_message += f"\n⏳ 等待玩家加入（還需 {4 - len(players)} 人）"
-            elif not all(p.wind_position for p in players):
-                unassigned = [p.nickname for p in players if not p.wind_position]
-                status_message += f"\n🎲 等待選擇風位：{', '.join(unassigned)}"
-            elif not any(p.is_dealer == "yes" for p in players):
-                status_message += "\n👑 等待設定莊家（輸入 `/我當莊`）"
-            else:
-                status_message += "\n✅ 準備完成，可以開始遊戲！"
-        else:
-            status_message += "📝 尚無玩家加入\n💡 使用 `/加入 暱稱` 指令加入遊戲"
+        # 生成狀態訊息（群組沒有變動時直接使用上次渲染的結果）
+        status_message = render_cached(STATUS_HEADER, current_game.id, active.version,
+                                       lambda: _status_text(current_game, players), source=active)
         
         send_text_message(line_bot_api, event, status_message)
         
@@ -78,7 +136,7 @@ def handle_status_command(event, line_bot_api, group_id):
     finally:
         db.close()
 
-def handle_dealer_command(event, line_bot_api, group_id):
+def handle_dealer_command(event, line_bot_api, group_id, table_code=None):
     """
     處理 /我當莊 指令 - 設定莊家
     """
@@ -91,11 +149,14 @@ def handle_dealer_command(event, line_bot_api, group_id):
     
     db = SessionLocal()
     try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
         # 檢查是否有進行中的對局
-        current_game = db.query(Game).filter(
-            Game.group_id == group_id,
-            Game.status.in_(["created", "playing"])
-        ).first()
+        try:
+            current_game = find_active_game(db, group_id, user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
         
         if not current_game:
             send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
@@ -143,14 +204,14 @@ def handle_dealer_command(event, line_bot_api, group_id):
             )
             return
         
-        # 設定莊家
-        player.is_dealer = "yes"
+        # 記錄設定莊家事件（同時將對局狀態改為進行中）
+        game_id, dealer_nickname = current_game.id, player.nickname
+        append_event(db, current_game, "dealer", {"line_user_id": user_id, "nickname": dealer_nickname})
         db.commit()
         
-        # 取得完整遊戲配置
-        all_players = db.query(Player).filter(
-            Player.game_id == current_game.id
-        ).order_by(Player.seat_number).all()
+        # 取得完整遊戲配置（提交後 ORM 實體已過期，改讀唯讀檢視，不再逐一重新載入）
+        active = get_active_game(db, game_id, group_id)
+        current_game, all_players = active.game, active.players
         
         # 生成最終配置訊息
         player_info = []
@@ -159,25 +220,15 @@ def handle_dealer_command(event, line_bot_api, group_id):
             dealer_mark = " 👑" if p.is_dealer == "yes" else ""
             player_info.append(f"{p.seat_number}號: {p.nickname} ({wind_info}){dealer_mark}")
         
-        final_message = f"""🎉 遊戲設定完成！
-
-👑 莊家：{player.nickname}
-
-🎮 最終配置：
-{chr(10).join(player_info)}
-
-🀄 遊戲規則：
-• 模式：{current_game.mode}
-• 每台：{current_game.per_point} 元
-• 底台：{current_game.base_score} 元
-• 收莊錢：{'是' if current_game.collect_money else '否'}
-
-✅ 準備開始遊戲！
-📝 可以開始記錄每一手的輸贏了"""
-        
-        # 更新遊戲狀態為進行中
-        current_game.status = "playing"
-        db.commit()
+        final_message = DEALER_SUMMARY.render(
+            dealer_nickname=dealer_nickname,
+            player_info="\n".join(player_info),
+            mode=current_game.mode,
+            per_point=current_game.per_point,
+            base_score=current_game.base_score,
+            collect_text="是" if current_game.collect_money else "否",
+            round_text=round_label(current_game.round_state),
+        )
         
         send_text_message(line_bot_api, event, final_message)
         
@@ -187,7 +238,7 @@ def handle_dealer_command(event, line_bot_api, group_id):
     finally:
         db.close()
 
-def handle_quit_command(event, line_bot_api, group_id):
+def handle_quit_command(event, line_bot_api, group_id, table_code=None):
     """
     處理 /退出 指令 - 玩家退出對局
     """
@@ -200,11 +251,14 @@ def handle_quit_command(event, line_bot_api, group_id):
     
     db = SessionLocal()
     try:
+        lock_group(db, group_id)
+        touch_group(db, group_id)
         # 檢查是否有進行中的對局
-        current_game = db.query(Game).filter(
-            Game.group_id == group_id,
-            Game.status.in_(["created", "playing"])
-        ).first()
+        try:
+            current_game = find_active_game(db, group_id, user_id, table_code)
+        except AmbiguousTableError as e:
+            send_text_message(line_bot_api, event, f"❌ {e}")
+            return
         
         if not current_game:
             send_text_message(line_bot_api, event, "❌ 目前沒有進行中的對局")
@@ -229,21 +283,13 @@ def handle_quit_command(event, line_bot_api, group_id):
             )
             return
         
-        nickname = player.nickname
+        game_id, nickname = current_game.id, player.nickname
         
-        # 刪除玩家
-        db.delete(player)
+        # 記錄退出事件（同時刪除玩家並重新編號座位）
+        append_event(db, current_game, "quit", {"line_user_id": user_id, "nickname": nickname})
         db.commit()
         
-        # 重新編號剩餘玩家的座位
-        remaining_players = db.query(Player).filter(
-            Player.game_id == current_game.id
-        ).order_by(Player.seat_number).all()
-        
-        for i, p in enumerate(remaining_players, 1):
-            p.seat_number = i
-        
-        db.commit()
+        remaining_players = load_players(db, game_id)
         
         remaining_count = len(remaining_players)
         
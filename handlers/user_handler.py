@@ -1,15 +1,18 @@
 """
 用戶管理處理器 - 處理用戶身份綁定和個人統計
 """
-from sqlalchemy.orm import sessionmaker
-from models.database import engine
+import re
+from models.database import SessionLocal
 from models.user import User
+from models.user_stats import UserStats
+from models.user_rating import UserRating
+from models.user_balance import UserBalance
 from models.game import Game
 from models.player import Player
+from services.leaderboard import MONTHLY, PERIOD_NAMES, WEEKLY, period_start, top_players
+from services.percentile import top_percent
 from services.line_api import send_text_message
-
-# 建立資料庫會話
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from utils.money import format_amount
 
 def get_or_create_user(line_user_id, display_name):
     """
@@ -76,7 +79,6 @@ def handle_set_nickname_command(event, line_bot_api, command_text):
         return
     
     # 清理暱稱（移除特殊字符）
-    import re
     clean_nickname = re.sub(r'[^\w\u4e00-\u9fff\s]', '', nickname).strip()
     
     if not clean_nickname:
@@ -141,8 +143,15 @@ def handle_my_stats_command(event, line_bot_api):
     
     db = SessionLocal()
     try:
-        # 查找用戶
-        user = db.query(User).filter(User.line_user_id == user_id).first()
+        # 查找用戶與累計統計（單一列讀取，不掃描歷史對局）
+        row = db.query(User, UserStats, UserRating, UserBalance).outerjoin(
+            UserStats, UserStats.line_user_id == User.line_user_id
+        ).outerjoin(
+            UserRating, UserRating.line_user_id == User.line_user_id
+        ).outerjoin(
+            UserBalance, UserBalance.line_user_id == User.line_user_id
+        ).filter(User.line_user_id == user_id).first()
+        user, stats, rating, balance = row if row else (None, None, None, None)
         
         if not user:
             send_text_message(
@@ -157,25 +166,25 @@ def handle_my_stats_command(event, line_bot_api):
             )
             return
         
-        # 取得詳細統計
-        stats_message = user.get_stats_summary()
+        # 取得詳細統計與全體玩家排名
+        percent = top_percent(db, balance.net_amount) if balance and user.total_games > 0 else None
+        stats_message = user.get_stats_summary(stats, percent, rating, balance)
         
-        # 如果有參與過遊戲，顯示額外資訊
+        # 如果有參與過遊戲，顯示最近的遊戲記錄（game_id 依建立順序遞增，由索引直接取最後幾筆）
         if user.total_games > 0:
-            # 查詢最近的遊戲記錄
-            recent_games = db.query(Player).filter(
+            recent_games = db.query(
+                Game.created_at, Game.mode, Player.wind_position, Player.is_dealer
+            ).join(Game, Game.id == Player.game_id).filter(
                 Player.line_user_id == user_id
-            ).join(Game).order_by(Game.created_at.desc()).limit(3).all()
+            ).order_by(Player.game_id.desc()).limit(3).all()
             
             if recent_games:
                 stats_message += "\n\n📅 最近 3 局："
-                for i, player in enumerate(recent_games, 1):
-                    game = db.query(Game).filter(Game.id == player.game_id).first()
-                    if game:
-                        date_str = game.created_at.strftime("%m/%d") if game.created_at else "未知"
-                        dealer_mark = "👑" if player.is_dealer == "yes" else ""
-                        wind_info = f"({player.wind_position}風)" if player.wind_position else ""
-                        stats_message += f"\n{i}. {date_str} {game.mode} {wind_info}{dealer_mark}"
+                for i, (created_at, mode, wind_position, is_dealer) in enumerate(recent_games, 1):
+                    date_str = created_at.strftime("%m/%d") if created_at else "未知"
+                    dealer_mark = "👑" if is_dealer == "yes" else ""
+                    wind_info = f"({wind_position}風)" if wind_position else ""
+                    stats_message += f"\n{i}. {date_str} {mode} {wind_info}{dealer_mark}"
         
         send_text_message(line_bot_api, event, stats_message)
         
@@ -247,12 +256,16 @@ def handle_top_players_command(event, line_bot_api, group_id):
             Game.group_id == group_id
         ).distinct().subquery()
         
-        # 取得這些用戶的統計資料，按淨贏取金額排序
-        top_users = db.query(User).filter(
+        # 取得這些用戶的帳本收支彙總，按淨輸贏排序
+        top_users = db.query(User, UserBalance.net_minor, UserRating.rating).join(
+            UserBalance, UserBalance.line_user_id == User.line_user_id
+        ).outerjoin(
+            UserRating, UserRating.line_user_id == User.line_user_id
+        ).filter(
             User.line_user_id.in_(group_players)
         ).filter(
             User.total_games > 0
-        ).order_by(User.net_amount.desc()).limit(10).all()
+        ).order_by(UserBalance.net_minor.desc()).limit(10).all()
         
         if not top_users:
             send_text_message(
@@ -267,12 +280,13 @@ def handle_top_players_command(event, line_bot_api, group_id):
         
         ranking_message = "🏆 群組排行榜（按淨輸贏）\n\n"
         
-        for i, user in enumerate(top_users, 1):
+        for i, (user, net_minor, rating) in enumerate(top_users, 1):
             status_emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else "📊"
-            amount_emoji = "📈" if user.net_amount > 0 else "📉" if user.net_amount < 0 else "➖"
+            amount_emoji = "📈" if net_minor > 0 else "📉" if net_minor < 0 else "➖"
+            rating_text = f" 🎯{rating:.0f}" if rating is not None else ""
             
             ranking_message += f"{status_emoji} {i}. {user.get_effective_nickname()}\n"
-            ranking_message += f"   💰 {user.net_amount:+.0f}元 {amount_emoji} ({user.total_games}局)\n\n"
+            ranking_message += f"   💰 {format_amount(net_minor, signed=True)}元 {amount_emoji} ({user.total_games}局){rating_text}\n\n"
         
         ranking_message += "💡 排行榜僅包含使用機器人記錄的對局"
         
@@ -281,4 +295,56 @@ def handle_top_players_command(event, line_bot_api, group_id):
     except Exception as e:
         send_text_message(line_bot_api, event, f"❌ 查詢排行榜失敗：{str(e)}")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def handle_period_leaderboard_command(event, line_bot_api, group_id, period):
+    """
+    處理 /週排行、/月排行 指令 - 顯示群組本週或本月的輸贏排行
+    
+    Args:
+        period: 期間類型（services.leaderboard.WEEKLY 或 MONTHLY）
+    """
+    
+    if not group_id:
+        send_text_message(line_bot_api, event, "❌ 此功能僅限群組使用")
+        return
+    
+    db = SessionLocal()
+    try:
+        rows = top_players(db, group_id, period)
+        period_name = PERIOD_NAMES[period]
+        
+        if not rows:
+            send_text_message(
+                line_bot_api, 
+                event, 
+                f"📊 此群組{period_name}尚無結算完成的對局\n\n💡 使用 /結算 結束對局後就會列入排行"
+            )
+            return
+        
+        start = period_start(period)
+        ranking_message = f"🏆 {period_name}排行榜（{start.strftime('%m/%d')} 起）\n\n"
+        
+        for i, row in enumerate(rows, 1):
+            status_emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else "📊"
+            amount_emoji = "📈" if row.net_amount > 0 else "📉" if row.net_amount < 0 else "➖"
+            
+            ranking_message += f"{status_emoji} {i}. {row.nickname}\n"
+            ranking_message += f"   💰 {row.net_amount:+d}元 {amount_emoji} ({row.games}局)\n\n"
+        
+        ranking_message += "💡 排行榜僅包含使用機器人記錄的對局"
+        
+        send_text_message(line_bot_api, event, ranking_message)
+        
+    except Exception as e:
+        send_text_message(line_bot_api, event, f"❌ 查詢排行榜失敗：{str(e)}")
+    finally:
+        db.close()
+
+def handle_weekly_leaderboard_command(event, line_bot_api, group_id):
+    """處理 /週排行 指令"""
+    handle_period_leaderboard_command(event, line_bot_api, group_id, WEEKLY)
+
+def handle_monthly_leaderboard_command(event, line_bot_api, group_id):
+    """處理 /月排行 指令"""
+    handle_period_leaderboard_command(event, line_bot_api, group_id, MONTHLY)
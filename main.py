@@ -1,98 +1,281 @@
 """
 LINE 麻將記帳機器人 - FastAPI 主程式
 """
+import asyncio
+import logging
 import os
+import sys
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from linebot import LineBotApi, WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import MessageEvent, TextMessage
 from dotenv import load_dotenv
 
-from models.database import engine, Base
-from handlers.game_handler import handle_game_command
-from handlers.join_handler import handle_join_command, handle_wind_selection
-from handlers.status_handler import handle_status_command, handle_dealer_command, handle_quit_command
-from handlers.user_handler import handle_set_nickname_command, handle_my_stats_command, handle_nickname_info_command, handle_top_players_command
+from sqlalchemy.orm import Session
+from models.database import engine
+from services.group_lock import lock_stats
+from services.invalidation import InvalidationConsumer
+from services.dispatcher import DISPATCH_WORKERS, Dispatcher, routing_key
+from services.rate_limit import ALLOW, BUSY_TEXT, NOTIFY, check_rate_limit, rate_limit_stats
+from services.line_api import PushFallback, send_text_message
+from services.work_queue import BUSY_TEXT as QUEUE_BUSY_TEXT, HIGH, WorkQueue, command_priority
+from services.retry import already_processed, claim_pending, claiming, persist_events, prune_processed, reply_expired
+from utils.parser import extract_table_code
+from handlers.registry import dispatch
 
 # 載入環境變數
 load_dotenv()
 
-app = FastAPI(title="LINE 麻將記帳機器人", version="1.0.0")
+# 背景執行緒與分派 worker 的錯誤以 logging 記錄（含 traceback），由 gunicorn／uvicorn 的 stderr 收集
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("main")
+
+# 關機時排空工作佇列的期限（需小於 gunicorn 的 graceful timeout，預設 30 秒）
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "20"))
+
+# 回覆忙碌訊息的執行緒數
+SHED_REPLY_THREADS = int(os.getenv("SHED_REPLY_THREADS", "2"))
+
+# gunicorn.conf.py 已在 master 檢查過資料庫結構時設為 "1"，worker 不再重複檢查
+SCHEMA_READY_ENV = "MAHJONG_SCHEMA_READY"
 
 # LINE Bot 設定
 line_bot_api = LineBotApi(os.getenv('LINE_CHANNEL_ACCESS_TOKEN'))
 handler = WebhookHandler(os.getenv('LINE_CHANNEL_SECRET'))
 
-# 建立資料庫表格
-Base.metadata.create_all(bind=engine)
+def prepare_database():
+    """建立資料庫表格、補上新增的欄位，並清除超過保留期限的週／月排行資料"""
+    # 匯入所有資料表模型；只有 master 或本地開發啟動時需要，worker 不必載入
+    from models.migrations import upgrade_schema
+    from services.leaderboard import prune_buckets
+
+    upgrade_schema()
+    with Session(engine) as db:
+        prune_buckets(db)
+        prune_processed(db)
+        db.commit()
+
+@asynccontextmanager
+async def lifespan(app):
+    """worker 的生命週期：啟動背景執行緒並重新處理上次關機留下的事件，關機時排空後才結束"""
+    if os.getenv(SCHEMA_READY_ENV) != "1":
+        # 沒有經過 gunicorn.conf.py（例如 uvicorn --reload 本地開發）時自行檢查
+        prepare_database()
+    start_background_workers()
+    try:
+        yield
+    finally:
+        # 排空會阻塞，放到執行緒中進行，不卡住事件迴圈上還在收尾的請求
+        await asyncio.to_thread(stop_background_workers)
+
+# 每個 worker 一個快取失效通知的接收執行緒（PostgreSQL LISTEN，其他資料庫定期查詢版本表）
+invalidation_consumer = None
+
+# DISPATCH_WORKERS > 0 時，本程序只負責分派，事件依群組交給固定的 worker 程序
+dispatcher = None
+
+# 捨棄事件時的忙碌回覆（LINE API）與關機中收到事件的保存（資料庫）交給這幾個執行緒，
+# 佇列在事件迴圈上拒收時不會卡住 webhook
+shed_executor = ThreadPoolExecutor(max_workers=SHED_REPLY_THREADS, thread_name_prefix="shed-reply")
+_shed_pending = set()
+_shed_pending_lock = threading.Lock()
+
+def _reply_busy(event, reason):
+    try:
+        if reason == "closed":
+            # 關機中才收到的事件不回覆忙碌，留給下一個 worker 處理
+            save_pending([event.as_json_dict()], "closed")
+        else:
+            send_text_message(line_bot_api, event, QUEUE_BUSY_TEXT)
+    except Exception:
+        logger.exception("回覆忙碌訊息失敗")
+
+def _shed_done(future):
+    with _shed_pending_lock:
+        _shed_pending.discard(future)
+
+def reply_busy(event, reason):
+    """佇列拒收事件時呼叫（可能在事件迴圈上），實際的回覆與保存在 shed_executor 中進行"""
+    future = shed_executor.submit(_reply_busy, event, reason)
+    with _shed_pending_lock:
+        _shed_pending.add(future)
+    future.add_done_callback(_shed_done)
+
+def wait_shed_replies(timeout):
+    """等待已排入的忙碌回覆與保存完成"""
+    with _shed_pending_lock:
+        pending = list(_shed_pending)
+    futures.wait(pending, timeout=timeout)
+
+# 否則事件放進本程序有上限的工作佇列，過載時先捨棄低優先的查詢指令
+work_queue = WorkQueue(lambda event: handle_message(event), on_shed=reply_busy)
+
+def enqueue_event(event):
+    """把訊息事件交給分派器或本程序的工作佇列"""
+    priority = command_priority(event.message.text)
+    if dispatcher is not None:
+        dispatcher.submit(routing_key(event.source), event.as_json_dict(), priority)
+    else:
+        work_queue.submit(event, priority, key=routing_key(event.source))
+
+def save_pending(payloads, reason):
+    """把未處理的事件（JSON dict）存進 pending_events"""
+    if not payloads:
+        return
+    try:
+        with Session(engine) as db:
+            persist_events(db, payloads, reason)
+            db.commit()
+        logger.info("已保存 %d 筆未處理事件（%s）", len(payloads), reason)
+    except Exception:
+        logger.exception("保存未處理事件失敗（%s，%d 筆）", reason, len(payloads))
+
+def save_drained(payloads):
+    """分派模式關機期限到時，保存 Pipe 與送出佇列中還沒處理的事件"""
+    save_pending(payloads, "drain_timeout")
+
+def replay_pending():
+    """重新處理上次關機時留下的事件（超過 PENDING_EVENT_MAX_AGE 的事件捨棄）"""
+    with Session(engine) as db:
+        payloads, expired = claim_pending(db)
+        db.commit()
+    for payload in payloads:
+        enqueue_event(MessageEvent.new_from_json_dict(payload))
+    if payloads or expired:
+        logger.info("重新處理 %d 筆上次未處理的事件，捨棄 %d 筆超過保留期限的事件", len(payloads), expired)
+
+def start_invalidation_consumer():
+    global invalidation_consumer
+    invalidation_consumer = InvalidationConsumer(engine)
+    invalidation_consumer.start()
+
+def start_background_workers():
+    global dispatcher
+    if DISPATCH_WORKERS > 0:
+        dispatcher = Dispatcher(handle_event_payload, DISPATCH_WORKERS, initializer=start_invalidation_consumer,
+                                on_leftover=save_drained,
+                                on_shed=lambda payload, reason: reply_busy(MessageEvent.new_from_json_dict(payload), reason))
+    else:
+        work_queue.start()
+    start_invalidation_consumer()
+    replay_pending()
+
+def stop_background_workers():
+    """
+    關機：停止收新事件，在 SHUTDOWN_DRAIN_SECONDS 內處理完佇列與等待中的 /勝率 回覆，
+    來不及處理的事件存進 pending_events（分派模式由各 worker 自行保存 Pipe 中的事件），最後關閉連線池
+    """
+    deadline = time.monotonic() + SHUTDOWN_DRAIN_SECONDS
+    if dispatcher is not None:
+        dispatcher.stop(timeout=SHUTDOWN_DRAIN_SECONDS)
+    leftover = work_queue.drain(SHUTDOWN_DRAIN_SECONDS)
+    save_pending([event.as_json_dict() for event in leftover], "drain_timeout")
+    wait_shed_replies(max(0.0, deadline - time.monotonic()))
+    # 沒有人用過 /勝率 時模擬模組不會被匯入，也就沒有要等的回覆
+    simulator = sys.modules.get("services.simulator")
+    unanswered = simulator.shutdown(max(0.0, deadline - time.monotonic())) if simulator else 0
+    if unanswered:
+        logger.warning("關機時仍有 %d 個勝率模擬未回覆", unanswered)
+    if invalidation_consumer is not None:
+        invalidation_consumer.stop()
+    engine.dispose()
 
-@app.get("/")
 def read_root():
     return {"message": "LINE 麻將記帳機器人運行中", "status": "active"}
 
-@app.post("/webhook")
+def read_lock_metrics():
+    """本 worker 的群組鎖等待統計"""
+    return {"pid": os.getpid(), **lock_stats()}
+
+def read_rate_limit_metrics():
+    """本 worker 的指令頻率限制統計"""
+    return {"pid": os.getpid(), **rate_limit_stats()}
+
+def read_queue_metrics():
+    """本 worker 的工作佇列長度、等待時間與捨棄次數（分派模式為各 worker 送出佇列的統計）"""
+    stats = dispatcher.stats() if dispatcher is not None else work_queue.stats()
+    return {"pid": os.getpid(), **stats}
+
 async def webhook_callback(request: Request):
     """LINE Webhook 回調端點"""
     signature = request.headers.get('X-Line-Signature')
     body = await request.body()
     
     try:
-        handler.handle(body.decode('utf-8'), signature)
+        for event in handler.parser.parse(body.decode('utf-8'), signature):
+            if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
+                enqueue_event(event)
     except InvalidSignatureError:
         raise HTTPException(status_code=400, detail="Invalid signature")
     
     return "OK"
 
+def handle_event_payload(payload):
+    """分派 worker 中處理前端轉來的訊息事件"""
+    handle_message(MessageEvent.new_from_json_dict(payload))
+
 @handler.add(MessageEvent, message=TextMessage)
 def handle_message(event):
     """處理 LINE 訊息事件"""
     text = event.message.text.strip()
     group_id = event.source.group_id if hasattr(event.source, 'group_id') else None
     
-    # 處理開局指令
-    if text.startswith('/開局'):
-        handle_game_command(event, line_bot_api, text, group_id)
-    
-    # 處理加入指令
-    elif text.startswith('/加入'):
-        handle_join_command(event, line_bot_api, text, group_id)
-    
-    # 處理風位選擇指令
-    elif text.startswith('/選風'):
-        wind = text.replace('/選風', '').strip()
-        if wind in ['東', '南', '西', '北']:
-            handle_wind_selection(event, line_bot_api, wind, group_id)
-        else:
-            from services.line_api import send_text_message
-            send_text_message(line_bot_api, event, "❌ 請選擇正確的風位：東、南、西、北")
-    
-    # 處理狀態查詢指令
-    elif text in ['/狀態', '/status', '/查詢']:
-        handle_status_command(event, line_bot_api, group_id)
+    if not text.startswith('/'):
+        return
+    priority = command_priority(text)
     
-    # 處理莊家設定指令
-    elif text in ['/我當莊', '/當莊']:
-        handle_dealer_command(event, line_bot_api, group_id)
+    api = line_bot_api
+    if reply_expired(getattr(event, 'timestamp', None)):
+        # 回覆 token 已失效：查詢指令直接捨棄；修改對局的指令照常處理，改以 push_message 通知
+        if priority != HIGH:
+            logger.warning("捨棄回覆 token 已失效的查詢：%s", text[:20])
+            return
+        api = PushFallback(line_bot_api, group_id or event.source.user_id)
     
-    # 處理退出指令
-    elif text in ['/退出', '/離開']:
-        handle_quit_command(event, line_bot_api, group_id)
+    # 查詢指令的頻率限制：超過額度時只提醒一次，之後直接丟棄，不開資料庫連線（修改對局的指令不受限）
+    decision = check_rate_limit(event.source.user_id, group_id, priority=priority)
+    if decision != ALLOW:
+        if decision == NOTIFY:
+            send_text_message(api, event, BUSY_TEXT)
+        return
     
-    # 處理用戶身份綁定指令
-    elif text.startswith('/設定暱稱'):
-        handle_set_nickname_command(event, line_bot_api, text)
+    # 修改對局的指令：LINE 重送或重新處理已處理過的事件（同一個 webhookEventId）時略過，
+    # 處理時在 handler 的交易中記錄事件已處理；查詢指令重複執行無妨，不記錄
+    webhook_event_id = getattr(event, 'webhook_event_id', None) if priority == HIGH else None
+    if webhook_event_id:
+        with Session(engine) as db:
+            if already_processed(db, webhook_event_id):
+                return
     
-    # 處理個人統計查詢指令
-    elif text in ['/我的統計', '/統計', '/個人記錄']:
-        handle_my_stats_command(event, line_bot_api)
+    # 取出桌號標記（例如 /狀態 #B），同一群組可同時開多桌
+    table_code, text = extract_table_code(text)
     
-    # 處理暱稱資訊查詢指令
-    elif text in ['/暱稱資訊', '/我的暱稱']:
-        handle_nickname_info_command(event, line_bot_api)
-    
-    # 處理群組排行榜指令
-    elif text in ['/排行榜', '/排行']:
-        handle_top_players_command(event, line_bot_api, group_id)
+    # 依指令註冊表交給對應的 handler，handler 模組第一次使用時才匯入
+    with claiming(webhook_event_id):
+        dispatch(event, api, text, group_id, table_code)
+
+def create_app():
+    """
+    建立 FastAPI 應用程式
+
+    匯入本模組時只載入程式碼與註冊指令，不連線資料庫；
+    搭配 gunicorn --preload 時由 master 載入一次，worker 以 copy-on-write 共用，
+    資料庫連線池在 fork 之後才建立（見 gunicorn.conf.py）。
+    """
+    app = FastAPI(title="LINE 麻將記帳機器人", version="1.0.0", lifespan=lifespan)
+    app.add_api_route("/", read_root, methods=["GET"])
+    app.add_api_route("/metrics/locks", read_lock_metrics, methods=["GET"])
+    app.add_api_route("/metrics/rate-limit", read_rate_limit_metrics, methods=["GET"])
+    app.add_api_route("/metrics/queue", read_queue_metrics, methods=["GET"])
+    app.add_api_route("/webhook", webhook_callback, methods=["POST"])
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,17 @@
+"""
+ActiveSeat Model - 玩家目前所在對局索引（line_user_id → 進行中對局）
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from .database import Base
+
+class ActiveSeat(Base):
+    __tablename__ = "active_seats"
+    
+    group_id = Column(String(255), primary_key=True)  # LINE 群組 ID
+    line_user_id = Column(String(255), primary_key=True)  # LINE 使用者 ID
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False, index=True)  # 目前所在的對局
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ActiveSeat(group_id={self.group_id}, line_user_id={self.line_user_id}, game_id={self.game_id})>"
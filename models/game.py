@@ -1,22 +1,41 @@
 """
 Game Model - 麻將對局資料模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index, ForeignKey
 from sqlalchemy.sql import func
 from .database import Base
+from utils.templates import MessageTemplate
+
+GAME_SUMMARY = MessageTemplate("game_summary", """✅ 對局建立完成！（{table_code} 桌）
+
+🀄 模式：{mode}
+💰 每台：{per_point} 元
+📉 底台：{base_score} 元
+🏯 收莊錢：{collect_text}
+
+請輸入 `/加入 #{table_code}` 加入此場遊戲（共 4 位）""")
 
 class Game(Base):
     __tablename__ = "games"
+    __table_args__ = (
+        # 依群組、狀態與桌號查詢進行中的對局
+        Index("ix_games_group_status_table", "group_id", "status", "table_code"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(String(255), nullable=False, index=True)  # LINE 群組 ID
+    table_code = Column(String(4), default="A")  # 桌號，同一群組可同時開多桌
+    session_id = Column(Integer, ForeignKey("game_sessions.id"), nullable=True, index=True)  # 所屬聚會場次
     mode = Column(String(50), default="台麻")  # 遊戲模式
     per_point = Column(Integer, default=10)  # 每台多少錢
     base_score = Column(Integer, default=30)  # 底台
     collect_money = Column(Boolean, default=True)  # 是否收莊錢
     status = Column(String(20), default="created")  # 狀態：created, playing, finished
+    event_seq = Column(Integer, default=0)  # 目前已套用的事件序號（撤銷／重做的指標）
+    round_state = Column(Integer, default=0)  # 圈風／莊家／連莊壓縮狀態（見 services/dealer.py）
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True, index=True)  # 結算時間（重算積分依此排序）
     
     def __repr__(self):
         return f"<Game(id={self.id}, group_id={self.group_id}, mode={self.mode})>"
@@ -26,23 +45,25 @@ class Game(Base):
         return {
             "id": self.id,
             "group_id": self.group_id,
+            "table_code": self.table_code,
+            "session_id": self.session_id,
             "mode": self.mode,
             "per_point": self.per_point,
             "base_score": self.base_score,
             "collect_money": self.collect_money,
             "status": self.status,
+            "event_seq": self.event_seq,
+            "round_state": self.round_state,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
     
     def get_summary_text(self):
         """取得設定摘要文字"""
-        collect_text = "是" if self.collect_money else "否"
-        return f"""✅ 對局建立完成！
-
-🀄 模式：{self.mode}
-💰 每台：{self.per_point} 元
-📉 底台：{self.base_score} 元
-🏯 收莊錢：{collect_text}
-
-請輸入 `/加入 暱稱` 加入此場遊戲（共 4 位）"""
\ No newline at end of file
+        return GAME_SUMMARY.render(
+            table_code=self.table_code,
+            mode=self.mode,
+            per_point=self.per_point,
+            base_score=self.base_score,
+            collect_text="是" if self.collect_money else "否",
+        )
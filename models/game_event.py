@@ -0,0 +1,33 @@
+"""
+GameEvent Model - 對局事件記錄資料模型
+"""
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from .database import Base
+
+class GameEvent(Base):
+    __tablename__ = "game_events"
+    __table_args__ = (
+        UniqueConstraint("game_id", "seq", name="uq_game_events_game_seq"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False, index=True)
+    seq = Column(Integer, nullable=False)  # 對局內的事件序號，從 1 開始
+    event_type = Column(String(20), nullable=False)  # 事件類型：join, quit, wind, dealer, hand
+    payload = Column(Text, nullable=False)  # 事件內容（JSON）
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<GameEvent(game_id={self.game_id}, seq={self.seq}, event_type={self.event_type})>"
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            "id": self.id,
+            "game_id": self.game_id,
+            "seq": self.seq,
+            "event_type": self.event_type,
+            "payload": self.payload,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
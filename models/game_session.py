@@ -0,0 +1,30 @@
+"""
+GameSession Model - 聚會場次資料模型（同一晚多桌、多局的對局集合）
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from .database import Base
+
+class GameSession(Base):
+    __tablename__ = "game_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(String(255), nullable=False, index=True)  # LINE 群組 ID
+    status = Column(String(20), default="open")  # 狀態：open, closed
+    game_count = Column(Integer, default=0)  # 已結算的對局數
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_activity_at = Column(DateTime(timezone=True), nullable=True)  # 最近一次開局或結算時間
+    
+    def __repr__(self):
+        return f"<GameSession(id={self.id}, group_id={self.group_id}, status={self.status})>"
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            "id": self.id,
+            "group_id": self.group_id,
+            "status": self.status,
+            "game_count": self.game_count,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "last_activity_at": self.last_activity_at.isoformat() if self.last_activity_at else None
+        }
@@ -0,0 +1,21 @@
+"""
+GameSnapshot Model - 對局狀態快照資料模型
+"""
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from .database import Base
+
+class GameSnapshot(Base):
+    __tablename__ = "game_snapshots"
+    __table_args__ = (
+        UniqueConstraint("game_id", "seq", name="uq_game_snapshots_game_seq"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False, index=True)
+    seq = Column(Integer, nullable=False)  # 快照對應的事件序號（已套用到此序號為止）
+    state = Column(Text, nullable=False)  # 對局狀態（JSON）
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<GameSnapshot(game_id={self.game_id}, seq={self.seq})>"
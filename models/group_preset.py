@@ -0,0 +1,28 @@
+"""
+GroupPreset Model - 群組預設開局規則（/設定預設 儲存，/開局 不帶參數時使用）
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from .database import Base
+
+class GroupPreset(Base):
+    __tablename__ = "group_presets"
+    
+    group_id = Column(String(255), primary_key=True)  # LINE 群組 ID
+    mode = Column(String(50), default="台麻")  # 遊戲模式
+    per_point = Column(Integer, default=10)  # 每台多少錢
+    base_score = Column(Integer, default=30)  # 底台
+    collect_money = Column(Boolean, default=True)  # 是否收莊錢
+    updated_by = Column(String(255), nullable=True)  # 最後設定者的 LINE 使用者 ID
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<GroupPreset(group_id={self.group_id}, mode={self.mode}, per_point={self.per_point})>"
+    
+    def to_params(self):
+        """轉為 parse_game_command 格式的參數"""
+        return {
+            "mode": self.mode,
+            "per_point": self.per_point,
+            "base_score": self.base_score,
+            "collect_money": self.collect_money
+        }
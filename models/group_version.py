@@ -0,0 +1,22 @@
+"""
+GroupVersion Model - 每個群組的資料版本號（每次修改群組對局的交易遞增一次）
+
+其他 worker 依版本號判斷本程序的快取是否過期：PostgreSQL 以 NOTIFY 推送，
+其他資料庫定期查詢 updated_at 之後變動的列。
+"""
+from sqlalchemy import Column, String, BigInteger, DateTime, Index
+from .database import Base
+
+class GroupVersion(Base):
+    __tablename__ = "group_versions"
+    
+    group_id = Column(String(255), primary_key=True)  # LINE 群組 ID
+    version = Column(BigInteger, nullable=False, default=0)  # 已提交的修改次數
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_group_versions_updated_at", "updated_at"),
+    )
+    
+    def __repr__(self):
+        return f"<GroupVersion(group_id={self.group_id}, version={self.version})>"
@@ -0,0 +1,44 @@
+"""
+Hand Model - 每手牌胡牌記錄資料模型
+"""
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from .database import Base
+
+class Hand(Base):
+    __tablename__ = "hands"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False, index=True)
+    hand_number = Column(Integer, nullable=False)  # 本場第幾手
+    winner_player_id = Column(Integer, ForeignKey("players.id"), nullable=False)  # 胡牌玩家
+    loser_player_id = Column(Integer, ForeignKey("players.id"), nullable=True)  # 放槍玩家，自摸時為空
+    dealer_player_id = Column(Integer, ForeignKey("players.id"), nullable=True)  # 本手莊家
+    is_self_drawn = Column(Boolean, default=False)  # 是否自摸
+    tai = Column(Integer, default=0)  # 台型台數（不含莊家台）
+    dealer_tai = Column(Integer, default=0)  # 莊家與連莊台數
+    pattern_mask = Column(Integer, default=0)  # 命中台型的位元遮罩（見 services/scoring.py）
+    tiles = Column(String(255), nullable=True)  # 胡牌牌面
+    amount = Column(Integer, default=0)  # 胡牌者本手總收入
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<Hand(id={self.id}, game_id={self.game_id}, hand_number={self.hand_number}, tai={self.tai})>"
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            "id": self.id,
+            "game_id": self.game_id,
+            "hand_number": self.hand_number,
+            "winner_player_id": self.winner_player_id,
+            "loser_player_id": self.loser_player_id,
+            "dealer_player_id": self.dealer_player_id,
+            "is_self_drawn": self.is_self_drawn,
+            "tai": self.tai,
+            "dealer_tai": self.dealer_tai,
+            "pattern_mask": self.pattern_mask,
+            "tiles": self.tiles,
+            "amount": self.amount,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,23 @@
+"""
+HandPattern Model - 胡牌台型倒排索引（每位胡牌者、每個台型一筆，指向胡牌記錄）
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, ForeignKey, Index
+from .database import Base
+
+class HandPattern(Base):
+    __tablename__ = "hand_patterns"
+    __table_args__ = (
+        # 某台型在期間內胡了幾次：只需掃描索引
+        Index("ix_hand_patterns_period", "line_user_id", "pattern", "won_on"),
+        # 誰最常放槍給我：依放槍者分組
+        Index("ix_hand_patterns_loser", "line_user_id", "pattern", "loser_id"),
+    )
+    
+    line_user_id = Column(String(255), primary_key=True)  # 胡牌者 LINE 使用者 ID
+    pattern = Column(SmallInteger, primary_key=True)  # 台型位元編號（見 services/scoring.py），-1 代表每一次胡牌
+    hand_id = Column(Integer, ForeignKey("hands.id"), primary_key=True, index=True)
+    won_on = Column(Date, nullable=False)  # 胡牌日期（依排行榜時區）
+    loser_id = Column(String(255), nullable=True)  # 放槍者 LINE 使用者 ID，自摸時為空
+    
+    def __repr__(self):
+        return f"<HandPattern(line_user_id={self.line_user_id}, pattern={self.pattern}, hand_id={self.hand_id})>"
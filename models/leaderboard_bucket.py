@@ -0,0 +1,37 @@
+"""
+LeaderboardBucket Model - 週／月排行累計（依群組、期間、使用者分桶，結算時增量更新）
+"""
+from sqlalchemy import Column, Integer, String, Date, Index
+from .database import Base
+
+class LeaderboardBucket(Base):
+    __tablename__ = "leaderboard_buckets"
+    __table_args__ = (
+        # 期間排行：同一群組同一期間依淨輸贏取前 N 名
+        Index("ix_leaderboard_period_net", "group_id", "period", "period_start", "net_amount"),
+        # 依期間起始日整批清除舊資料
+        Index("ix_leaderboard_period_start", "period", "period_start"),
+    )
+    
+    group_id = Column(String(255), primary_key=True)  # LINE 群組 ID
+    period = Column(String(1), primary_key=True)  # 期間類型：W 週、M 月
+    period_start = Column(Date, primary_key=True)  # 期間起始日（週一或每月 1 日，依設定時區）
+    line_user_id = Column(String(255), primary_key=True)  # LINE 使用者 ID
+    nickname = Column(String(100), nullable=False)  # 最近一局使用的暱稱
+    games = Column(Integer, default=0)  # 期間內對局數
+    net_amount = Column(Integer, default=0)  # 期間內淨輸贏
+    
+    def __repr__(self):
+        return f"<LeaderboardBucket(group_id={self.group_id}, period={self.period}, period_start={self.period_start}, nickname={self.nickname})>"
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            "group_id": self.group_id,
+            "period": self.period,
+            "period_start": self.period_start.isoformat() if self.period_start else None,
+            "line_user_id": self.line_user_id,
+            "nickname": self.nickname,
+            "games": self.games,
+            "net_amount": self.net_amount
+        }
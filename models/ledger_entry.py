@@ -0,0 +1,21 @@
+"""
+LedgerEntry Model - 複式記帳分錄（每筆為付款者支付給收款者的一筆金額）
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from .database import Base
+
+class LedgerEntry(Base):
+    __tablename__ = "ledger_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=True, index=True)  # 期初餘額分錄為空
+    hand_id = Column(Integer, ForeignKey("hands.id"), nullable=True, index=True)  # 同一手的分錄為一批
+    group_id = Column(String(255), nullable=True)
+    payer_id = Column(String(255), nullable=False, index=True)  # 付款者 LINE 使用者 ID
+    payee_id = Column(String(255), nullable=False, index=True)  # 收款者 LINE 使用者 ID
+    amount_minor = Column(BigInteger, nullable=False)  # 金額（最小單位，恆為正數）
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<LedgerEntry(hand_id={self.hand_id}, {self.payer_id} → {self.payee_id}: {self.amount_minor})>"
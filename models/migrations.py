@@ -0,0 +1,241 @@
+"""
+資料庫結構升級 - 建立缺少的表格並補上新增的欄位與索引
+
+create_all 只會建立不存在的表格，已上線的資料庫不會自動加欄位或索引，
+因此在建立表格後比對每個表格的欄位，以 ALTER TABLE ADD COLUMN 補齊，
+再建立缺少的索引。
+
+需要搬移既有資料的變更寫成資料遷移（DATA_MIGRATIONS），
+執行完成後記錄在 schema_migrations，之後啟動不再重跑。
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from utils.money import to_minor
+from .database import Base, engine
+
+# 匯入所有模型，確保 Base.metadata 包含全部表格
+from . import game, player, user, hand, game_event, game_snapshot, active_seat, game_session, session_total, user_stats, leaderboard_bucket, quantile_sketch, user_rating, schema_migration, ledger_entry, user_balance, hand_pattern, group_preset, group_version, pending_event, processed_event  # noqa: F401
+
+def _column_default_sql(column, dialect):
+    """取得欄位預設值的 SQL 片段（只處理純量預設值）"""
+    default = column.default
+    if default is None or not default.is_scalar:
+        return ""
+    value = default.arg
+    if isinstance(value, bool):
+        if dialect.name == "postgresql":
+            return " DEFAULT TRUE" if value else " DEFAULT FALSE"
+        return f" DEFAULT {int(value)}"
+    if isinstance(value, (int, float)):
+        return f" DEFAULT {value}"
+    return " DEFAULT '" + str(value).replace("'", "''") + "'"
+
+BACKFILL_BATCH_SIZE = 1000
+
+def _backfill_user_money_minor(bind, inspector, batch_size=None):
+    """
+    將舊版 users 的 Float 金額欄位換算成整數最小單位
+
+    以 id 分批串流讀取，每批一個交易，不會一次把整個 users 表載入記憶體。
+
+    Returns:
+        int: 回填的資料列數
+    """
+    legacy = {column["name"] for column in inspector.get_columns("users")}
+    if not {"total_win_amount", "total_lose_amount"} <= legacy:
+        return 0
+
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    last_id = 0
+    count = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, total_win_amount, total_lose_amount FROM users "
+                "WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            params = []
+            for user_id, win, lose in rows:
+                win_minor, lose_minor = to_minor(win or 0), to_minor(lose or 0)
+                params.append({"id": user_id, "win": win_minor, "lose": lose_minor, "net": win_minor - lose_minor})
+            conn.execute(text(
+                "UPDATE users SET total_win_minor = :win, total_lose_minor = :lose, net_minor = :net WHERE id = :id"
+            ), params)
+        last_id = rows[-1][0]
+        count += len(rows)
+    return count
+
+def _open_ledger_balances(bind, inspector, batch_size=None):
+    """
+    帳本上線前的累計輸贏寫成期初分錄（對手帳戶為 __opening__），並建立收支彙總
+
+    Returns:
+        int: 建立彙總的玩家數
+    """
+    from services.ledger import OPENING_ACCOUNT
+
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    last_id = 0
+    count = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT u.id, u.line_user_id, u.total_win_minor, u.total_lose_minor FROM users u "
+                "WHERE u.id > :last_id AND u.total_games > 0 "
+                "AND NOT EXISTS (SELECT 1 FROM user_balances b WHERE b.line_user_id = u.line_user_id) "
+                "ORDER BY u.id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            entries = []
+            balances = []
+            for _, user_id, win, lose in rows:
+                win, lose = win or 0, lose or 0
+                if win:
+                    entries.append({"payer": OPENING_ACCOUNT, "payee": user_id, "amount": win})
+                if lose:
+                    entries.append({"payer": user_id, "payee": OPENING_ACCOUNT, "amount": lose})
+                balances.append({"user_id": user_id, "received": win, "paid": lose, "net": win - lose,
+                                 "entries": int(bool(win)) + int(bool(lose))})
+            if entries:
+                conn.execute(text(
+                    "INSERT INTO ledger_entries (payer_id, payee_id, amount_minor) VALUES (:payer, :payee, :amount)"
+                ), entries)
+            conn.execute(text(
+                "INSERT INTO user_balances (line_user_id, received_minor, paid_minor, net_minor, entry_count) "
+                "VALUES (:user_id, :received, :paid, :net, :entries)"
+            ), balances)
+        last_id = rows[-1][0]
+        count += len(rows)
+    return count
+
+def _index_hand_patterns(bind, inspector, batch_size=None):
+    """
+    為已結算對局的胡牌記錄建立台型倒排索引
+
+    Returns:
+        int: 建立的索引列數
+    """
+    from sqlalchemy import insert, select
+    from sqlalchemy.orm import aliased
+    from .game import Game
+    from .hand import Hand
+    from .hand_pattern import HandPattern
+    from .player import Player
+    from services.hand_index import hand_postings, local_date
+
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    winner, loser = aliased(Player), aliased(Player)
+    query = select(
+        Hand.id, winner.line_user_id, loser.line_user_id, Hand.pattern_mask, Hand.created_at
+    ).join(winner, winner.id == Hand.winner_player_id).outerjoin(
+        loser, loser.id == Hand.loser_player_id
+    ).join(Game, Game.id == Hand.game_id).where(
+        Game.status == "finished",
+        ~select(HandPattern.hand_id).where(HandPattern.hand_id == Hand.id).exists()
+    ).order_by(Hand.id).limit(batch_size)
+
+    last_id = 0
+    count = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(query.where(Hand.id > last_id)).all()
+            if not rows:
+                break
+            postings = []
+            for hand_id, winner_id, loser_id, pattern_mask, created_at in rows:
+                postings += hand_postings(hand_id, winner_id, loser_id, pattern_mask, local_date(created_at))
+            conn.execute(insert(HandPattern), postings)
+        last_id = rows[-1][0]
+        count += len(postings)
+    return count
+
+def _backfill_game_finished_at(bind, inspector, batch_size=None):
+    """
+    已結算的舊對局以最後更新時間（沒有時用建立時間）作為結算時間
+
+    Returns:
+        int: 回填的對局數
+    """
+    with bind.begin() as conn:
+        result = conn.execute(text(
+            "UPDATE games SET finished_at = COALESCE(updated_at, created_at) "
+            "WHERE status = 'finished' AND finished_at IS NULL"
+        ))
+    return result.rowcount
+
+def _seed_quantile_sketch(bind, inspector, batch_size=None):
+    """
+    由 user_balances 建立全體玩家的排名百分位草圖，結算時只需更新這一列
+
+    Returns:
+        int: 草圖包含的使用者數
+    """
+    from services.percentile import rebuild_sketch
+
+    return rebuild_sketch(bind)
+
+# (名稱, 函式)，依序執行；函式接收 (bind, inspector)，回傳處理的資料列數
+DATA_MIGRATIONS = [
+    ("user_money_minor", _backfill_user_money_minor),
+    ("ledger_opening_balances", _open_ledger_balances),
+    ("hand_pattern_postings", _index_hand_patterns),
+    ("quantile_sketch_seed", _seed_quantile_sketch),
+    ("game_finished_at", _backfill_game_finished_at),
+]
+
+def _run_data_migrations(bind):
+    """執行尚未記錄在 schema_migrations 的資料遷移"""
+    with bind.connect() as conn:
+        applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+
+    done = []
+    for name, migrate in DATA_MIGRATIONS:
+        if name in applied:
+            continue
+        rows = migrate(bind, inspect(bind))
+        try:
+            with bind.begin() as conn:
+                conn.execute(text("INSERT INTO schema_migrations (name, rows) VALUES (:name, :rows)"),
+                             {"name": name, "rows": rows})
+        except IntegrityError:
+            # 其他 worker 同時啟動並已完成同一個遷移
+            continue
+        done.append(f"migration.{name}")
+    return done
+
+def upgrade_schema(bind=None):
+    """
+    建立缺少的表格、補上缺少的欄位與索引，並執行尚未執行的資料遷移
+
+    Returns:
+        list: 新增的欄位與索引名稱（"表格.名稱"）及執行的資料遷移（"migration.名稱"）
+    """
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+
+    inspector = inspect(bind)
+    added = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                default_sql = _column_default_sql(column, bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default_sql}"))
+                added.append(f"{table.name}.{column.name}")
+
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
+                added.append(f"{table.name}.{index.name}")
+
+    added += _run_data_migrations(bind)
+    return added
@@ -0,0 +1,17 @@
+"""
+PendingEvent Model - 關機時尚未處理的 webhook 事件（下一個啟動的 worker 重新處理）
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from .database import Base
+
+class PendingEvent(Base):
+    __tablename__ = "pending_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(String(255), nullable=True)  # LINE 群組 ID（私訊為空）
+    payload = Column(Text, nullable=False)  # LINE 事件內容（JSON）
+    reason = Column(String(50), nullable=True)  # 未處理的原因：drain_timeout（排空逾時）、closed（關機後才收到）
+    received_at = Column(DateTime(timezone=True), nullable=False)  # 收到事件的時間
+    
+    def __repr__(self):
+        return f"<PendingEvent(id={self.id}, group_id={self.group_id}, reason={self.reason})>"
@@ -1,13 +1,17 @@
 """
 Player Model - 玩家資料模型
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
 
 class Player(Base):
     __tablename__ = "players"
+    __table_args__ = (
+        # 依使用者查詢最近的對局（/我的統計）
+        Index("ix_players_user_game", "line_user_id", "game_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
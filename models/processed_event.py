@@ -0,0 +1,18 @@
+"""
+ProcessedEvent Model - 已開始處理的 webhook 事件 ID（LINE 重送或關機後重新處理時不重複執行）
+"""
+from sqlalchemy import Column, String, DateTime, Index
+from .database import Base
+
+class ProcessedEvent(Base):
+    __tablename__ = "processed_events"
+    
+    webhook_event_id = Column(String(64), primary_key=True)  # LINE 的 webhookEventId
+    processed_at = Column(DateTime(timezone=True), nullable=False)  # 開始處理的時間
+    
+    __table_args__ = (
+        Index("ix_processed_events_processed_at", "processed_at"),
+    )
+    
+    def __repr__(self):
+        return f"<ProcessedEvent(webhook_event_id={self.webhook_event_id})>"
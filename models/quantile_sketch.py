@@ -0,0 +1,17 @@
+"""
+QuantileSketch Model - 持久化的分位數草圖（全體玩家淨輸贏分布）
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from .database import Base
+
+class QuantileSketch(Base):
+    __tablename__ = "quantile_sketches"
+    
+    name = Column(String(50), primary_key=True)  # 草圖名稱，例如 user_net_amount
+    payload = Column(Text, nullable=False, default="{}")  # KLLSketch.to_dict() 的 JSON
+    item_count = Column(Integer, default=0)  # 草圖內累計的資料筆數
+    population = Column(Integer, default=0)  # 上次重建時的使用者數
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<QuantileSketch(name={self.name}, item_count={self.item_count}, population={self.population})>"
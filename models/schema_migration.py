@@ -0,0 +1,16 @@
+"""
+SchemaMigration Model - 已執行的資料遷移紀錄
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from .database import Base
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    name = Column(String(100), primary_key=True)  # 遷移名稱，例如 user_money_minor
+    rows = Column(Integer, default=0)  # 處理的資料列數
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<SchemaMigration(name={self.name}, rows={self.rows})>"
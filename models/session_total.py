@@ -0,0 +1,27 @@
+"""
+SessionTotal Model - 場次內每位玩家的累計輸贏（對局結算時增量更新）
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey
+from .database import Base
+
+class SessionTotal(Base):
+    __tablename__ = "session_totals"
+    
+    session_id = Column(Integer, ForeignKey("game_sessions.id"), primary_key=True)
+    line_user_id = Column(String(255), primary_key=True)  # LINE 使用者 ID
+    nickname = Column(String(100), nullable=False)  # 最近一局使用的暱稱
+    games = Column(Integer, default=0)  # 本場次參與的對局數
+    net_amount = Column(Integer, default=0)  # 本場次淨輸贏
+    
+    def __repr__(self):
+        return f"<SessionTotal(session_id={self.session_id}, nickname={self.nickname}, net_amount={self.net_amount})>"
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            "session_id": self.session_id,
+            "line_user_id": self.line_user_id,
+            "nickname": self.nickname,
+            "games": self.games,
+            "net_amount": self.net_amount
+        }
@@ -1,8 +1,9 @@
 """
 User Model - 用戶身份綁定資料模型
 """
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
 from sqlalchemy.sql import func
+from utils.money import format_amount, from_minor, to_minor
 from .database import Base
 
 class User(Base):
@@ -13,12 +14,41 @@ class User(Base):
     display_name = Column(String(100), nullable=False)  # 顯示名稱（可重複）
     preferred_nickname = Column(String(100), nullable=True)  # 使用者設定的慣用暱稱
     total_games = Column(Integer, default=0)  # 總對局數
-    total_win_amount = Column(Float, default=0.0)  # 總贏取金額
-    total_lose_amount = Column(Float, default=0.0)  # 總輸掉金額
-    net_amount = Column(Float, default=0.0)  # 淨輸贏金額
+    # 金額以整數最小單位（0.01 元）儲存；帳本上線後輸贏改記在 ledger_entries / user_balances，
+    # 這三個欄位只作為期初餘額的來源（見 migrations）
+    total_win_minor = Column(BigInteger, default=0)  # 總贏取金額
+    total_lose_minor = Column(BigInteger, default=0)  # 總輸掉金額
+    net_minor = Column(BigInteger, default=0)  # 淨輸贏金額（排行榜改依 user_balances.net_minor 排序）
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    @property
+    def total_win_amount(self):
+        """總贏取金額（元）"""
+        return from_minor(self.total_win_minor)
+
+    @total_win_amount.setter
+    def total_win_amount(self, amount):
+        self.total_win_minor = to_minor(amount)
+
+    @property
+    def total_lose_amount(self):
+        """總輸掉金額（元）"""
+        return from_minor(self.total_lose_minor)
+
+    @total_lose_amount.setter
+    def total_lose_amount(self, amount):
+        self.total_lose_minor = to_minor(amount)
+
+    @property
+    def net_amount(self):
+        """淨輸贏金額（元）"""
+        return from_minor(self.net_minor)
+
+    @net_amount.setter
+    def net_amount(self, amount):
+        self.net_minor = to_minor(amount)
+    
     def __repr__(self):
         return f"<User(line_user_id={self.line_user_id}, nickname={self.preferred_nickname})>"
     
@@ -41,28 +71,40 @@ class User(Base):
         """取得有效的暱稱（優先使用慣用暱稱，其次使用顯示名稱）"""
         return self.preferred_nickname or self.display_name
     
-    def get_stats_summary(self):
-        """取得統計摘要文字"""
-        win_rate = 0
-        if self.total_games > 0:
-            # 這裡簡化計算，實際可能需要更複雜的勝率計算
-            if self.net_amount > 0:
-                win_rate = min(100, (self.net_amount / (abs(self.total_win_amount) + abs(self.total_lose_amount)) * 100))
+    def get_stats_summary(self, stats=None, top_percent=None, rating=None, balance=None):
+        """
+        取得統計摘要文字
         
-        status_emoji = "📈" if self.net_amount > 0 else "📉" if self.net_amount < 0 else "📊"
+        Args:
+            balance: 對應的 UserBalance（由帳本分錄累計的收支），沒有時金額顯示為 0
+            stats: 對應的 UserStats（逐手累計的胡牌、自摸、放槍等統計），沒有時只顯示輸贏金額
+            top_percent: 淨輸贏在全體玩家中的名次百分比（前 X%）
+            rating: 對應的 UserRating（四人 Elo 實力積分）
+        """
+        net_minor = balance.net_minor if balance else 0
+        status_emoji = "📈" if net_minor > 0 else "📉" if net_minor < 0 else "📊"
         
-        return f"""👤 個人統計：{self.get_effective_nickname()}
+        summary = f"""👤 個人統計：{self.get_effective_nickname()}
 
 🎮 總對局：{self.total_games} 局
-💰 總輸贏：{self.net_amount:+.0f} 元 {status_emoji}
-📊 贏取：{self.total_win_amount:.0f} 元
-📉 輸掉：{self.total_lose_amount:.0f} 元
+💰 總輸贏：{format_amount(net_minor, signed=True)} 元 {status_emoji}
+📊 贏取：{format_amount(balance.received_minor if balance else 0)} 元
+📉 輸掉：{format_amount(balance.paid_minor if balance else 0)} 元"""
+        
+        if stats and stats.hands_played:
+            summary += f"""
 
-💡 提醒：統計數據僅包含使用機器人記錄的對局"""
-    
-    def update_game_result(self, win_amount, lose_amount):
-        """更新遊戲結果統計"""
-        self.total_games += 1
-        self.total_win_amount += win_amount
-        self.total_lose_amount += lose_amount
-        self.net_amount = self.total_win_amount - self.total_lose_amount
\ No newline at end of file
+🀄 胡牌：{stats.hands_won} / {stats.hands_played} 手（胡牌率 {stats.win_rate:.1f}%）
+🙌 自摸：{stats.self_drawn_count} 次
+💥 放槍：{stats.deal_in_count} 次（放槍率 {stats.deal_in_rate:.1f}%）
+🎯 平均台數：{stats.average_tai:.1f} 台
+🏆 單手最大：{stats.biggest_win} 元
+🔥 目前戰況：{stats.streak_text()}（最長連勝 {stats.best_streak} 局）"""
+        
+        if rating is not None:
+            summary += f"\n🎯 實力積分：{rating.rating:.0f}（{rating.games} 局）"
+        if top_percent is not None:
+            summary += f"\n🌏 全體玩家排名：前 {top_percent}%"
+        
+        summary += "\n\n💡 提醒：統計數據僅包含使用機器人記錄的對局"
+        return summary
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+UserBalance Model - 由帳本分錄累計的個人收支（結算時與分錄一起更新）
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from utils.money import from_minor
+from .database import Base
+
+class UserBalance(Base):
+    __tablename__ = "user_balances"
+    
+    line_user_id = Column(String(255), primary_key=True)  # LINE 使用者 ID
+    received_minor = Column(BigInteger, default=0)  # 累計收款（最小單位）
+    paid_minor = Column(BigInteger, default=0)  # 累計付款（最小單位）
+    net_minor = Column(BigInteger, default=0, index=True)  # 淨輸贏（最小單位，排行榜依此排序）
+    entry_count = Column(Integer, default=0)  # 涉及的分錄筆數
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    @property
+    def received_amount(self):
+        """累計收款（元）"""
+        return from_minor(self.received_minor)
+    
+    @property
+    def paid_amount(self):
+        """累計付款（元）"""
+        return from_minor(self.paid_minor)
+    
+    @property
+    def net_amount(self):
+        """淨輸贏（元）"""
+        return from_minor(self.net_minor)
+    
+    def __repr__(self):
+        return f"<UserBalance(line_user_id={self.line_user_id}, net_minor={self.net_minor})>"
@@ -0,0 +1,25 @@
+"""
+UserRating Model - 玩家實力積分（四人 Elo，每局結算時更新）
+"""
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from .database import Base
+
+class UserRating(Base):
+    __tablename__ = "user_ratings"
+    
+    line_user_id = Column(String(255), primary_key=True)  # LINE 使用者 ID
+    rating = Column(Float, default=1500.0, index=True)  # 目前積分
+    games = Column(Integer, default=0)  # 計入積分的對局數
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<UserRating(line_user_id={self.line_user_id}, rating={self.rating:.0f})>"
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            "line_user_id": self.line_user_id,
+            "rating": self.rating,
+            "games": self.games,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,63 @@
+"""
+UserStats Model - 個人累計統計（每位使用者一列，結算時逐手以 O(1) 累加）
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from .database import Base
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    line_user_id = Column(String(255), primary_key=True)  # LINE 使用者 ID
+    games = Column(Integer, default=0)  # 已結算的對局數
+    hands_played = Column(Integer, default=0)  # 參與的手數（含流局）
+    hands_won = Column(Integer, default=0)  # 胡牌手數
+    self_drawn_count = Column(Integer, default=0)  # 自摸次數
+    deal_in_count = Column(Integer, default=0)  # 放槍次數
+    total_tai = Column(Integer, default=0)  # 胡牌台數總和（含莊家台）
+    biggest_win = Column(Integer, default=0)  # 單手最大收入
+    current_streak = Column(Integer, default=0)  # 連勝（正數）或連敗（負數）局數
+    best_streak = Column(Integer, default=0)  # 最長連勝局數
+    last_game_at = Column(DateTime(timezone=True), nullable=True)  # 最近一次結算時間
+    
+    def __repr__(self):
+        return f"<UserStats(line_user_id={self.line_user_id}, games={self.games}, hands_won={self.hands_won})>"
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            "line_user_id": self.line_user_id,
+            "games": self.games,
+            "hands_played": self.hands_played,
+            "hands_won": self.hands_won,
+            "self_drawn_count": self.self_drawn_count,
+            "deal_in_count": self.deal_in_count,
+            "total_tai": self.total_tai,
+            "average_tai": self.average_tai,
+            "biggest_win": self.biggest_win,
+            "current_streak": self.current_streak,
+            "best_streak": self.best_streak,
+            "last_game_at": self.last_game_at.isoformat() if self.last_game_at else None
+        }
+    
+    @property
+    def average_tai(self):
+        """平均胡牌台數"""
+        return self.total_tai / self.hands_won if self.hands_won else 0.0
+    
+    @property
+    def win_rate(self):
+        """胡牌率（%）"""
+        return self.hands_won * 100 / self.hands_played if self.hands_played else 0.0
+    
+    @property
+    def deal_in_rate(self):
+        """放槍率（%）"""
+        return self.deal_in_count * 100 / self.hands_played if self.hands_played else 0.0
+    
+    def streak_text(self):
+        """連勝／連敗文字"""
+        if self.current_streak > 0:
+            return f"連勝 {self.current_streak} 局"
+        if self.current_streak < 0:
+            return f"連敗 {-self.current_streak} 局"
+        return "無"
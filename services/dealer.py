@@ -0,0 +1,115 @@
+"""
+莊家輪替與連莊狀態機
+
+圈風、莊家位置、連莊次數等資訊壓縮成一個整數存在 Game.round_state，
+每記錄一手（或流局）以 O(1) 推進，查詢狀態時直接解碼，不需重播事件。
+
+位元配置：
+    0-1   圈風（0 東 - 3 北）
+    2-3   目前莊家的座位風位
+    4-5   第一任莊家的座位風位（莊家輪回此位置時換圈）
+    6-11  連莊次數（上限 63）
+    12    已開始（0 代表尚未設定莊家）
+    13    北風圈已打完
+"""
+from collections import namedtuple
+
+from utils.tiles import WINDS
+
+_STARTED = 1 << 12
+_COMPLETED = 1 << 13
+_MAX_STREAK = 63
+
+RoundState = namedtuple("RoundState", "round_wind dealer_position first_dealer_position streak completed")
+
+def pack_round_state(state):
+    """將 RoundState 壓縮為整數"""
+    return (
+        state.round_wind
+        | state.dealer_position << 2
+        | state.first_dealer_position << 4
+        | min(state.streak, _MAX_STREAK) << 6
+        | _STARTED
+        | (_COMPLETED if state.completed else 0)
+    )
+
+def unpack_round_state(value):
+    """將整數解碼為 RoundState，尚未開始時回傳 None"""
+    if not value or not value & _STARTED:
+        return None
+    return RoundState(
+        round_wind=value & 3,
+        dealer_position=(value >> 2) & 3,
+        first_dealer_position=(value >> 4) & 3,
+        streak=(value >> 6) & _MAX_STREAK,
+        completed=bool(value & _COMPLETED)
+    )
+
+def start_round_state(dealer_position):
+    """第一任莊家就位：東風圈、連莊 0"""
+    return pack_round_state(RoundState(0, dealer_position, dealer_position, 0, False))
+
+def advance_round_state(value, dealer_kept):
+    """
+    推進一手：莊家胡牌或流局時連莊，否則下莊並由下家接莊
+
+    莊家輪回第一任莊家的位置時換下一圈；北風圈結束後標記為已打完。
+    """
+    state = unpack_round_state(value)
+    if state is None:
+        return value
+
+    if dealer_kept:
+        return pack_round_state(state._replace(streak=state.streak + 1))
+
+    dealer_position = (state.dealer_position + 1) % 4
+    round_wind = state.round_wind
+    completed = state.completed
+    if dealer_position == state.first_dealer_position:
+        if round_wind == 3:
+            completed = True
+        else:
+            round_wind += 1
+
+    return pack_round_state(state._replace(
+        round_wind=round_wind,
+        dealer_position=dealer_position,
+        streak=0,
+        completed=completed
+    ))
+
+def seat_wind(value, wind_position):
+    """
+    計算玩家本手的門風索引：莊家為東，其下家為南，依此類推
+
+    尚未開始時直接使用玩家選擇的風位。
+    """
+    position = WINDS.index(wind_position) if wind_position in WINDS else None
+    state = unpack_round_state(value)
+    if position is None or state is None:
+        return position
+    return (position - state.dealer_position) % 4
+
+def round_label(value):
+    """取得目前局數文字，例如「東風南局 連2拉2」"""
+    state = unpack_round_state(value)
+    if state is None:
+        return "尚未開始"
+    hand_wind = WINDS[(state.dealer_position - state.first_dealer_position) % 4]
+    label = f"{WINDS[state.round_wind]}風{hand_wind}局"
+    if state.streak:
+        label += f" 連{state.streak}拉{state.streak}"
+    if state.completed:
+        label += "（北風圈已結束）"
+    return label
+
+def dealer_money(per_point, value, collect_money):
+    """
+    計算莊錢：莊家 1 台 + 連 N 拉 N 共 2N 台
+
+    不收莊錢的對局固定為 0。
+    """
+    state = unpack_round_state(value)
+    if not collect_money or state is None:
+        return 0
+    return per_point * (1 + 2 * state.streak)
@@ -0,0 +1,255 @@
+"""
+群組黏著分派 - 以一致性雜湊把每個群組固定交給同一個 worker 程序處理
+
+前端程序只驗證簽章、解析事件，再依群組 ID 把事件經由 Pipe 轉給對應的 worker：
+- 同一群組的事件永遠由同一個程序依序處理，修改自然排隊，本程序的快取也不必跨程序失效
+- 一致性雜湊環（每個 worker 多個虛擬節點）增減 worker 時只有約 1/N 的群組換手
+
+送出不在事件迴圈上阻塞：每個 worker 一個有上限的送出佇列，由該 worker 專屬的送出執行緒寫進 Pipe。
+送出佇列的准入規則與 work_queue 相同：超過 DISPATCH_SHED_DEPTH 時先捨棄低優先的查詢指令，
+達到硬上限 DISPATCH_QUEUE_MAX 時一律拒絕，捨棄的事件交給 on_shed 回覆忙碌。
+
+以 DISPATCH_WORKERS 啟用（0 為不分派，由收到 webhook 的程序直接處理）。
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import get_context
+
+from services.work_queue import HIGH, LOW
+from utils.hashing import stable_hash
+
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "0"))
+DISPATCH_REPLICAS = int(os.getenv("DISPATCH_REPLICAS", "64"))  # 每個 worker 的虛擬節點數
+DISPATCH_SAVE_SECONDS = float(os.getenv("DISPATCH_SAVE_SECONDS", "5"))  # 關機期限後留給 worker 保存事件的時間
+DISPATCH_QUEUE_MAX = int(os.getenv("DISPATCH_QUEUE_MAX", "200"))  # 每個 worker 送出佇列的硬上限
+DISPATCH_SHED_DEPTH = int(os.getenv("DISPATCH_SHED_DEPTH", "50"))  # 送出佇列超過此長度時捨棄查詢指令
+
+_STOP = object()  # 送出佇列中的結束標記
+
+logger = logging.getLogger(__name__)
+
+def routing_key(source):
+    """事件來源 → 分派用的鍵（群組、聊天室或個人）"""
+    return (getattr(source, "group_id", None) or getattr(source, "room_id", None)
+            or getattr(source, "user_id", None) or "")
+
+class HashRing:
+    """
+    一致性雜湊環
+
+    Args:
+        nodes: 節點名稱列表
+        replicas: 每個節點的虛擬節點數，越多分布越平均
+    """
+
+    def __init__(self, nodes=(), replicas=DISPATCH_REPLICAS):
+        self.replicas = replicas
+        self._points = []  # 排序過的 (雜湊值, 節點)
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            bisect.insort(self._points, (stable_hash(f"{node}#{i}"), node))
+
+    def remove(self, node):
+        self._points = [point for point in self._points if point[1] != node]
+
+    def node_for(self, key):
+        """鍵 → 順時針方向第一個虛擬節點所屬的節點"""
+        if not self._points:
+            raise LookupError("雜湊環沒有任何節點")
+        index = bisect.bisect(self._points, (stable_hash(key),))
+        return self._points[index % len(self._points)][1]
+
+def _worker_main(target, initializer, connection, on_leftover=None, stop_at=None):
+    """
+    worker 程序：依序處理收到的事件，收到 None 時結束
+
+    前端呼叫 stop 後會設定 stop_at（epoch 秒）；超過期限仍在 Pipe 中的事件不再處理，
+    收到 None 後一次交給 on_leftover(payloads) 保存。
+    """
+    if initializer is not None:
+        initializer()
+    leftover = []
+    while True:
+        try:
+            payload = connection.recv()
+        except EOFError:
+            break
+        if payload is None:
+            break
+        if on_leftover is not None and stop_at is not None and 0 < stop_at.value <= time.time():
+            leftover.append(payload)
+            continue
+        try:
+            target(payload)
+        except Exception:
+            logger.exception("worker %s 處理事件失敗", os.getpid())
+    if leftover:
+        try:
+            on_leftover(leftover)
+        except Exception:
+            logger.exception("worker %s 保存未處理事件失敗", os.getpid())
+
+class _Worker:
+    """一個 worker 程序、寫入它的 Pipe，以及前端的送出佇列與送出執行緒"""
+
+    __slots__ = ("name", "process", "connection", "outbox", "condition", "sender")
+
+    def __init__(self, name):
+        self.name = name
+        self.process = None
+        self.connection = None
+        self.outbox = deque()
+        self.condition = threading.Condition()
+        self.sender = None
+
+class Dispatcher:
+    """
+    前端分派器：啟動固定數量的 worker 程序，依群組把事件轉給同一個 worker
+
+    Args:
+        target: worker 中處理事件的模組層級函式 target(payload)
+        workers: worker 程序數
+        initializer: worker 啟動時執行一次的模組層級函式（例如建立連線池）
+        on_leftover: 關機期限到時還沒處理的事件交給此模組層級函式 on_leftover(payloads) 保存
+                     （已送進 Pipe 的由 worker 保存，還在送出佇列的由前端保存）
+        on_shed: 送出佇列拒收事件時呼叫 on_shed(payload, reason)，reason 為 closed、full 或 overload
+    """
+
+    def __init__(self, target, workers=None, initializer=None, on_leftover=None, on_shed=None,
+                 max_depth=None, shed_depth=None):
+        self.target = target
+        self.initializer = initializer
+        self.on_leftover = on_leftover
+        self.on_shed = on_shed
+        self.max_depth = max_depth or DISPATCH_QUEUE_MAX
+        self.shed_depth = shed_depth or DISPATCH_SHED_DEPTH
+        self._context = get_context("spawn")  # 不繼承前端的執行緒與資料庫連線
+        self._stop_at = self._context.Value("d", 0.0, lock=False)  # 關機期限（epoch 秒），0 表示未關機
+        self._running = True
+        self._stats_lock = threading.Lock()
+        self._stats = {"accepted": 0, "shed_closed": 0, "shed_full": 0, "shed_overload": 0, "restarted": 0}
+        self._workers = {}  # 節點名稱 → _Worker
+        self.ring = HashRing()
+        for i in range(workers or DISPATCH_WORKERS):
+            worker = _Worker(f"worker-{i}")
+            self._start_process(worker)
+            worker.sender = threading.Thread(target=self._send_loop, args=(worker,),
+                                             name=f"dispatch-{worker.name}", daemon=True)
+            worker.sender.start()
+            self._workers[worker.name] = worker
+            self.ring.add(worker.name)
+
+    def _start_process(self, worker):
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_worker_main, name=f"mahjong-{worker.name}",
+                                        args=(self.target, self.initializer, receiver, self.on_leftover, self._stop_at),
+                                        daemon=True)
+        process.start()
+        receiver.close()
+        worker.process, worker.connection = process, sender
+
+    def _send_loop(self, worker):
+        """送出執行緒：依序把送出佇列的事件寫進 Pipe（程序已結束時先重新啟動），遇到結束標記時通知 worker 結束"""
+        while True:
+            with worker.condition:
+                while not worker.outbox:
+                    worker.condition.wait()
+                payload = worker.outbox.popleft()
+            if payload is _STOP:
+                try:
+                    worker.connection.send(None)
+                except OSError:
+                    pass
+                worker.connection.close()
+                return
+            if not worker.process.is_alive():
+                logger.warning("%s 已結束（exit code %s），重新啟動", worker.name, worker.process.exitcode)
+                worker.connection.close()
+                self._start_process(worker)
+                with self._stats_lock:
+                    self._stats["restarted"] += 1
+            try:
+                worker.connection.send(payload)
+            except OSError:
+                logger.exception("%s 送出事件失敗", worker.name)
+
+    def submit(self, key, payload, priority=HIGH):
+        """
+        把事件放進負責此鍵的 worker 的送出佇列（不阻塞）
+
+        Returns:
+            bool: 是否收下（False 時已呼叫 on_shed）
+        """
+        worker = self._workers[self.ring.node_for(key)]
+        with worker.condition:
+            depth = len(worker.outbox)
+            reason = None
+            if not self._running:
+                reason = "closed"
+            elif depth >= self.max_depth:
+                reason = "full"
+            elif priority == LOW and depth >= self.shed_depth:
+                reason = "overload"
+            if reason is None:
+                worker.outbox.append(payload)
+                worker.condition.notify()
+        with self._stats_lock:
+            self._stats["accepted" if reason is None else f"shed_{reason}"] += 1
+        if reason is None:
+            return True
+        if self.on_shed is not None:
+            try:
+                self.on_shed(payload, reason)
+            except Exception:
+                logger.exception("回覆忙碌訊息失敗")
+        return False
+
+    def depth(self):
+        return sum(len(worker.outbox) for worker in self._workers.values())
+
+    def stats(self):
+        """
+        分派統計
+
+        Returns:
+            dict: depth（各送出佇列合計）、accepted、shed_closed／shed_full／shed_overload（各原因捨棄數）、
+                  restarted（重新啟動 worker 的次數）
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["depth"] = self.depth()
+        return stats
+
+    def stop(self, timeout=5):
+        """
+        通知所有 worker 在 timeout 秒內處理完已收下的事件後結束
+
+        期限到時還沒處理的事件交給 on_leftover 保存；沒有 on_leftover 時會繼續處理到完。
+        """
+        self._running = False
+        self._stop_at.value = time.time() + timeout
+        for worker in self._workers.values():
+            with worker.condition:
+                worker.outbox.append(_STOP)
+                worker.condition.notify()
+        deadline = time.monotonic() + timeout + DISPATCH_SAVE_SECONDS
+        leftover = []
+        for worker in self._workers.values():
+            worker.sender.join(max(0.0, deadline - time.monotonic()))
+            with worker.condition:
+                # 送出執行緒卡在已滿的 Pipe 上時，還沒送出的事件由前端保存
+                leftover += [payload for payload in worker.outbox if payload is not _STOP]
+                worker.outbox.clear()
+        for worker in self._workers.values():
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning("%s 未在期限內結束，Pipe 中的事件可能遺失", worker.name)
+        if leftover and self.on_leftover is not None:
+            self.on_leftover(leftover)
@@ -0,0 +1,297 @@
+"""
+對局事件記錄 - 以事件重建對局狀態，支援撤銷與重做
+
+每個會改變對局的動作（加入、退出、選風、設定莊家、胡牌、流局）都記錄成一筆事件，
+players / hands 表格與 Game.round_state 則是事件套用後的投影。每 SNAPSHOT_INTERVAL 筆事件存一次
+狀態快照，重建任一時間點只需從最近的快照往後重播，不必從頭開始。
+
+Game.event_seq 是目前已套用的事件序號；序號更大的事件構成重做堆疊，
+在撤銷後新增事件時會被清除。
+"""
+import json
+import os
+from models.game_event import GameEvent
+from models.game_snapshot import GameSnapshot
+from models.hand import Hand
+from models.player import Player
+from services.dealer import start_round_state, advance_round_state, unpack_round_state
+from services.game_lookup import sync_seats
+from utils.tiles import WINDS
+
+SNAPSHOT_INTERVAL = int(os.getenv("EVENT_SNAPSHOT_INTERVAL", "20"))
+
+EVENT_TYPES = ("join", "quit", "wind", "dealer", "hand", "draw")
+
+def initial_state():
+    """尚未有任何事件時的對局狀態"""
+    return {"status": "created", "players": {}, "hand_count": 0, "round_state": 0}
+
+def apply_event(state, event_type, payload):
+    """
+    將一筆事件套用到對局狀態（直接修改 state）
+
+    state["players"] 以 line_user_id 為鍵：
+        {"nickname", "seat_number", "wind_position", "is_dealer", "score"}
+    """
+    players = state["players"]
+
+    if event_type == "join":
+        players[payload["line_user_id"]] = {
+            "nickname": payload["nickname"],
+            "seat_number": len(players) + 1,
+            "wind_position": None,
+            "is_dealer": "no",
+            "score": 0
+        }
+
+    elif event_type == "quit":
+        players.pop(payload["line_user_id"], None)
+        # 重新編號剩餘玩家的座位
+        ordered = sorted(players.values(), key=lambda p: p["seat_number"])
+        for seat, player in enumerate(ordered, 1):
+            player["seat_number"] = seat
+
+    elif event_type == "wind":
+        players[payload["line_user_id"]]["wind_position"] = payload["wind"]
+
+    elif event_type == "dealer":
+        for user_id, player in players.items():
+            player["is_dealer"] = "yes" if user_id == payload["line_user_id"] else "no"
+        state["status"] = "playing"
+        state["round_state"] = start_round_state(WINDS.index(players[payload["line_user_id"]]["wind_position"]))
+
+    elif event_type == "hand":
+        for user_id, delta in payload["deltas"].items():
+            players[user_id]["score"] += delta
+        state["hand_count"] = payload["hand_number"]
+        _advance_dealer(state, payload["winner"] == payload["dealer"])
+
+    elif event_type == "draw":
+        # 流局：莊家連莊
+        _advance_dealer(state, True)
+
+    else:
+        raise ValueError(f"未知的事件類型：{event_type}")
+
+    return state
+
+def describe_event(event_type, payload):
+    """將事件轉為簡短的中文描述，用於撤銷／重做訊息"""
+    nickname = payload.get("nickname", "")
+    if event_type == "join":
+        return f"{nickname} 加入對局"
+    if event_type == "quit":
+        return f"{nickname} 退出對局"
+    if event_type == "wind":
+        return f"{nickname} 選擇 {payload['wind']}風"
+    if event_type == "dealer":
+        return f"{nickname} 當莊"
+    if event_type == "hand":
+        win_type = "自摸" if payload["loser"] is None else "放槍"
+        return f"第 {payload['hand_number']} 手 {nickname} 胡牌（{win_type}，{payload['tai']} 台）"
+    if event_type == "draw":
+        return "流局"
+    return event_type
+
+def _advance_dealer(state, dealer_kept):
+    """推進圈風／莊家狀態，並把 is_dealer 標記移到新莊家"""
+    players = state["players"]
+    if not state["round_state"]:
+        # 狀態機上線前開始的對局：以目前莊家的風位作為起點
+        dealer = next((p for p in players.values() if p["is_dealer"] == "yes" and p["wind_position"]), None)
+        if dealer is None:
+            return
+        state["round_state"] = start_round_state(WINDS.index(dealer["wind_position"]))
+
+    state["round_state"] = advance_round_state(state["round_state"], dealer_kept)
+    dealer_wind = WINDS[unpack_round_state(state["round_state"]).dealer_position]
+    for player in players.values():
+        player["is_dealer"] = "yes" if player["wind_position"] == dealer_wind else "no"
+
+def state_from_rows(db, game):
+    """由目前的投影表格讀出對局狀態（投影即為最新狀態，不需重播）"""
+    players = db.query(Player).filter(Player.game_id == game.id).all()
+    return {
+        "status": game.status,
+        "players": {
+            p.line_user_id: {
+                "nickname": p.nickname,
+                "seat_number": p.seat_number,
+                "wind_position": p.wind_position,
+                "is_dealer": p.is_dealer,
+                "score": p.score or 0
+            }
+            for p in players
+        },
+        "hand_count": db.query(Hand).filter(Hand.game_id == game.id).count(),
+        "round_state": game.round_state or 0
+    }
+
+def append_event(db, game, event_type, payload):
+    """
+    新增一筆事件並更新投影表格（不 commit，由呼叫端決定）
+
+    Returns:
+        dict: 套用事件後的對局狀態
+    """
+    head = game.event_seq or 0
+
+    # 新事件會讓撤銷過的事件失效
+    db.query(GameEvent).filter(GameEvent.game_id == game.id, GameEvent.seq > head).delete()
+    db.query(GameSnapshot).filter(GameSnapshot.game_id == game.id, GameSnapshot.seq > head).delete()
+
+    state = state_from_rows(db, game)
+    if head == 0 and state["players"]:
+        # 事件記錄上線前建立的對局：先保存現況當作起點
+        db.add(GameSnapshot(game_id=game.id, seq=0, state=json.dumps(state, ensure_ascii=False)))
+    apply_event(state, event_type, payload)
+
+    seq = head + 1
+    db.add(GameEvent(
+        game_id=game.id,
+        seq=seq,
+        event_type=event_type,
+        payload=json.dumps(payload, ensure_ascii=False)
+    ))
+    _project(db, game, state, [(event_type, payload)])
+    game.event_seq = seq
+
+    if seq % SNAPSHOT_INTERVAL == 0:
+        db.add(GameSnapshot(game_id=game.id, seq=seq, state=json.dumps(state, ensure_ascii=False)))
+
+    db.flush()
+    return state
+
+def rebuild_state(db, game_id, seq):
+    """
+    重建對局在指定事件序號時的狀態：從最近的快照往後重播
+
+    Returns:
+        tuple: (狀態, 重播的事件列表 [(event_type, payload), ...])
+    """
+    snapshot = db.query(GameSnapshot).filter(
+        GameSnapshot.game_id == game_id,
+        GameSnapshot.seq <= seq
+    ).order_by(GameSnapshot.seq.desc()).first()
+
+    if snapshot:
+        state = json.loads(snapshot.state)
+        state.setdefault("round_state", 0)
+        start = snapshot.seq
+    else:
+        state = initial_state()
+        start = 0
+
+    events = db.query(GameEvent).filter(
+        GameEvent.game_id == game_id,
+        GameEvent.seq > start,
+        GameEvent.seq <= seq
+    ).order_by(GameEvent.seq).all()
+
+    replayed = []
+    for event in events:
+        payload = json.loads(event.payload)
+        apply_event(state, event.event_type, payload)
+        replayed.append((event.event_type, payload))
+
+    return state, replayed
+
+def undo_last_event(db, game):
+    """
+    撤銷最後一筆事件（不 commit）
+
+    Returns:
+        tuple: (event_type, payload)，沒有可撤銷的事件時回傳 None
+    """
+    head = game.event_seq or 0
+    if head == 0:
+        return None
+
+    event = db.query(GameEvent).filter(
+        GameEvent.game_id == game.id,
+        GameEvent.seq == head
+    ).first()
+    if not event:
+        return None
+
+    state, replayed = rebuild_state(db, game.id, head - 1)
+    _project(db, game, state, replayed)
+    game.event_seq = head - 1
+    db.flush()
+
+    return event.event_type, json.loads(event.payload)
+
+def redo_event(db, game):
+    """
+    重做最近一次撤銷的事件（不 commit）
+
+    Returns:
+        tuple: (event_type, payload)，沒有可重做的事件時回傳 None
+    """
+    head = game.event_seq or 0
+    event = db.query(GameEvent).filter(
+        GameEvent.game_id == game.id,
+        GameEvent.seq == head + 1
+    ).first()
+    if not event:
+        return None
+
+    payload = json.loads(event.payload)
+    state = apply_event(state_from_rows(db, game), event.event_type, payload)
+    _project(db, game, state, [(event.event_type, payload)])
+    game.event_seq = head + 1
+    db.flush()
+
+    return event.event_type, payload
+
+def _project(db, game, state, applied):
+    """將對局狀態寫回 players / hands / active_seats 投影表格"""
+    rows = {p.line_user_id: p for p in db.query(Player).filter(Player.game_id == game.id).all()}
+
+    for user_id, row in rows.items():
+        if user_id not in state["players"]:
+            db.delete(row)
+
+    for user_id, data in state["players"].items():
+        row = rows.get(user_id)
+        if row is None:
+            row = Player(game_id=game.id, line_user_id=user_id)
+            db.add(row)
+            rows[user_id] = row
+        row.nickname = data["nickname"]
+        row.seat_number = data["seat_number"]
+        row.wind_position = data["wind_position"]
+        row.is_dealer = data["is_dealer"]
+        row.score = data["score"]
+
+    game.status = state["status"]
+    game.round_state = state["round_state"]
+    db.flush()
+    sync_seats(db, game, set(state["players"]))
+
+    # 撤銷的胡牌記錄直接刪除；新套用的胡牌事件補上記錄
+    hand_count = state["hand_count"]
+    db.query(Hand).filter(Hand.game_id == game.id, Hand.hand_number > hand_count).delete()
+
+    hand_events = [payload for event_type, payload in applied
+                   if event_type == "hand" and payload["hand_number"] <= hand_count]
+    if not hand_events:
+        return
+
+    existing = {number for (number,) in db.query(Hand.hand_number).filter(Hand.game_id == game.id)}
+    for payload in hand_events:
+        if payload["hand_number"] in existing:
+            continue
+        db.add(Hand(
+            game_id=game.id,
+            hand_number=payload["hand_number"],
+            winner_player_id=rows[payload["winner"]].id,
+            loser_player_id=rows[payload["loser"]].id if payload["loser"] else None,
+            dealer_player_id=rows[payload["dealer"]].id if payload["dealer"] else None,
+            is_self_drawn=payload["loser"] is None,
+            tai=payload["tai"],
+            dealer_tai=payload["dealer_tai"],
+            pattern_mask=payload["pattern_mask"],
+            tiles=payload["tiles"],
+            amount=payload["deltas"][payload["winner"]]
+        ))
@@ -0,0 +1,103 @@
+"""
+進行中對局查詢 - 同一群組可同時開多桌
+
+查詢順序：
+    1. 指令有指定桌號（#A）→ 以 (group_id, status, table_code) 索引查詢
+    2. 發送者已入座 → 以 active_seats 的 (group_id, line_user_id) 主鍵查詢
+    3. 群組只有一桌進行中 → 直接使用該桌
+    4. 有多桌且無法判斷 → 拋出 AmbiguousTableError，請使用者指定桌號
+"""
+from models.active_seat import ActiveSeat
+from models.game import Game
+
+ACTIVE_STATUSES = ["created", "playing"]
+TABLE_CODES = "ABCDEFGH"
+
+class AmbiguousTableError(ValueError):
+    """群組有多桌進行中，且無法從指令或座位判斷是哪一桌"""
+
+    def __init__(self, table_codes):
+        self.table_codes = table_codes
+        codes = "、".join(table_codes)
+        super().__init__(
+            f"此群組有 {len(table_codes)} 桌進行中（{codes}），請在指令後加上桌號，例如 #{table_codes[0]}"
+        )
+
+def list_active_games(db, group_id):
+    """列出群組內所有進行中的對局（依桌號排序）"""
+    return db.query(Game).filter(
+        Game.group_id == group_id,
+        Game.status.in_(ACTIVE_STATUSES)
+    ).order_by(Game.table_code).all()
+
+def find_game_by_table(db, group_id, table_code):
+    """以桌號查詢進行中的對局"""
+    return db.query(Game).filter(
+        Game.group_id == group_id,
+        Game.status.in_(ACTIVE_STATUSES),
+        Game.table_code == table_code
+    ).first()
+
+def find_seated_game(db, group_id, user_id):
+    """查詢使用者在此群組入座的進行中對局"""
+    seat = db.get(ActiveSeat, (group_id, user_id))
+    if not seat:
+        return None
+    game = db.get(Game, seat.game_id)
+    if game is None or game.status not in ACTIVE_STATUSES:
+        return None
+    return game
+
+def find_active_game(db, group_id, user_id=None, table_code=None):
+    """
+    找出指令要操作的進行中對局
+
+    Returns:
+        Game: 找不到時回傳 None
+
+    Raises:
+        AmbiguousTableError: 群組有多桌進行中且無法判斷時
+    """
+    if table_code:
+        return find_game_by_table(db, group_id, table_code)
+
+    if user_id:
+        game = find_seated_game(db, group_id, user_id)
+        if game:
+            return game
+
+    games = list_active_games(db, group_id)
+    if len(games) > 1:
+        raise AmbiguousTableError([g.table_code for g in games])
+    return games[0] if games else None
+
+def next_table_code(db, group_id):
+    """取得群組內下一個可用的桌號，全部使用中時回傳 None"""
+    used = {g.table_code for g in list_active_games(db, group_id)}
+    return next((code for code in TABLE_CODES if code not in used), None)
+
+def sync_seats(db, game, user_ids):
+    """讓 active_seats 與對局目前的玩家一致"""
+    seats = db.query(ActiveSeat).filter(ActiveSeat.game_id == game.id).all()
+    seated = set()
+    for seat in seats:
+        if seat.line_user_id in user_ids and game.status in ACTIVE_STATUSES:
+            seated.add(seat.line_user_id)
+        else:
+            db.delete(seat)
+
+    if game.status not in ACTIVE_STATUSES:
+        return
+    for user_id in user_ids:
+        if user_id in seated:
+            continue
+        # 已結束但未釋放的舊座位直接改指向此對局
+        seat = db.get(ActiveSeat, (game.group_id, user_id))
+        if seat:
+            seat.game_id = game.id
+        else:
+            db.add(ActiveSeat(group_id=game.group_id, line_user_id=user_id, game_id=game.id))
+
+def release_seats(db, game):
+    """對局結束時釋放所有座位"""
+    db.query(ActiveSeat).filter(ActiveSeat.game_id == game.id).delete()
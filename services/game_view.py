@@ -0,0 +1,125 @@
+"""
+對局唯讀檢視 - 以 Core select() 讀出欄位，組成 namedtuple，不經過 ORM
+
+/狀態、加入成功與莊家設定完成的訊息只需要幾個欄位組字串，
+不需要 ORM 實體的 identity map、屬性 instrumentation 與變更追蹤：
+- GameView、PlayerView 直接由查詢結果的 row tuple 建立，沒有逐欄位的屬性事件
+- 快取的進行中對局（對局 + 四位玩家）只佔幾百 bytes
+
+快取以群組版本號（services.invalidation）判斷是否過期：本程序或其他 worker 修改群組後
+版本號改變，下一次讀取就會重新查詢；通知漏接時最多 GAME_VIEW_CACHE_SECONDS 秒後也會重新讀取。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import func, select
+
+from models.active_seat import ActiveSeat
+from models.game import Game
+from models.player import Player
+from services.game_lookup import ACTIVE_STATUSES, AmbiguousTableError
+from services.invalidation import known_version
+
+GAME_VIEW_CACHE_SIZE = int(os.getenv("GAME_VIEW_CACHE_SIZE", "1024"))
+GAME_VIEW_CACHE_SECONDS = float(os.getenv("GAME_VIEW_CACHE_SECONDS", "60"))
+
+GameView = namedtuple(
+    "GameView", "id group_id table_code mode per_point base_score collect_money status event_seq round_state"
+)
+PlayerView = namedtuple("PlayerView", "seat_number nickname wind_position is_dealer score")
+ActiveGame = namedtuple("ActiveGame", "version game players")
+
+_GAME_COLUMNS = tuple(getattr(Game, name) for name in GameView._fields)
+_PLAYER_COLUMNS = tuple(getattr(Player, name) for name in PlayerView._fields)
+
+def _active_games():
+    return select(*_GAME_COLUMNS).where(Game.status.in_(ACTIVE_STATUSES))
+
+def load_game(db, game_id):
+    """讀取單一對局，找不到時回傳 None"""
+    row = db.execute(select(*_GAME_COLUMNS).where(Game.id == game_id)).first()
+    return GameView._make(row) if row else None
+
+def load_players(db, game_id):
+    """讀取對局的玩家（依座位排序）"""
+    rows = db.execute(
+        select(*_PLAYER_COLUMNS).where(Player.game_id == game_id).order_by(Player.seat_number)
+    ).all()
+    return tuple(PlayerView._make(row) for row in rows)
+
+def list_active_views(db, group_id):
+    """列出群組內所有進行中的對局（依桌號排序）"""
+    rows = db.execute(_active_games().where(Game.group_id == group_id).order_by(Game.table_code)).all()
+    return [GameView._make(row) for row in rows]
+
+def count_players(db, game_ids):
+    """各對局的玩家人數（一次查詢）"""
+    if not game_ids:
+        return {}
+    rows = db.execute(
+        select(Player.game_id, func.count()).where(Player.game_id.in_(game_ids)).group_by(Player.game_id)
+    ).all()
+    return dict(rows)
+
+def find_active_view(db, group_id, user_id=None, table_code=None):
+    """
+    與 services.game_lookup.find_active_game 相同的查詢順序，回傳 GameView
+
+    Raises:
+        AmbiguousTableError: 群組有多桌進行中且無法判斷時
+    """
+    if table_code:
+        row = db.execute(
+            _active_games().where(Game.group_id == group_id, Game.table_code == table_code)
+        ).first()
+        return GameView._make(row) if row else None
+
+    if user_id:
+        row = db.execute(
+            _active_games()
+            .join(ActiveSeat, ActiveSeat.game_id == Game.id)
+            .where(ActiveSeat.group_id == group_id, ActiveSeat.line_user_id == user_id)
+        ).first()
+        if row:
+            return GameView._make(row)
+
+    games = list_active_views(db, group_id)
+    if len(games) > 1:
+        raise AmbiguousTableError([g.table_code for g in games])
+    return games[0] if games else None
+
+_cache = OrderedDict()  # game_id → (ActiveGame, 載入時間)
+_cache_lock = threading.Lock()
+
+def reset_cache():
+    """清除本程序的對局檢視快取"""
+    with _cache_lock:
+        _cache.clear()
+
+def get_active_game(db, game_id, group_id):
+    """
+    取得對局與玩家的唯讀檢視（群組版本號未變時直接使用快取）
+
+    Returns:
+        ActiveGame: version（載入時的群組版本號）、game（GameView）、players（PlayerView 的 tuple）
+    """
+    # 先記下版本號再查詢：查詢期間若有其他交易提交，版本號已變，下一次會重新讀取
+    version = known_version(group_id)
+    with _cache_lock:
+        entry = _cache.get(game_id)
+        if entry is not None and entry[0].version == version and time.monotonic() - entry[1] < GAME_VIEW_CACHE_SECONDS:
+            _cache.move_to_end(game_id)
+            return entry[0]
+
+    view = load_game(db, game_id)
+    if view is None:
+        return None
+    active = ActiveGame(version, view, load_players(db, game_id))
+    with _cache_lock:
+        _cache[game_id] = (active, time.monotonic())
+        _cache.move_to_end(game_id)
+        while len(_cache) > GAME_VIEW_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return active
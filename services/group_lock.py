@@ -0,0 +1,119 @@
+"""
+群組鎖 - 讓多個 worker 程序對同一群組的修改依序進行
+
+gunicorn 的 worker 各自是獨立程序，程序內的 threading.Lock 擋不住兩個 worker
+同時處理同一群組的 /加入、/選風、/退出（座位重新編號）而互相覆蓋。
+鎖的範圍是「一個群組、一筆交易」：不同群組互不阻擋，交易結束（commit／rollback／close）即釋放。
+
+- PostgreSQL：pg_advisory_xact_lock(群組鍵)，交易結束時由資料庫自動釋放
+- SQLite：以 flock 鎖住每個群組一個的鎖檔；沒有 fcntl 的平台改用 BEGIN IMMEDIATE（整個資料庫的寫入鎖）
+
+同一個 Session 每筆交易只能呼叫一次 lock_group，重複取得同一群組的檔案鎖會自己等自己。
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from utils.hashing import stable_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+GROUP_LOCK_DIR = os.getenv("GROUP_LOCK_DIR", os.path.join(tempfile.gettempdir(), "mahjong-locks"))
+LOCK_SLOW_SECONDS = float(os.getenv("LOCK_SLOW_SECONDS", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+_LOCK_FILES = "group_lock_files"  # Session.info 中本交易持有的鎖檔
+
+_stats = {"acquired": 0, "total_wait": 0.0, "max_wait": 0.0, "slow": 0}
+_stats_lock = threading.Lock()
+
+def lock_key(group_id):
+    """群組 ID → 有號 64 位元鎖鍵（各 worker 算出相同的鍵）"""
+    return stable_hash(group_id, signed=True)
+
+def _record_wait(group_id, waited):
+    with _stats_lock:
+        _stats["acquired"] += 1
+        _stats["total_wait"] += waited
+        _stats["max_wait"] = max(_stats["max_wait"], waited)
+        if waited >= LOCK_SLOW_SECONDS:
+            _stats["slow"] += 1
+    if waited >= LOCK_SLOW_SECONDS:
+        logger.warning("群組 %s 等待群組鎖 %.3f 秒", group_id, waited)
+
+def lock_stats():
+    """
+    本程序的群組鎖等待統計
+
+    Returns:
+        dict: acquired（取得次數）、total_wait／max_wait／avg_wait（秒）、slow（超過 LOCK_SLOW_SECONDS 的次數）
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_wait"] = stats["total_wait"] / stats["acquired"] if stats["acquired"] else 0.0
+    return stats
+
+def reset_lock_stats():
+    """清除本程序的群組鎖統計"""
+    with _stats_lock:
+        _stats.update(acquired=0, total_wait=0.0, max_wait=0.0, slow=0)
+
+def _lock_file(db, key):
+    """鎖住群組的鎖檔，檔案記在 Session.info，交易結束時由 _release_files 釋放"""
+    os.makedirs(GROUP_LOCK_DIR, exist_ok=True)
+    path = os.path.join(GROUP_LOCK_DIR, f"group-{key & 0xFFFFFFFFFFFFFFFF:016x}.lock")
+    handle = open(path, "a+b")
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    except BaseException:
+        handle.close()
+        raise
+    db.info.setdefault(_LOCK_FILES, []).append(handle)
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_files(session, transaction):
+    """最外層交易結束（commit／rollback／close）時關閉鎖檔，關閉檔案即釋放 flock"""
+    if transaction.parent is not None or _LOCK_FILES not in session.info:
+        return
+    for handle in session.info.pop(_LOCK_FILES):
+        handle.close()
+
+def lock_group(db, group_id):
+    """
+    在目前交易內取得群組鎖，交易結束時釋放
+
+    Args:
+        db: 資料庫 Session
+        group_id: LINE 群組 ID（None 時不加鎖）
+
+    Returns:
+        float: 等待鎖的秒數
+    """
+    if not group_id:
+        return 0.0
+
+    started = time.perf_counter()
+    key = lock_key(group_id)
+    dialect = db.get_bind().dialect.name
+    connection = db.connection()  # 開始交易，鎖的生命週期跟著這筆交易
+
+    if dialect == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+    elif dialect == "sqlite":
+        if fcntl is not None:
+            _lock_file(db, key)
+        else:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    waited = time.perf_counter() - started
+    _record_wait(group_id, waited)
+    return waited
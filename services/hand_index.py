@@ -0,0 +1,105 @@
+"""
+胡牌台型倒排索引 - (胡牌者, 台型) → 胡牌記錄
+
+對局結算時把每一手的 pattern_mask 拆成台型編號，每個台型寫一筆，
+另外每一手固定寫一筆 ALL_WINS，用來統計胡牌次數與放槍者。
+「今年胡了幾次清一色」「誰最常放槍給我」都只需掃描 (胡牌者, 台型, ...) 索引，
+不必讀取 hands 表或解開位元遮罩。
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select
+
+from models.hand_pattern import HandPattern
+from services.leaderboard import LEADERBOARD_TIMEZONE, MONTHLY, period_start
+from services.scoring import RULE_SPECS
+
+ALL_WINS = -1  # 每一手都會寫入的台型編號
+
+PATTERN_CODES = {spec.name: code for code, spec in enumerate(RULE_SPECS) if not spec.dealer}
+PATTERN_NAMES = {code: name for name, code in PATTERN_CODES.items()}
+
+def pattern_codes(pattern_mask):
+    """將 pattern_mask 拆成台型編號（位元位置）"""
+    return [code for code in PATTERN_NAMES if pattern_mask >> code & 1]
+
+def local_date(moment):
+    """時間 → 排行榜時區的日期（未帶時區的時間視為 UTC）"""
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(LEADERBOARD_TIMEZONE).date()
+
+def period_since(period, now=None):
+    """查詢期間（今年、本月、全部）的起始日，全部為 None"""
+    if period == "本月":
+        return period_start(MONTHLY, now)
+    if period == "今年":
+        return local_date(now).replace(month=1, day=1)
+    return None
+
+def hand_postings(hand_id, winner_id, loser_id, pattern_mask, won_on):
+    """一手胡牌的所有索引列"""
+    return [
+        {"line_user_id": winner_id, "pattern": code, "hand_id": hand_id, "won_on": won_on, "loser_id": loser_id}
+        for code in [ALL_WINS] + pattern_codes(pattern_mask or 0)
+    ]
+
+def index_hands(db, players, hands):
+    """
+    對局結算時寫入本局所有胡牌的台型索引（單一 INSERT）
+
+    Args:
+        players: 本局玩家（Player 列）
+        hands: 本局胡牌記錄（Hand 列）
+    """
+    user_ids = {p.id: p.line_user_id for p in players}
+    rows = []
+    for hand in hands:
+        winner_id = user_ids.get(hand.winner_player_id)
+        if winner_id is None:
+            continue
+        rows += hand_postings(hand.id, winner_id, user_ids.get(hand.loser_player_id),
+                              hand.pattern_mask, local_date(hand.created_at))
+    if rows:
+        db.execute(insert(HandPattern).values(rows))
+    return len(rows)
+
+def _period_filter(query, since):
+    return query.where(HandPattern.won_on >= since) if since else query
+
+def count_pattern(db, line_user_id, pattern, since=None):
+    """期間內以某台型胡牌的次數（pattern 為 ALL_WINS 時為胡牌總次數）"""
+    query = select(func.count()).select_from(HandPattern).where(
+        HandPattern.line_user_id == line_user_id, HandPattern.pattern == pattern
+    )
+    return db.execute(_period_filter(query, since)).scalar() or 0
+
+def pattern_counts(db, line_user_id, since=None):
+    """
+    期間內各台型的胡牌次數（依次數排序）
+
+    Returns:
+        list: [(台型名稱, 次數), ...]
+    """
+    query = select(HandPattern.pattern, func.count()).where(
+        HandPattern.line_user_id == line_user_id, HandPattern.pattern != ALL_WINS
+    ).group_by(HandPattern.pattern)
+    rows = db.execute(_period_filter(query, since)).all()
+    return sorted(((PATTERN_NAMES.get(code, str(code)), count) for code, count in rows),
+                  key=lambda row: -row[1])
+
+def top_feeders(db, line_user_id, pattern=ALL_WINS, since=None, limit=3):
+    """
+    期間內最常放槍給此玩家的對手
+
+    Returns:
+        list: [(放槍者 line_user_id, 次數), ...]
+    """
+    count = func.count().label("count")
+    query = select(HandPattern.loser_id, count).where(
+        HandPattern.line_user_id == line_user_id,
+        HandPattern.pattern == pattern,
+        HandPattern.loser_id.is_not(None)
+    ).group_by(HandPattern.loser_id).order_by(count.desc(), HandPattern.loser_id).limit(limit)
+    return db.execute(_period_filter(query, since)).all()
@@ -0,0 +1,206 @@
+"""
+跨 worker 快取失效通知 - 群組資料每次提交都遞增版本號，各 worker 據此清除本程序的快取
+
+- 修改群組的 handler 在交易內呼叫 touch_group，提交前遞增 group_versions 的版本號
+- PostgreSQL：同一筆交易內 pg_notify，提交後才送出，其他 worker 以 LISTEN 接收
+- 其他資料庫（SQLite、單一程序）：定期查詢最近變動的版本號
+- 本程序提交後立即通知訂閱者，不必等通知繞一圈回來
+
+訂閱者以 subscribe(callback) 註冊，callback(group_id, version) 收到每個群組的新版本號
+（同一版本只通知一次）。鍵不一定是群組 ID：只在特定資料變動時才需要清除的快取
+使用自己的鍵（例如預設規則的 preset:<group_id>），訂閱者依前綴過濾。
+"""
+import logging
+import os
+import select
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, select as sql_select, text, update
+from sqlalchemy.orm import Session
+
+from models.group_version import GroupVersion
+
+CHANNEL = "mahjong_invalidate"
+INVALIDATION_POLL_SECONDS = float(os.getenv("INVALIDATION_POLL_SECONDS", "2"))
+
+logger = logging.getLogger(__name__)
+
+_TOUCHED = "invalidation_touched"      # Session.info：本 Session 修改過的群組
+_FLUSHED = "invalidation_flushed"      # Session.info：本交易是否寫入過資料
+_PUBLISHED = "invalidation_published"  # Session.info：提交後要通知本程序的 (群組, 版本)
+
+_subscribers = []
+_known = {}  # group_id → 本程序已通知過的最新版本
+_known_lock = threading.Lock()
+
+def subscribe(callback):
+    """註冊快取失效的訂閱者 callback(group_id, version)"""
+    _subscribers.append(callback)
+    return callback
+
+def touch_group(db, group_id):
+    """標記本 Session 會修改此群組，交易提交時遞增版本號並送出通知"""
+    if group_id:
+        db.info.setdefault(_TOUCHED, set()).add(group_id)
+
+def known_version(group_id):
+    """本程序已知的群組版本號（未知時為 0）"""
+    with _known_lock:
+        return _known.get(group_id, 0)
+
+def current_version(db, group_id):
+    """從資料庫讀取群組目前的版本號（沒有紀錄時為 0）"""
+    version = db.execute(
+        sql_select(GroupVersion.version).where(GroupVersion.group_id == group_id)
+    ).scalar()
+    return version or 0
+
+def bump_version(db, group_id, now=None):
+    """
+    遞增群組版本號（呼叫端需持有群組鎖或自行處理並發）
+
+    Returns:
+        int: 新的版本號
+    """
+    now = now or datetime.now(timezone.utc)
+    result = db.execute(
+        update(GroupVersion)
+        .where(GroupVersion.group_id == group_id)
+        .values(version=GroupVersion.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        db.add(GroupVersion(group_id=group_id, version=1, updated_at=now))
+        db.flush()
+        return 1
+    return current_version(db, group_id)
+
+def deliver(group_id, version):
+    """通知訂閱者群組有新版本（舊的或已通知過的版本忽略）"""
+    with _known_lock:
+        if _known.get(group_id, 0) >= version:
+            return False
+        _known[group_id] = version
+    for callback in list(_subscribers):
+        try:
+            callback(group_id, version)
+        except Exception:
+            logger.exception("群組 %s 版本 %s 的快取失效通知失敗", group_id, version)
+    return True
+
+def reset_known():
+    """清除本程序記錄的版本號"""
+    with _known_lock:
+        _known.clear()
+
+@event.listens_for(Session, "after_flush")
+def _mark_flushed(session, flush_context):
+    if _TOUCHED in session.info:
+        session.info[_FLUSHED] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    # query.delete()、insert().values([...]) 之類的批次寫入不經過 flush
+    session = orm_execute_state.session
+    if _TOUCHED in session.info and not orm_execute_state.is_select:
+        session.info[_FLUSHED] = True
+
+@event.listens_for(Session, "before_commit")
+def _publish(session):
+    """提交前遞增修改過的群組版本號；PostgreSQL 的 NOTIFY 會在提交後才送出"""
+    touched = session.info.get(_TOUCHED)
+    if not touched:
+        return
+    if not (session.info.get(_FLUSHED) or session.new or session.dirty or session.deleted):
+        return  # 這筆交易沒有寫入任何資料
+
+    notify = session.get_bind().dialect.name == "postgresql"
+    published = []
+    for group_id in sorted(touched):
+        version = bump_version(session, group_id)
+        if notify:
+            session.execute(text("SELECT pg_notify(:channel, :payload)"),
+                            {"channel": CHANNEL, "payload": f"{version}:{group_id}"})
+        published.append((group_id, version))
+    session.info[_PUBLISHED] = published
+
+@event.listens_for(Session, "after_commit")
+def _deliver_local(session):
+    session.info.pop(_FLUSHED, None)
+    for group_id, version in session.info.pop(_PUBLISHED, ()):
+        deliver(group_id, version)
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_FLUSHED, None)
+    session.info.pop(_PUBLISHED, None)
+
+def poll_versions(db, since):
+    """
+    讀取 since 之後變動的群組版本號並通知訂閱者
+
+    Returns:
+        int: 有新版本的群組數
+    """
+    rows = db.execute(
+        sql_select(GroupVersion.group_id, GroupVersion.version).where(GroupVersion.updated_at >= since)
+    ).all()
+    return sum(1 for group_id, version in rows if deliver(group_id, version))
+
+class InvalidationConsumer(threading.Thread):
+    """
+    每個 worker 一個的背景執行緒：PostgreSQL 用 LISTEN 接收通知，其他資料庫定期查詢版本表
+    """
+
+    def __init__(self, engine, poll_seconds=None):
+        super().__init__(name="invalidation-consumer", daemon=True)
+        self.engine = engine
+        self.poll_seconds = poll_seconds or INVALIDATION_POLL_SECONDS
+        self._stop_event = threading.Event()
+        self._since = datetime.now(timezone.utc)  # 補查的起點：啟動或斷線的時間
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.engine.dialect.name == "postgresql":
+                    self._listen()
+                else:
+                    self._poll()
+            except Exception:
+                logger.exception("快取失效通知中斷，%s 秒後重試", self.poll_seconds)
+                self._stop_event.wait(self.poll_seconds)
+
+    def _catch_up(self, since):
+        with Session(self.engine) as db:
+            poll_versions(db, since)
+
+    def _poll(self):
+        # 往回多看一個週期，避免提交時間與 updated_at 之間的落差漏掉變動
+        while not self._stop_event.wait(self.poll_seconds):
+            started = datetime.now(timezone.utc)
+            self._catch_up(self._since - timedelta(seconds=self.poll_seconds))
+            self._since = started
+
+    def _listen(self):
+        connection = self.engine.raw_connection()
+        try:
+            dbapi = connection.driver_connection
+            dbapi.autocommit = True
+            with dbapi.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            # 連線中斷期間可能漏掉通知，重新 LISTEN 後補查一次
+            self._catch_up(self._since - timedelta(seconds=self.poll_seconds))
+            while not self._stop_event.is_set():
+                if select.select([dbapi], [], [], self.poll_seconds) == ([], [], []):
+                    continue
+                dbapi.poll()
+                while dbapi.notifies:
+                    payload = dbapi.notifies.pop(0).payload
+                    version, group_id = payload.split(":", 1)
+                    deliver(group_id, int(version))
+        finally:
+            self._since = datetime.now(timezone.utc)
+            connection.invalidate()  # LISTEN 狀態不還給連線池
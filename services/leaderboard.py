@@ -0,0 +1,83 @@
+"""
+週／月排行榜 - 依 (群組, 期間, 使用者) 分桶累計輸贏
+
+對局結算時把每位玩家的分數累加到本週與本月的桶，
+期間排行只需以 (group_id, period, period_start, net_amount) 索引取前 N 名；
+過期的桶依期間起始日整批刪除。期間以 LEADERBOARD_TIMEZONE（預設 Asia/Taipei）切分。
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from models.leaderboard_bucket import LeaderboardBucket
+
+LEADERBOARD_TIMEZONE = ZoneInfo(os.getenv("LEADERBOARD_TIMEZONE", "Asia/Taipei"))
+KEEP_WEEKS = int(os.getenv("LEADERBOARD_KEEP_WEEKS", "12"))
+KEEP_MONTHS = int(os.getenv("LEADERBOARD_KEEP_MONTHS", "24"))
+
+WEEKLY = "W"
+MONTHLY = "M"
+PERIOD_NAMES = {WEEKLY: "本週", MONTHLY: "本月"}
+
+def period_start(period, now=None):
+    """取得 now 所在期間的起始日（依排行榜時區）"""
+    local_date = (now or datetime.now(timezone.utc)).astimezone(LEADERBOARD_TIMEZONE).date()
+    if period == WEEKLY:
+        return local_date - timedelta(days=local_date.weekday())
+    return local_date.replace(day=1)
+
+def record_game_buckets(db, game, players, now=None):
+    """
+    對局結算時將玩家分數累加到本週與本月的排行桶
+
+    Args:
+        game: 已結算的對局
+        players: 本局玩家（Player 列）
+    """
+    now = now or datetime.now(timezone.utc)
+    for period in (WEEKLY, MONTHLY):
+        start = period_start(period, now)
+        for p in players:
+            key = (game.group_id, period, start, p.line_user_id)
+            bucket = db.get(LeaderboardBucket, key)
+            if bucket is None:
+                bucket = LeaderboardBucket(group_id=game.group_id, period=period, period_start=start,
+                                           line_user_id=p.line_user_id, nickname=p.nickname,
+                                           games=0, net_amount=0)
+                db.add(bucket)
+            bucket.nickname = p.nickname
+            bucket.games = (bucket.games or 0) + 1
+            bucket.net_amount = (bucket.net_amount or 0) + (p.score or 0)
+
+def top_players(db, group_id, period, now=None, limit=10):
+    """取得群組本期淨輸贏前 N 名"""
+    return db.query(
+        LeaderboardBucket.nickname, LeaderboardBucket.games, LeaderboardBucket.net_amount
+    ).filter(
+        LeaderboardBucket.group_id == group_id,
+        LeaderboardBucket.period == period,
+        LeaderboardBucket.period_start == period_start(period, now)
+    ).order_by(LeaderboardBucket.net_amount.desc()).limit(limit).all()
+
+def prune_buckets(db, now=None, keep_weeks=None, keep_months=None):
+    """
+    整批刪除超過保留期限的排行桶
+
+    Returns:
+        int: 刪除的列數
+    """
+    keep_weeks = KEEP_WEEKS if keep_weeks is None else keep_weeks
+    keep_months = KEEP_MONTHS if keep_months is None else keep_months
+
+    week_cutoff = period_start(WEEKLY, now) - timedelta(weeks=keep_weeks)
+    month_cutoff = period_start(MONTHLY, now)
+    for _ in range(keep_months):
+        month_cutoff = (month_cutoff - timedelta(days=1)).replace(day=1)
+
+    deleted = 0
+    for period, cutoff in ((WEEKLY, week_cutoff), (MONTHLY, month_cutoff)):
+        deleted += db.query(LeaderboardBucket).filter(
+            LeaderboardBucket.period == period,
+            LeaderboardBucket.period_start < cutoff
+        ).delete(synchronize_session=False)
+    return deleted
@@ -0,0 +1,146 @@
+"""
+複式記帳帳本 - 每一手的輸贏記成「付款者 → 收款者」分錄
+
+對局結算時依已套用的胡牌事件產生分錄，每一手一批：
+先檢查本手所有玩家的變動加總為零，再以單一 INSERT 寫入整批分錄，
+同時累加每位玩家的收支彙總（user_balances）。
+撤銷／重做只發生在對局進行中，結算後才寫帳，因此帳本不需要沖銷分錄。
+群組鎖擋不住同一位玩家同時在兩個群組結算，彙總列先以 SELECT ... FOR UPDATE
+依 line_user_id 排序鎖住再累加，不會互相覆蓋，也不會因鎖定順序不同而死結。
+
+/我的統計、/排行榜 與 /結算 的金額都由帳本（或其彙總）取得。
+"""
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import case, func, insert, select
+
+from models.game_event import GameEvent
+from models.hand import Hand
+from models.ledger_entry import LedgerEntry
+from models.user_balance import UserBalance
+from utils.money import to_minor
+
+# 期初餘額的對手帳戶（帳本上線前的累計輸贏），不列入個人彙總
+OPENING_ACCOUNT = "__opening__"
+
+class UnbalancedBatchError(ValueError):
+    """同一批分錄的變動加總不為零"""
+
+def hand_transfers(deltas, winner):
+    """
+    將一手的分數變動轉為分錄
+
+    Args:
+        deltas: {line_user_id: 分數變動（元）}
+        winner: 胡牌者 line_user_id
+
+    Returns:
+        list: [(付款者, 收款者, 金額最小單位), ...]
+    """
+    if sum(deltas.values()) != 0:
+        raise UnbalancedBatchError(f"本手輸贏加總不為零：{deltas}")
+    transfers = [(user_id, winner, to_minor(-delta)) for user_id, delta in deltas.items() if delta < 0]
+    if sum(amount for _, _, amount in transfers) != to_minor(deltas.get(winner, 0)):
+        raise UnbalancedBatchError(f"付款總額與胡牌者收入不符：{deltas}")
+    return transfers
+
+def lock_balances(db, line_user_ids):
+    """
+    依 line_user_id 排序鎖住玩家收支彙總列（SELECT ... FOR UPDATE），沒有的建立
+
+    Returns:
+        dict: {line_user_id: UserBalance}
+    """
+    ids = sorted(set(line_user_ids))
+    balances = {b.line_user_id: b for b in db.scalars(
+        select(UserBalance).where(UserBalance.line_user_id.in_(ids))
+        .order_by(UserBalance.line_user_id).with_for_update()
+        .execution_options(populate_existing=True)
+    )}
+    for user_id in ids:
+        if user_id not in balances:
+            balances[user_id] = UserBalance(line_user_id=user_id, received_minor=0, paid_minor=0,
+                                            net_minor=0, entry_count=0)
+            db.add(balances[user_id])
+    return balances
+
+def post_batch(db, transfers, game_id=None, hand_id=None, group_id=None):
+    """以單一 INSERT 寫入一批分錄"""
+    if not transfers:
+        return
+    db.execute(insert(LedgerEntry).values([
+        {"game_id": game_id, "hand_id": hand_id, "group_id": group_id,
+         "payer_id": payer, "payee_id": payee, "amount_minor": amount}
+        for payer, payee, amount in transfers
+    ]))
+
+def apply_balances(db, line_user_ids, transfers, now=None):
+    """
+    依分錄累加玩家收支彙總
+
+    Args:
+        line_user_ids: 需要建立彙總列的玩家（沒有分錄的玩家也會建立）
+        transfers: 本次寫入的所有分錄
+    """
+    balances = lock_balances(db, line_user_ids)
+    for payer, payee, amount in transfers:
+        if payer in balances:
+            balances[payer].paid_minor += amount
+            balances[payer].net_minor -= amount
+            balances[payer].entry_count += 1
+        if payee in balances:
+            balances[payee].received_minor += amount
+            balances[payee].net_minor += amount
+            balances[payee].entry_count += 1
+    now = now or datetime.now(timezone.utc)
+    for balance in balances.values():
+        balance.updated_at = now
+    return balances
+
+def post_game(db, game, players, now=None):
+    """
+    對局結算時將已套用的胡牌事件寫入帳本並更新收支彙總
+
+    Returns:
+        dict: {line_user_id: UserBalance}
+    """
+    hand_ids = dict(db.query(Hand.hand_number, Hand.id).filter(Hand.game_id == game.id))
+    events = db.query(GameEvent.payload).filter(
+        GameEvent.game_id == game.id,
+        GameEvent.event_type == "hand",
+        GameEvent.seq <= game.event_seq
+    ).order_by(GameEvent.seq)
+
+    all_transfers = []
+    for (raw,) in events:
+        payload = json.loads(raw)
+        transfers = hand_transfers(payload["deltas"], payload["winner"])
+        post_batch(db, transfers, game.id, hand_ids.get(payload["hand_number"]), game.group_id)
+        all_transfers += transfers
+
+    return apply_balances(db, [p.line_user_id for p in players], all_transfers, now)
+
+def game_totals(db, game_id):
+    """
+    由帳本加總一局每位玩家的淨輸贏
+
+    Returns:
+        dict: {line_user_id: 淨輸贏最小單位}
+    """
+    totals = {}
+    for column, sign in ((LedgerEntry.payee_id, 1), (LedgerEntry.payer_id, -1)):
+        rows = db.execute(
+            select(column, func.sum(LedgerEntry.amount_minor)).where(LedgerEntry.game_id == game_id).group_by(column)
+        )
+        for user_id, amount in rows:
+            totals[user_id] = totals.get(user_id, 0) + sign * (amount or 0)
+    return totals
+
+def account_net(db, line_user_id):
+    """由分錄直接加總單一帳戶的淨額（用於稽核彙總是否一致）"""
+    amount = db.execute(select(func.sum(case(
+        (LedgerEntry.payee_id == line_user_id, LedgerEntry.amount_minor),
+        else_=-LedgerEntry.amount_minor
+    ))).where((LedgerEntry.payee_id == line_user_id) | (LedgerEntry.payer_id == line_user_id))).scalar()
+    return amount or 0
@@ -3,6 +3,23 @@ LINE API 服務封裝
 """
 from linebot.models import TextSendMessage, QuickReply, QuickReplyButton, MessageAction
 
+class PushFallback:
+    """
+    回覆 token 已失效時代替 LineBotApi：reply_message 改以 push_message 送到群組（私訊時送給使用者）
+
+    handler 照常呼叫 send_text_message 等函式，不必知道事件是否延遲處理。
+    """
+
+    def __init__(self, line_bot_api, to):
+        self._line_bot_api = line_bot_api
+        self.to = to
+
+    def reply_message(self, reply_token, messages, **kwargs):
+        return self._line_bot_api.push_message(self.to, messages, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._line_bot_api, name)
+
 def send_text_message(line_bot_api, event, text):
     """發送純文字訊息"""
     line_bot_api.reply_message(
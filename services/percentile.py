@@ -0,0 +1,212 @@
+"""
+全體玩家排名百分位 - 以 KLL 草圖估計個人淨輸贏在所有群組玩家中的位置
+
+每個程序在記憶體中累積一份增量草圖（結算時加入玩家最新的淨輸贏），
+累積 PERCENTILE_PERSIST_EVERY 筆或超過 PERCENTILE_PERSIST_SECONDS 秒後，
+鎖定資料庫中的草圖列並合併寫回。KLL 草圖可以合併，排名也可以直接相加，
+多個 worker 各自累積後再合併不會失真。
+
+- 草圖列由資料遷移（models.migrations）建立，結算時只更新既有的列
+- 寫回的增量在交易提交後才算數：結算回滾時放回本程序的增量，下次再寫回
+
+同一位玩家舊的淨輸贏會留在草圖中，當草圖筆數超過使用者數的 REBUILD_FACTOR 倍時，
+提交後在背景執行緒以串流方式讀取 user_balances.net_minor 重建一次，不佔用結算的交易。
+查詢只讀取快取的草圖，耗時與記憶體都與使用者數無關。
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.quantile_sketch import QuantileSketch
+from models.user_balance import UserBalance
+from utils.kll import KLLSketch
+from utils.money import from_minor
+
+SKETCH_NAME = "user_net_amount"
+PERSIST_EVERY = int(os.getenv("PERCENTILE_PERSIST_EVERY", "50"))
+PERSIST_SECONDS = float(os.getenv("PERCENTILE_PERSIST_SECONDS", "300"))
+CACHE_SECONDS = float(os.getenv("PERCENTILE_CACHE_SECONDS", "60"))
+REBUILD_FACTOR = 3
+
+_PENDING = "percentile_pending"  # Session.info：(已寫入本交易的增量, 合併後的草圖, 是否需要重建)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_delta = KLLSketch()
+_last_persist = time.monotonic()
+_cached = None
+_cached_at = 0.0
+_rebuilding = None  # 背景重建的執行緒
+
+def _set_cache(sketch):
+    global _cached, _cached_at
+    _cached = sketch
+    _cached_at = time.monotonic()
+
+def reset_cache():
+    """清除本程序的草圖快取與尚未寫回的增量"""
+    global _delta, _cached, _cached_at
+    with _lock:
+        _delta = KLLSketch()
+        _cached = None
+        _cached_at = 0.0
+
+def record_net_amounts(db, amounts):
+    """
+    結算後加入玩家最新的淨輸贏，達到門檻時合併寫回資料庫
+
+    寫回與結算在同一個交易內，由呼叫端提交。
+    """
+    with _lock:
+        for amount in amounts:
+            _delta.update(amount)
+        due = _delta.n >= PERSIST_EVERY or time.monotonic() - _last_persist >= PERSIST_SECONDS
+    if due:
+        persist_sketch(db)
+
+def persist_sketch(db):
+    """
+    將本程序累積的增量合併到資料庫中的草圖（呼叫端提交）
+
+    Returns:
+        QuantileSketch: 更新後的草圖列；草圖列不存在時回傳 None，增量留待下次寫回
+    """
+    global _delta, _last_persist
+    with _lock:
+        if _PENDING in db.info or _delta.n == 0:
+            return None  # 同一交易只寫回一次
+        delta, _delta = _delta, KLLSketch()
+        _last_persist = time.monotonic()
+
+    row = db.query(QuantileSketch).filter(QuantileSketch.name == SKETCH_NAME).with_for_update().first()
+    if row is None:
+        # 草圖列被刪除：放回增量，另外以背景重建補回，不在結算交易中建立
+        with _lock:
+            _delta.merge(delta)
+        start_rebuild(db.get_bind())
+        return None
+
+    sketch = KLLSketch.from_dict(json.loads(row.payload)).merge(delta)
+    row.payload = json.dumps(sketch.to_dict())
+    row.item_count = sketch.n
+    row.updated_at = datetime.now(timezone.utc)
+    db.info[_PENDING] = (delta, sketch, sketch.n > REBUILD_FACTOR * max(row.population or 0, 1))
+    return row
+
+@event.listens_for(Session, "after_commit")
+def _persisted(session):
+    pending = session.info.pop(_PENDING, None)
+    if pending is None:
+        return
+    _, sketch, rebuild = pending
+    with _lock:
+        _set_cache(sketch)
+    if rebuild:
+        start_rebuild(session.get_bind())
+
+@event.listens_for(Session, "after_transaction_end")
+def _restore_delta(session, transaction):
+    """交易沒有提交（rollback／close）時，把寫回的增量放回本程序"""
+    if transaction.parent is not None or _PENDING not in session.info:
+        return
+    delta = session.info.pop(_PENDING)[0]
+    with _lock:
+        _delta.merge(delta)
+
+def rebuild_sketch(bind):
+    """
+    以串流方式讀取所有玩家的淨輸贏，重建草圖（自己開交易並提交）
+
+    讀取期間不鎖草圖列，最後才鎖定並覆寫；讀取期間其他 worker 寫回的增量會被覆蓋，
+    只影響那幾筆結算，下次重建時補回。
+
+    Returns:
+        int: 重建時的使用者數
+    """
+    sketch = KLLSketch()
+    population = 0
+    with Session(bind) as db:
+        result = db.execute(
+            select(UserBalance.net_minor).execution_options(stream_results=True, yield_per=1000)
+        )
+        for (minor,) in result:
+            sketch.update(from_minor(minor))
+            population += 1
+        db.rollback()
+
+        for _ in range(2):
+            row = db.query(QuantileSketch).filter(QuantileSketch.name == SKETCH_NAME).with_for_update().first()
+            if row is None:
+                row = QuantileSketch(name=SKETCH_NAME)
+                db.add(row)
+            row.payload = json.dumps(sketch.to_dict())
+            row.item_count = sketch.n
+            row.population = population
+            row.updated_at = datetime.now(timezone.utc)
+            try:
+                db.commit()
+                break
+            except IntegrityError:
+                # 其他程序同時建立了草圖列，改為更新該列
+                db.rollback()
+
+    with _lock:
+        _set_cache(sketch)
+    return population
+
+def start_rebuild(bind):
+    """
+    在背景執行緒重建草圖（本程序已有重建在進行時不重複啟動）
+
+    Returns:
+        threading.Thread: 重建的執行緒；已有重建在進行時回傳 None
+    """
+    global _rebuilding
+    with _lock:
+        if _rebuilding is not None and _rebuilding.is_alive():
+            return None
+        _rebuilding = threading.Thread(target=_rebuild_logged, args=(bind,), name="percentile-rebuild", daemon=True)
+        _rebuilding.start()
+        return _rebuilding
+
+def _rebuild_logged(bind):
+    try:
+        rebuild_sketch(bind)
+    except Exception:
+        logger.exception("重建排名百分位草圖失敗")
+
+def _load_sketch(db):
+    """取得快取的草圖，過期時從資料庫重新載入"""
+    with _lock:
+        if _cached is not None and time.monotonic() - _cached_at < CACHE_SECONDS:
+            return _cached
+    row = db.get(QuantileSketch, SKETCH_NAME)
+    sketch = KLLSketch.from_dict(json.loads(row.payload)) if row else KLLSketch()
+    with _lock:
+        _set_cache(sketch)
+    return sketch
+
+def top_percent(db, amount):
+    """
+    估計淨輸贏 amount 在全體玩家中的名次百分比（前 X%）
+
+    Returns:
+        int: 1-100，尚無資料時回傳 None
+    """
+    sketch = _load_sketch(db)
+    with _lock:
+        total = sketch.n + _delta.n
+        if total == 0:
+            return None
+        at_or_below = sketch.rank(amount) + _delta.rank(amount)
+    above = max(total - at_or_below, 0)
+    return min(100, max(1, math.ceil((above + 1) * 100 / total)))
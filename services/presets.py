@@ -0,0 +1,94 @@
+"""
+群組預設開局規則 - 資料表儲存，程序內以 LRU 快取
+
+每晚重複輸入的 /開局 參數存成群組預設後，不帶參數的 /開局 只需一次快取查詢，
+不必重新解析與驗證。沒有預設的群組也會快取（記為 None），避免每次查表。
+
+快取只在本程序內；預設規則有自己的失效鍵 preset:<group_id>（services.invalidation），
+只有 save_preset／delete_preset 會遞增，其他 worker 收到通知後清除該群組的快取。
+/加入、/胡、/開局 等一般的群組變動不會清掉預設規則；通知漏接時最多 PRESET_CACHE_SECONDS 秒後也會重新讀取。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from models.group_preset import GroupPreset
+from services.invalidation import subscribe, touch_group
+
+PRESET_CACHE_SIZE = int(os.getenv("PRESET_CACHE_SIZE", "1024"))
+PRESET_CACHE_SECONDS = float(os.getenv("PRESET_CACHE_SECONDS", "300"))
+PRESET_KEY_PREFIX = "preset:"
+
+_cache = OrderedDict()  # group_id → (參數或 None, 載入時間)
+_cache_lock = threading.Lock()
+
+def _store(group_id, params):
+    with _cache_lock:
+        _cache[group_id] = (params, time.monotonic())
+        _cache.move_to_end(group_id)
+        while len(_cache) > PRESET_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def reset_cache():
+    """清除本程序的預設規則快取"""
+    with _cache_lock:
+        _cache.clear()
+
+def invalidate(group_id):
+    """移除單一群組的快取"""
+    with _cache_lock:
+        _cache.pop(group_id, None)
+
+def preset_key(group_id):
+    """預設規則的失效鍵（與群組本身的版本號分開）"""
+    return PRESET_KEY_PREFIX + group_id
+
+@subscribe
+def _on_key_changed(key, version):
+    # 只處理預設規則的失效鍵，群組的一般變動不影響預設規則
+    if key.startswith(PRESET_KEY_PREFIX):
+        invalidate(key[len(PRESET_KEY_PREFIX):])
+
+def get_preset(db, group_id):
+    """
+    取得群組預設規則
+
+    Returns:
+        dict: parse_game_command 格式的參數（呼叫端可自由修改），沒有預設時為 None
+    """
+    with _cache_lock:
+        entry = _cache.get(group_id)
+        if entry is not None and time.monotonic() - entry[1] < PRESET_CACHE_SECONDS:
+            _cache.move_to_end(group_id)
+            return dict(entry[0]) if entry[0] is not None else None
+
+    preset = db.get(GroupPreset, group_id)
+    params = preset.to_params() if preset else None
+    _store(group_id, params)
+    return dict(params) if params is not None else None
+
+def save_preset(db, group_id, params, updated_by=None):
+    """
+    儲存群組預設規則
+
+    由呼叫端提交；提交後本程序與其他 worker 收到 preset:<group_id> 的通知並清除快取。
+    """
+    touch_group(db, preset_key(group_id))
+    preset = db.get(GroupPreset, group_id)
+    if preset is None:
+        preset = GroupPreset(group_id=group_id)
+        db.add(preset)
+    preset.mode = params["mode"]
+    preset.per_point = params["per_point"]
+    preset.base_score = params["base_score"]
+    preset.collect_money = params["collect_money"]
+    preset.updated_by = updated_by
+    preset.updated_at = datetime.now(timezone.utc)
+    return preset
+
+def delete_preset(db, group_id):
+    """刪除群組預設規則（由呼叫端提交，提交後清除快取的方式同 save_preset）"""
+    touch_group(db, preset_key(group_id))
+    return db.query(GroupPreset).filter(GroupPreset.group_id == group_id).delete()
@@ -0,0 +1,263 @@
+"""
+指令頻率限制 - 每位使用者、每個群組各一個 token bucket，在開資料庫 Session 之前檢查
+
+桶子存在具名共享記憶體區段，同一台機器上的 gunicorn worker 共用同一份額度：
+- 區段是固定大小的直接對映表，每格 (鍵雜湊, 剩餘 token, 上次補充時間, 是否已提醒)
+- 兩個鍵對映到同一格時後來的鍵接手（拿到滿額），只會讓限制變寬鬆，不會誤擋
+- 跨程序以 flock 保護；沒有共享記憶體或 fcntl 的平台退回本程序內的表
+- 區段名稱帶有格數，改了 RATE_LIMIT_SLOTS 重新部署時不會接上大小不同的舊區段；
+  gunicorn master 結束時（gunicorn.conf.py 的 on_exit）以 unlink_segment 刪除區段
+
+超過額度時，每次桶子見底只回覆一次「太頻繁」，之後直接丟棄，直到 token 補回。
+只限制低優先的查詢指令（排行榜、統計等）；修改對局的指令被丟棄會讓玩家少記一手，不受額度限制也不扣 token。
+"""
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None
+
+from services.work_queue import HIGH, LOW
+from utils.hashing import stable_hash
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "20"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "6"))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv("RATE_LIMIT_GROUP_PER_MINUTE", "60"))
+RATE_LIMIT_GROUP_BURST = float(os.getenv("RATE_LIMIT_GROUP_BURST", "20"))
+RATE_LIMIT_SLOTS = int(os.getenv("RATE_LIMIT_SLOTS", "4096"))
+RATE_LIMIT_SEGMENT = os.getenv("RATE_LIMIT_SEGMENT", "mahjong_rate_limit")
+
+# 檢查結果
+ALLOW = "allow"    # 放行
+NOTIFY = "notify"  # 超過額度，回覆一次提醒
+DROP = "drop"      # 超過額度且已提醒過，直接丟棄
+
+BUSY_TEXT = "⏳ 指令太頻繁，請稍後再試"
+
+logger = logging.getLogger(__name__)
+
+_SLOT = struct.Struct("<Qddq")  # 鍵雜湊, 剩餘 token, 上次補充時間（epoch 秒）, 是否已提醒
+
+def _key_hash(kind, key):
+    return stable_hash(f"{kind}:{key}") or 1  # 0 保留給空格
+
+class TokenBuckets:
+    """
+    固定格數的 token bucket 表
+
+    Args:
+        slots: 格數
+        segment: 共享記憶體區段名稱（None 時只在本程序內）
+    """
+
+    def __init__(self, slots=RATE_LIMIT_SLOTS, segment=RATE_LIMIT_SEGMENT):
+        self.slots = slots
+        self.segment = segment_name(segment, slots) if segment else None
+        self._shm = None
+        self._lock_file = None
+        self._local_lock = threading.Lock()
+        size = slots * _SLOT.size
+        if self.segment and shared_memory is not None and fcntl is not None:
+            self._shm = self._attach(self.segment, size)
+            self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{self.segment}.lock"), "a+b")
+            self._buffer = self._shm.buf
+        else:
+            self._buffer = memoryview(bytearray(size))
+
+    @staticmethod
+    def _attach(segment, size):
+        try:
+            shm = shared_memory.SharedMemory(name=segment, create=True, size=size)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=segment)
+            if shm.size < size:
+                # 上次沒有正常結束留下的舊區段：刪除後重建（額度只是暫存資料）
+                logger.warning("共享記憶體 %s 大小不符（%d < %d），刪除後重建", segment, shm.size, size)
+                shm.close()
+                shm.unlink()
+                shm = shared_memory.SharedMemory(name=segment, create=True, size=size)
+        # 程序結束時不要刪除區段，其他 worker 還在使用（Python 3.13 前連接既有區段也會被追蹤）
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+    def close(self, unlink=False):
+        """關閉共享記憶體（unlink=True 時一併刪除區段）"""
+        if self._shm is None:
+            return
+        self._buffer = None
+        self._shm.close()
+        if unlink:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._lock_file.close()
+        self._shm = None
+
+    def _locked(self):
+        return _SegmentLock(self._local_lock, self._lock_file)
+
+    def take(self, kind, key, per_minute, burst, now=None):
+        """
+        從桶子取一個 token
+
+        Returns:
+            str: ALLOW、NOTIFY（剛見底，回覆一次提醒）或 DROP
+        """
+        now = time.time() if now is None else now
+        key_hash = _key_hash(kind, key)
+        offset = (key_hash % self.slots) * _SLOT.size
+        rate = per_minute / 60.0
+
+        with self._locked():
+            slot_hash, tokens, updated, notified = _SLOT.unpack_from(self._buffer, offset)
+            if slot_hash != key_hash:
+                tokens, updated, notified = burst, now, 0
+            else:
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            if tokens >= 1:
+                result = ALLOW
+                tokens -= 1
+                notified = 0
+            else:
+                result = DROP if notified else NOTIFY
+                notified = 1
+            _SLOT.pack_into(self._buffer, offset, key_hash, tokens, now, notified)
+        return result
+
+    def give_back(self, kind, key, burst):
+        """退還剛取走的 token（後續檢查沒有放行時使用）"""
+        key_hash = _key_hash(kind, key)
+        offset = (key_hash % self.slots) * _SLOT.size
+        with self._locked():
+            slot_hash, tokens, updated, notified = _SLOT.unpack_from(self._buffer, offset)
+            if slot_hash == key_hash:
+                _SLOT.pack_into(self._buffer, offset, key_hash, min(burst, tokens + 1), updated, notified)
+
+def segment_name(segment, slots):
+    """共享記憶體區段名稱（帶格數，格數不同的部署不會共用同一個區段）"""
+    return f"{segment}_{slots}"
+
+def unlink_segment(segment=RATE_LIMIT_SEGMENT, slots=RATE_LIMIT_SLOTS):
+    """刪除共享記憶體區段與鎖檔（所有 worker 都結束後呼叫）"""
+    if shared_memory is None or not segment:
+        return False
+    name = segment_name(segment, slots)
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    shm.unlink()  # 連接時被 resource_tracker 追蹤，unlink 會一併取消追蹤
+    try:
+        os.remove(os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+    except FileNotFoundError:
+        pass
+    return True
+
+class _SegmentLock:
+    """
+    鎖住整個桶子表：先取本程序的執行緒鎖，再以 flock 擋住其他程序
+
+    flock 屬於開啟的檔案，同一程序的執行緒共用同一個檔案時彼此擋不住，所以兩層都要。
+    """
+
+    def __init__(self, local_lock, handle):
+        self.local_lock = local_lock
+        self.handle = handle
+
+    def __enter__(self):
+        self.local_lock.acquire()
+        if self.handle is not None:
+            try:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self.local_lock.release()
+                raise
+
+    def __exit__(self, *exc):
+        if self.handle is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+        self.local_lock.release()
+
+_buckets = None
+_buckets_lock = threading.Lock()
+_counters = {"allowed": 0, "limited_user": 0, "limited_group": 0, "notified": 0, "dropped": 0}
+
+def _get_buckets():
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                try:
+                    _buckets = TokenBuckets()
+                except Exception:
+                    logger.exception("無法使用共享記憶體，頻率限制改為單一程序")
+                    _buckets = TokenBuckets(segment=None)
+    return _buckets
+
+def check_rate_limit(user_id, group_id=None, now=None, priority=LOW):
+    """
+    檢查使用者與群組的指令額度（先扣使用者，再扣群組；群組擋下時退還使用者的 token）
+
+    Args:
+        priority: 指令優先等級（work_queue.command_priority），HIGH 的修改指令一律放行
+
+    Returns:
+        str: ALLOW、NOTIFY 或 DROP
+    """
+    if not RATE_LIMIT_ENABLED or priority == HIGH:
+        return ALLOW
+    buckets = _get_buckets()
+    result, limited_by = ALLOW, None
+    if user_id:
+        result = buckets.take("user", user_id, RATE_LIMIT_USER_PER_MINUTE, RATE_LIMIT_USER_BURST, now)
+        limited_by = "limited_user"
+    if result == ALLOW and group_id:
+        result = buckets.take("group", group_id, RATE_LIMIT_GROUP_PER_MINUTE, RATE_LIMIT_GROUP_BURST, now)
+        limited_by = "limited_group"
+        if result != ALLOW and user_id:
+            # 被群組額度擋下的指令沒有執行，不扣使用者的額度
+            buckets.give_back("user", user_id, RATE_LIMIT_USER_BURST)
+
+    with _buckets_lock:
+        if result == ALLOW:
+            _counters["allowed"] += 1
+        else:
+            _counters[limited_by] += 1
+            _counters["notified" if result == NOTIFY else "dropped"] += 1
+    return result
+
+def rate_limit_stats():
+    """
+    本程序的頻率限制統計
+
+    Returns:
+        dict: allowed（放行）、limited_user／limited_group（被使用者或群組額度擋下）、
+              notified（回覆提醒）、dropped（直接丟棄）
+    """
+    with _buckets_lock:
+        return dict(_counters)
+
+def reset_rate_limit(buckets=None):
+    """更換本程序使用的桶子表並清除統計（測試用）"""
+    global _buckets
+    with _buckets_lock:
+        _buckets = buckets
+        for name in _counters:
+            _counters[name] = 0
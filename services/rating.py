@@ -0,0 +1,225 @@
+"""
+玩家實力積分 - 四人 Elo
+
+每局把同桌玩家兩兩視為一場比賽：分數高者勝、相同為和，
+每位玩家的積分變化為 K / (人數 - 1) × Σ(實際 - 預期)。
+結算時只更新同桌四人，為 O(1)；同一位玩家可能同時在兩個群組結算，
+積分列先依 line_user_id 排序以 SELECT ... FOR UPDATE 鎖住，以最新的積分計算變化。
+
+規則調整後可用 recompute_ratings 重播全部歷史：
+把對局分層（同一層內沒有玩家重複出現，且每位玩家的對局順序不變），
+每一層以 NumPy 向量化一次更新，結果與逐局重播相同。
+重播依結算時間（games.finished_at）排序，與結算時逐局套用的順序一致。
+
+    python -m services.rating --recompute
+"""
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from models.game import Game
+from models.player import Player
+from models.user_rating import UserRating
+
+INITIAL_RATING = float(os.getenv("RATING_INITIAL", "1500"))
+K_FACTOR = float(os.getenv("RATING_K", "32"))
+
+def rating_deltas(ratings, scores, k=None):
+    """
+    計算一局的積分變化
+
+    Args:
+        ratings: 同桌玩家目前的積分
+        scores: 對應的本局分數
+
+    Returns:
+        list: 每位玩家的積分變化
+    """
+    k = K_FACTOR if k is None else k
+    n = len(ratings)
+    if n < 2:
+        return [0.0] * n
+    deltas = []
+    for i in range(n):
+        total = 0.0
+        for j in range(n):
+            if i == j:
+                continue
+            expected = 1 / (1 + 10 ** ((ratings[j] - ratings[i]) / 400))
+            actual = 1.0 if scores[i] > scores[j] else 0.5 if scores[i] == scores[j] else 0.0
+            total += actual - expected
+        deltas.append(k / (n - 1) * total)
+    return deltas
+
+def lock_ratings(db, line_user_ids):
+    """
+    依 line_user_id 排序鎖住玩家積分列（SELECT ... FOR UPDATE），沒有的以初始積分建立
+
+    Returns:
+        dict: {line_user_id: UserRating}
+    """
+    ids = sorted(set(line_user_ids))
+    ratings = {r.line_user_id: r for r in db.scalars(
+        select(UserRating).where(UserRating.line_user_id.in_(ids))
+        .order_by(UserRating.line_user_id).with_for_update()
+        .execution_options(populate_existing=True)
+    )}
+    for line_user_id in ids:
+        if line_user_id not in ratings:
+            ratings[line_user_id] = UserRating(line_user_id=line_user_id, rating=INITIAL_RATING, games=0)
+            db.add(ratings[line_user_id])
+    return ratings
+
+def apply_game_rating(db, players, now=None):
+    """對局結算時更新同桌玩家的積分"""
+    ratings = lock_ratings(db, [p.line_user_id for p in players])
+    rows = [ratings[p.line_user_id] for p in players]
+    deltas = rating_deltas([r.rating for r in rows], [p.score or 0 for p in players])
+    now = now or datetime.now(timezone.utc)
+    for row, delta in zip(rows, deltas):
+        row.rating += delta
+        row.games = (row.games or 0) + 1
+        row.updated_at = now
+
+def _load_history(db):
+    """依結算順序讀取所有已結算對局的 (game_id, line_user_id, score)"""
+    result = db.execute(
+        select(Player.game_id, Player.line_user_id, Player.score)
+        .join(Game, Game.id == Player.game_id)
+        .where(Game.status == "finished", Game.round_state != 0)
+        .order_by(Game.finished_at, Game.id, Player.seat_number)
+        .execution_options(stream_results=True, yield_per=10000)
+    )
+    games = []
+    current_id = None
+    for game_id, line_user_id, score in result:
+        if game_id != current_id:
+            games.append(([], []))
+            current_id = game_id
+        games[-1][0].append(line_user_id)
+        games[-1][1].append(score or 0)
+    return games
+
+def replay_python(games, k=None):
+    """
+    逐局重播
+
+    Args:
+        games: [(玩家 ID 列表, 分數列表), ...]，依時間排序
+
+    Returns:
+        dict: line_user_id → (積分, 對局數)
+    """
+    ratings = {}
+    counts = {}
+    for user_ids, scores in games:
+        current = [ratings.get(u, INITIAL_RATING) for u in user_ids]
+        for u, r, d in zip(user_ids, current, rating_deltas(current, scores, k)):
+            ratings[u] = r + d
+            counts[u] = counts.get(u, 0) + 1
+    return {u: (ratings[u], counts[u]) for u in ratings}
+
+def replay_numpy(games, k=None, seats=4):
+    """
+    分層向量化重播，結果與 replay_python 相同
+
+    每局最多 seats 位玩家，人數不足以遮罩補齊。
+    """
+    from itertools import chain
+
+    import numpy as np
+
+    k = K_FACTOR if k is None else k
+    game_count = len(games)
+
+    # 玩家 ID 轉成連續整數索引，最後一格保留給空位
+    index = {}
+    sizes = np.fromiter((min(len(user_ids), seats) for user_ids, _ in games), dtype=np.int64, count=game_count)
+    flat_players = np.fromiter(
+        (index.setdefault(u, len(index)) for u in chain.from_iterable(user_ids[:seats] for user_ids, _ in games)),
+        dtype=np.int64
+    )
+    flat_scores = np.fromiter(chain.from_iterable(scores[:seats] for _, scores in games), dtype=np.float64)
+    empty = len(index)
+
+    rows = np.repeat(np.arange(game_count), sizes)
+    offsets = np.arange(len(flat_players)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    players = np.full((game_count, seats), empty, dtype=np.int64)
+    scores = np.zeros((game_count, seats), dtype=np.float64)
+    players[rows, offsets] = flat_players
+    scores[rows, offsets] = flat_scores
+
+    # 每局的層數 = 同桌玩家上一局所在層數的最大值 + 1
+    last_layer = [-1] * (empty + 1)
+    layer_list = [0] * game_count
+    for g, row in enumerate(players.tolist()):
+        layer = max([last_layer[p] for p in row]) + 1
+        for p in row:
+            last_layer[p] = layer
+        last_layer[empty] = -1
+        layer_list[g] = layer
+    layers = np.array(layer_list, dtype=np.int64)
+
+    ratings = np.full(empty + 1, INITIAL_RATING, dtype=np.float64)
+    counts = np.zeros(empty + 1, dtype=np.int64)
+    order = np.argsort(layers, kind="stable")
+    boundaries = np.flatnonzero(np.diff(layers[order])) + 1
+    eye = np.eye(seats, dtype=bool)
+
+    for batch in np.split(order, boundaries):
+        idx = players[batch]
+        valid = idx != empty
+        current = ratings[idx]
+        sc = scores[batch]
+
+        expected = 1 / (1 + 10 ** ((current[:, None, :] - current[:, :, None]) / 400))
+        actual = (sc[:, :, None] > sc[:, None, :]) + 0.5 * (sc[:, :, None] == sc[:, None, :])
+        pair = valid[:, :, None] & valid[:, None, :] & ~eye
+        n = valid.sum(axis=1)
+        scale = np.where(n > 1, k / np.maximum(n - 1, 1), 0.0)
+        deltas = scale[:, None] * np.where(pair, actual - expected, 0.0).sum(axis=2)
+
+        # 同一層內玩家不重複，可以直接以索引寫回
+        ratings[idx[valid]] += deltas[valid]
+        counts[idx[valid]] += 1
+
+    return {u: (float(ratings[i]), int(counts[i])) for u, i in index.items()}
+
+def recompute_ratings(db, k=None):
+    """
+    以全部歷史重算所有玩家積分（向量化重播）
+
+    Returns:
+        int: 重算的玩家數
+    """
+    results = replay_numpy(_load_history(db), k)
+
+    now = datetime.now(timezone.utc)
+    db.query(UserRating).delete()
+    db.bulk_insert_mappings(UserRating, [
+        {"line_user_id": u, "rating": rating, "games": count, "updated_at": now}
+        for u, (rating, count) in results.items()
+    ])
+    return len(results)
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from models.database import SessionLocal
+    from models.migrations import upgrade_schema
+
+    if "--recompute" not in sys.argv:
+        print("用法：python -m services.rating --recompute")
+        sys.exit(1)
+
+    upgrade_schema()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = recompute_ratings(db)
+        db.commit()
+        print(f"✅ 已重算 {count} 位玩家積分（{time.perf_counter() - started:.2f} 秒）")
+    finally:
+        db.close()
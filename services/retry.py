@@ -0,0 +1,149 @@
+"""
+待重試事件 - 關機時來不及處理的 webhook 事件存進 pending_events，下一個啟動的 worker 重新處理
+
+重新處理前以 DELETE ... RETURNING 認領，多個 worker 同時啟動時每筆事件只會被一個 worker 取走。
+
+LINE 的回覆 token 約一分鐘後失效（REPLY_TOKEN_SECONDS，reply_expired）。延遲處理的事件：
+- 修改對局的指令（/胡、/結算 等）照常處理，改以 push_message 通知群組，不能因為晚到就少記一手
+- 查詢指令（排行榜、統計等）直接捨棄，玩家早已不在等這個回覆
+- 待重試事件保留 PENDING_EVENT_MAX_AGE（預設 6 小時），超過才捨棄
+- 修改對局的指令每個 webhookEventId 只處理一次：處理前以 already_processed 略過已處理過的事件，
+  處理時在 claiming 期間第一筆提交的交易（handler 自己的交易）中一併寫入 processed_events，
+  handler 中途失敗而回滾時不會留下已處理的記錄；同一事件同時被處理兩次時，後提交的交易違反主鍵而整筆回滾
+"""
+import contextvars
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.orm import Session
+
+from models.pending_event import PendingEvent
+from models.processed_event import ProcessedEvent
+
+REPLY_TOKEN_SECONDS = float(os.getenv("REPLY_TOKEN_SECONDS", "50"))  # 留一些餘裕，低於 LINE 的約一分鐘
+PENDING_EVENT_MAX_AGE = float(os.getenv("PENDING_EVENT_MAX_AGE", str(6 * 3600)))
+PROCESSED_EVENT_RETENTION_HOURS = float(os.getenv("PROCESSED_EVENT_RETENTION_HOURS", "24"))
+
+def _received_at(payload, now):
+    """LINE 事件的 timestamp（毫秒）→ 收到時間，沒有時以 now 代替"""
+    timestamp = payload.get("timestamp")
+    if timestamp:
+        return datetime.fromtimestamp(timestamp / 1000, timezone.utc)
+    return now
+
+def reply_expired(timestamp, now=None):
+    """
+    LINE 事件的 timestamp（毫秒）是否已超過回覆 token 的有效期
+
+    沒有 timestamp 的事件（測試或內部產生）視為未過期。
+    """
+    if not timestamp:
+        return False
+    now = now or datetime.now(timezone.utc)
+    return (now.timestamp() - timestamp / 1000) > REPLY_TOKEN_SECONDS
+
+_claim = contextvars.ContextVar("webhook_event_claim", default=None)
+_CLAIM = "webhook_event_claim"  # Session.info 中本交易寫入的事件記錄
+
+def already_processed(db, webhook_event_id):
+    """事件是否已處理過（LINE 重送、重複重新處理）"""
+    if not webhook_event_id:
+        return False
+    return db.scalar(
+        select(ProcessedEvent.webhook_event_id).where(ProcessedEvent.webhook_event_id == webhook_event_id)
+    ) is not None
+
+@contextmanager
+def claiming(webhook_event_id, now=None):
+    """
+    處理事件期間，第一筆提交的交易一併記錄事件已處理
+
+    只在目前的執行緒（context）內有效；webhook_event_id 為 None 時不記錄。
+    """
+    claim = {"id": webhook_event_id, "now": now, "done": False} if webhook_event_id else None
+    token = _claim.set(claim)
+    try:
+        yield
+    finally:
+        _claim.reset(token)
+
+@event.listens_for(Session, "before_commit")
+def _record_claim(session):
+    claim = _claim.get()
+    if claim is None or claim["done"] or _CLAIM in session.info:
+        return
+    session.execute(insert(ProcessedEvent).values(
+        webhook_event_id=claim["id"], processed_at=claim["now"] or datetime.now(timezone.utc)
+    ))
+    session.info[_CLAIM] = claim
+
+@event.listens_for(Session, "after_commit")
+def _claim_committed(session):
+    claim = session.info.pop(_CLAIM, None)
+    if claim is not None:
+        claim["done"] = True
+
+@event.listens_for(Session, "after_rollback")
+def _claim_discarded(session):
+    session.info.pop(_CLAIM, None)
+
+def prune_processed(db, now=None):
+    """
+    刪除超過保留期限的已處理事件 ID（由呼叫端提交）
+
+    Returns:
+        int: 刪除的列數
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=PROCESSED_EVENT_RETENTION_HOURS)
+    return db.execute(delete(ProcessedEvent).where(ProcessedEvent.processed_at < cutoff)).rowcount
+
+def persist_events(db, payloads, reason, now=None):
+    """
+    保存未處理的事件（由呼叫端提交）
+
+    Args:
+        payloads: LINE 事件的 JSON dict 列表（event.as_json_dict()）
+        reason: 未處理的原因
+
+    Returns:
+        int: 保存筆數
+    """
+    if not payloads:
+        return 0
+    now = now or datetime.now(timezone.utc)
+    db.execute(insert(PendingEvent).values([
+        {
+            "group_id": payload.get("source", {}).get("groupId"),
+            "payload": json.dumps(payload, ensure_ascii=False),
+            "reason": reason,
+            "received_at": _received_at(payload, now),
+        }
+        for payload in payloads
+    ]))
+    return len(payloads)
+
+def claim_pending(db, now=None, max_age=None):
+    """
+    認領並刪除所有待重試事件（由呼叫端提交）
+
+    Returns:
+        tuple: (保留期限內的事件 JSON dict 列表（依收到順序）, 超過 PENDING_EVENT_MAX_AGE 捨棄的筆數)
+    """
+    now = now or datetime.now(timezone.utc)
+    max_age = PENDING_EVENT_MAX_AGE if max_age is None else max_age
+    rows = db.execute(
+        delete(PendingEvent).returning(PendingEvent.id, PendingEvent.payload, PendingEvent.received_at)
+    ).all()
+
+    fresh, expired = [], 0
+    for _, payload, received_at in sorted(rows):
+        if received_at.tzinfo is None:  # SQLite 不保存時區
+            received_at = received_at.replace(tzinfo=timezone.utc)
+        if (now - received_at).total_seconds() > max_age:
+            expired += 1
+        else:
+            fresh.append(json.loads(payload))
+    return fresh, expired
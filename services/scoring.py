@@ -0,0 +1,342 @@
+"""
+台數計算引擎 - 台灣十六張麻將
+
+每一條台型規則在模組載入時編譯成位元遮罩與計數檢查，
+一手牌先整理成「特徵」（旗標位元、花色位元、計數欄位），
+再以單次迴圈比對所有規則，最後套用取代關係（例如大三元取代三元牌）。
+"""
+from collections import namedtuple
+
+from utils.tiles import HONOR_START, SUIT_BITS, TILE_KINDS, tile_suit, to_counts
+
+# 一手牌的牌數：5 組面子 + 1 對眼
+HAND_SIZE = 17
+
+# 特徵旗標
+MENQING = 1 << 0          # 門清（無明面子，暗槓不影響）
+ZIMO = 1 << 1             # 自摸
+ALL_CHOWS = 1 << 2        # 全部順子
+ALL_PUNGS = 1 << 3        # 全部刻子／槓
+NO_FLOWERS = 1 << 4       # 無花
+HONOR_PAIR = 1 << 5       # 眼為字牌
+DRAGON_PAIR = 1 << 6      # 眼為三元牌
+ROUND_WIND_PUNG = 1 << 7  # 有圈風刻
+SEAT_WIND_PUNG = 1 << 8   # 有門風刻
+KONG_DRAW = 1 << 9        # 槓上開花
+LAST_TILE = 1 << 10       # 海底撈月
+DEALER = 1 << 11          # 莊家參與此筆支付
+
+# 計數欄位
+COUNT_ONE = 0             # 固定為 1，給不需要計數的規則使用
+COUNT_DRAGON_PUNGS = 1    # 三元牌刻子數
+COUNT_SEAT_FLOWERS = 2    # 正花數
+COUNT_FLOWER_SETS = 3     # 花槓（整組四季或四君子）數
+COUNT_STREAK = 4          # 連莊次數
+
+_DRAGON_TILES = (31, 32, 33)
+
+# 規則定義：順序即為 pattern_mask 的位元編號，只能往後新增，不可調整順序
+RuleSpec = namedtuple(
+    "RuleSpec",
+    "name tai require forbid suits count at_least per_count overrides dealer"
+)
+
+
+def _rule(name, tai, require=0, forbid=0, suits=None, count=COUNT_ONE,
+          at_least=1, per_count=False, overrides=(), dealer=False):
+    return RuleSpec(name, tai, require, forbid, suits, count, at_least, per_count, overrides, dealer)
+
+
+RULE_SPECS = (
+    _rule("莊家", 1, require=DEALER, dealer=True),
+    _rule("連莊", 2, require=DEALER, count=COUNT_STREAK, per_count=True, dealer=True),
+    _rule("門清", 1, require=MENQING),
+    _rule("自摸", 1, require=ZIMO),
+    _rule("不求人", 1, require=MENQING | ZIMO),
+    _rule("平胡", 2, require=ALL_CHOWS | NO_FLOWERS, forbid=ZIMO | HONOR_PAIR),
+    _rule("碰碰胡", 4, require=ALL_PUNGS),
+    _rule("混一色", 4, suits=(1 | 8, 2 | 8, 4 | 8)),
+    _rule("清一色", 8, suits=(1, 2, 4)),
+    _rule("字一色", 16, suits=(8,), overrides=("碰碰胡",)),
+    _rule("圈風", 1, require=ROUND_WIND_PUNG),
+    _rule("門風", 1, require=SEAT_WIND_PUNG),
+    _rule("三元牌", 1, count=COUNT_DRAGON_PUNGS, per_count=True),
+    _rule("小三元", 4, require=DRAGON_PAIR, count=COUNT_DRAGON_PUNGS, at_least=2, overrides=("三元牌",)),
+    _rule("大三元", 8, count=COUNT_DRAGON_PUNGS, at_least=3, overrides=("三元牌",)),
+    _rule("花", 1, count=COUNT_SEAT_FLOWERS, per_count=True),
+    _rule("花槓", 2, count=COUNT_FLOWER_SETS, per_count=True),
+    _rule("槓上開花", 1, require=KONG_DRAW),
+    _rule("海底撈月", 1, require=LAST_TILE),
+)
+
+_CompiledRule = namedtuple(
+    "_CompiledRule",
+    "bit name tai require forbid suit_bits count at_least per_count override_mask dealer"
+)
+
+ScoreResult = namedtuple("ScoreResult", "tai dealer_tai patterns dealer_patterns pattern_mask")
+
+
+def _compile_rules(specs):
+    """將規則定義編譯為位元檢查用的元組"""
+    bits = {spec.name: 1 << i for i, spec in enumerate(specs)}
+    compiled = []
+    for spec in specs:
+        # 允許的花色組合以 16 位元遮罩表示：第 n 位為 1 代表花色位元值 n 符合
+        if spec.suits is None:
+            suit_bits = 0xFFFF
+        else:
+            suit_bits = 0
+            for suits in spec.suits:
+                suit_bits |= 1 << suits
+
+        override_mask = 0
+        for name in spec.overrides:
+            override_mask |= bits[name]
+
+        compiled.append(_CompiledRule(
+            bits[spec.name], spec.name, spec.tai, spec.require, spec.forbid,
+            suit_bits, spec.count, spec.at_least, spec.per_count,
+            override_mask, spec.dealer
+        ))
+    return tuple(compiled)
+
+
+_RULES = _compile_rules(RULE_SPECS)
+PATTERN_BITS = {rule.name: rule.bit for rule in _RULES}
+_DEALER_MASK = sum(rule.bit for rule in _RULES if rule.dealer)
+
+
+def pattern_names(pattern_mask):
+    """將 pattern_mask 還原為台型名稱列表"""
+    return [rule.name for rule in _RULES if pattern_mask & rule.bit]
+
+
+def decompose(counts):
+    """
+    列出所有「一對眼 + 面子」的拆法
+
+    Returns:
+        list: [(眼的牌編號, [("chow" 或 "pung", 起始牌), ...]), ...]
+    """
+    results = []
+    for pair in range(TILE_KINDS):
+        if counts[pair] < 2:
+            continue
+        counts[pair] -= 2
+        for melds in _split_melds(counts, 0):
+            results.append((pair, melds))
+        counts[pair] += 2
+    return results
+
+
+def _split_melds(counts, start):
+    tile = start
+    while tile < TILE_KINDS and counts[tile] == 0:
+        tile += 1
+    if tile == TILE_KINDS:
+        yield []
+        return
+
+    if counts[tile] >= 3:
+        counts[tile] -= 3
+        for rest in _split_melds(counts, tile):
+            yield [("pung", tile)] + rest
+        counts[tile] += 3
+
+    if tile < HONOR_START and tile % 9 <= 6 and counts[tile + 1] and counts[tile + 2]:
+        counts[tile] -= 1
+        counts[tile + 1] -= 1
+        counts[tile + 2] -= 1
+        for rest in _split_melds(counts, tile):
+            yield [("chow", tile)] + rest
+        counts[tile] += 1
+        counts[tile + 1] += 1
+        counts[tile + 2] += 1
+
+
+def _build_features(pair, melds, exposed, context):
+    """將一種拆法整理為 (旗標, 花色位元, 計數欄位)"""
+    flags = context["flags"]
+    suits = SUIT_BITS[tile_suit(pair)]
+    pung_mask = 0
+    chows = 0
+    pungs = 0
+
+    for kind, tile, _concealed in exposed:
+        suits |= SUIT_BITS[tile_suit(tile)]
+        if kind == "chow":
+            chows += 1
+        else:
+            pungs += 1
+            pung_mask |= 1 << tile
+
+    for kind, tile in melds:
+        suits |= SUIT_BITS[tile_suit(tile)]
+        if kind == "chow":
+            chows += 1
+        else:
+            pungs += 1
+            pung_mask |= 1 << tile
+
+    if pungs == 0:
+        flags |= ALL_CHOWS
+    if chows == 0:
+        flags |= ALL_PUNGS
+    if pair >= HONOR_START:
+        flags |= HONOR_PAIR
+    if pair in _DRAGON_TILES:
+        flags |= DRAGON_PAIR
+    if pung_mask & (1 << (HONOR_START + context["round_wind"])):
+        flags |= ROUND_WIND_PUNG
+    if context["seat_wind"] is not None and pung_mask & (1 << (HONOR_START + context["seat_wind"])):
+        flags |= SEAT_WIND_PUNG
+
+    dragon_pungs = sum(1 for tile in _DRAGON_TILES if pung_mask & (1 << tile))
+    counts = (1, dragon_pungs, context["seat_flowers"], context["flower_sets"], context["streak"])
+    return flags, suits, counts
+
+
+def _evaluate_features(flags, suits, counts):
+    """單次比對所有規則，回傳套用取代關係後的命中位元遮罩"""
+    hits = 0
+    overrides = 0
+    for rule in _RULES:
+        if flags & rule.require != rule.require or flags & rule.forbid:
+            continue
+        if not (rule.suit_bits >> suits) & 1:
+            continue
+        if counts[rule.count] < rule.at_least:
+            continue
+        hits |= rule.bit
+        overrides |= rule.override_mask
+    return hits & ~overrides
+
+
+def _summarize(hits, counts):
+    tai = 0
+    dealer_tai = 0
+    patterns = []
+    dealer_patterns = []
+    for rule in _RULES:
+        if not hits & rule.bit:
+            continue
+        value = rule.tai * counts[rule.count] if rule.per_count else rule.tai
+        if rule.dealer:
+            dealer_tai += value
+            dealer_patterns.append((rule.name, value))
+        else:
+            tai += value
+            patterns.append((rule.name, value))
+    pattern_mask = hits & ~_DEALER_MASK
+    return ScoreResult(tai, dealer_tai, tuple(patterns), tuple(dealer_patterns), pattern_mask)
+
+
+def calculate_tai(concealed, exposed=(), flowers=(), self_drawn=False, seat_wind=None,
+                  round_wind=0, dealer_streak=0, kong_draw=False, last_tile=False):
+    """
+    計算一手胡牌的台數
+
+    Args:
+        concealed: 手牌（含胡的那張）牌編號列表
+        exposed: 已亮出的面子 [("chow"/"pung"/"kong", 起始牌, 是否暗槓), ...]
+        flowers: 花牌編號列表（1-8）
+        self_drawn: 是否自摸
+        seat_wind: 門風索引（0 東 - 3 北），未知時為 None
+        round_wind: 圈風索引
+        dealer_streak: 連莊次數
+        kong_draw: 是否槓上開花
+        last_tile: 是否海底撈月
+
+    Returns:
+        ScoreResult: tai 為台型台數，dealer_tai 為莊家相關台數（只在莊家參與支付時計入）
+
+    Raises:
+        ValueError: 牌數不正確或無法組成胡牌時
+    """
+    tile_total = len(concealed) + 3 * len(exposed)
+    if tile_total != HAND_SIZE:
+        raise ValueError(f"牌數不正確：需要 {HAND_SIZE} 張（槓以 3 張計），目前 {tile_total} 張")
+
+    counts = to_counts(concealed)
+    all_counts = counts[:]
+    for kind, tile, _concealed in exposed:
+        if kind == "chow":
+            all_counts[tile] += 1
+            all_counts[tile + 1] += 1
+            all_counts[tile + 2] += 1
+        else:
+            all_counts[tile] += 4 if kind == "kong" else 3
+    if any(count > 4 for count in all_counts):
+        raise ValueError("同一種牌不可超過 4 張")
+
+    decompositions = decompose(counts)
+    if not decompositions:
+        raise ValueError("這手牌無法組成胡牌")
+
+    flags = DEALER
+    if all(kind == "kong" and concealed_kong for kind, _tile, concealed_kong in exposed):
+        flags |= MENQING
+    if self_drawn:
+        flags |= ZIMO
+    if not flowers:
+        flags |= NO_FLOWERS
+    if kong_draw:
+        flags |= KONG_DRAW
+    if last_tile:
+        flags |= LAST_TILE
+
+    seat_flowers = 0
+    if seat_wind is not None:
+        seat_flowers = sum(1 for flower in flowers if flower in (seat_wind + 1, seat_wind + 5))
+    flower_set = set(flowers)
+    flower_sets = int({1, 2, 3, 4} <= flower_set) + int({5, 6, 7, 8} <= flower_set)
+
+    context = {
+        "flags": flags,
+        "round_wind": round_wind,
+        "seat_wind": seat_wind,
+        "seat_flowers": seat_flowers,
+        "flower_sets": flower_sets,
+        "streak": dealer_streak,
+    }
+
+    best = None
+    for pair, melds in decompositions:
+        flags, suits, feature_counts = _build_features(pair, melds, exposed, context)
+        result = _summarize(_evaluate_features(flags, suits, feature_counts), feature_counts)
+        if best is None or result.tai > best.tai:
+            best = result
+    return best
+
+
+def compute_payments(per_point, base_score, result, winner_id, loser_id, player_ids, dealer_id):
+    """
+    計算一手牌的支付金額：每位付款者支付 底 + 每台 × 台數
+
+    莊家台只在莊家為胡牌者或付款者時計入。
+
+    Args:
+        per_point: 每台金額
+        base_score: 底台金額
+        result: calculate_tai 的結果
+        winner_id: 胡牌玩家 ID
+        loser_id: 放槍玩家 ID，自摸時為 None
+        player_ids: 本局所有玩家 ID
+        dealer_id: 莊家玩家 ID
+
+    Returns:
+        dict: {玩家 ID: 分數變動}
+    """
+    payers = [pid for pid in player_ids if pid != winner_id] if loser_id is None else [loser_id]
+    deltas = {pid: 0 for pid in player_ids}
+
+    for payer in payers:
+        tai = result.tai
+        if dealer_id is not None and dealer_id in (winner_id, payer):
+            tai += result.dealer_tai
+        amount = base_score + per_point * tai
+        deltas[payer] -= amount
+        deltas[winner_id] += amount
+
+    return deltas
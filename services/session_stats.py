@@ -0,0 +1,85 @@
+"""
+聚會場次統計 - 將同一晚多桌、多局的對局歸入同一場次並累計輸贏
+
+開局時對局掛到群組目前的場次（閒置超過 SESSION_IDLE_HOURS 小時自動開新場次），
+結算時把每位玩家本局分數累加到 session_totals，/今日戰績 只需讀取該場次的累計列，
+不必載入任何 Player 資料。
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+from models.game_session import GameSession
+from models.session_total import SessionTotal
+
+SESSION_IDLE_HOURS = float(os.getenv("SESSION_IDLE_HOURS", "6"))
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+def _as_utc(value):
+    """SQLite 讀回的時間沒有時區，視為 UTC"""
+    if value is None:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def latest_session(db, group_id):
+    """取得群組最近一個場次"""
+    return db.query(GameSession).filter(
+        GameSession.group_id == group_id
+    ).order_by(GameSession.id.desc()).first()
+
+def open_session(db, group_id, now=None):
+    """
+    取得群組目前進行中的場次，閒置過久則關閉舊場次並開新場次
+
+    Returns:
+        GameSession: 已 flush、帶有 id 的場次
+    """
+    now = now or _utcnow()
+    session = latest_session(db, group_id)
+    if session and session.status == "open":
+        last_activity = _as_utc(session.last_activity_at or session.started_at)
+        if last_activity is None or now - last_activity <= timedelta(hours=SESSION_IDLE_HOURS):
+            session.last_activity_at = now
+            return session
+        session.status = "closed"
+
+    session = GameSession(group_id=group_id, status="open", started_at=now, last_activity_at=now)
+    db.add(session)
+    db.flush()
+    return session
+
+def record_game_totals(db, game, players, now=None):
+    """
+    對局結算時將玩家分數累加到所屬場次
+
+    Args:
+        game: 已結算的對局（未掛場次的舊對局直接略過）
+        players: 本局玩家（Player 列）
+    """
+    if not game.session_id:
+        return
+    session = db.get(GameSession, game.session_id)
+    if session is None:
+        return
+
+    session.game_count = (session.game_count or 0) + 1
+    session.last_activity_at = now or _utcnow()
+
+    for p in players:
+        total = db.get(SessionTotal, (session.id, p.line_user_id))
+        if total is None:
+            total = SessionTotal(session_id=session.id, line_user_id=p.line_user_id,
+                                 nickname=p.nickname, games=0, net_amount=0)
+            db.add(total)
+        total.nickname = p.nickname
+        total.games = (total.games or 0) + 1
+        total.net_amount = (total.net_amount or 0) + (p.score or 0)
+
+def session_standings(db, session_id):
+    """取得場次內玩家累計輸贏（依淨輸贏排序）"""
+    return db.query(
+        SessionTotal.nickname, SessionTotal.games, SessionTotal.net_amount
+    ).filter(
+        SessionTotal.session_id == session_id
+    ).order_by(SessionTotal.net_amount.desc(), SessionTotal.nickname).all()
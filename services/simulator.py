@@ -0,0 +1,340 @@
+"""
+胡牌機率模擬 - 以蒙地卡羅估計 N 張內自摸完成的機率
+
+牌型引擎使用 34 格計數向量：每個花色各自列出「面子數、搭子數、是否有眼」的最佳組合並快取，
+再合併四個花色求向聽數。模擬時每摸一張只判斷是否為有效牌（會降低向聽數的牌），
+有效牌集合在手牌改變時才重新計算，無效牌直接摸打。
+
+模擬分批送到 ProcessPoolExecutor 執行，不佔用 webhook 的事件迴圈；
+每次請求有時間上限，時間到就以已完成的批次回覆。
+完成全部次數的結果依正規化後的手牌快取；時間到而中斷的部分結果只回覆這一次，下次請求重新模擬。
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import get_context
+
+from utils.tiles import HONOR_START, TILE_KINDS
+
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", "2"))
+SIMULATION_TRIALS = int(os.getenv("SIMULATION_TRIALS", "2000"))
+SIMULATION_BATCH = 250
+SIMULATION_BUDGET_SECONDS = float(os.getenv("SIMULATION_BUDGET_SECONDS", "3"))
+CACHE_SIZE = 256
+
+SimulationResult = namedtuple("SimulationResult", "trials wins shanten useful_tiles completed")
+
+# ---- 向聽數計算 ----
+
+def _prune(options):
+    """只保留同一眼數下面子、搭子不被支配的組合"""
+    kept = []
+    for option in sorted(set(options), reverse=True):
+        if not any(o[2] == option[2] and o[0] >= option[0] and o[1] >= option[1] for o in kept):
+            kept.append(option)
+    return tuple(kept)
+
+@lru_cache(maxsize=65536)
+def _suit_options(counts, honor):
+    """
+    列出一個花色可組成的 (面子數, 搭子數, 眼數) 組合
+
+    Args:
+        counts: 該花色的計數（數字牌 9 格、字牌 7 格）
+        honor: 是否為字牌（字牌沒有順子與搭子）
+    """
+    first = next((i for i, c in enumerate(counts) if c), None)
+    if first is None:
+        return ((0, 0, 0),)
+
+    def take(*tiles):
+        rest = list(counts)
+        for tile in tiles:
+            rest[tile] -= 1
+        return _suit_options(tuple(rest), honor)
+
+    options = list(take(first))  # 孤張
+    if counts[first] >= 3:
+        options += [(m + 1, t, h) for m, t, h in take(first, first, first)]
+    if counts[first] >= 2:
+        for m, t, h in take(first, first):
+            options.append((m, t + 1, h))
+            if not h:
+                options.append((m, t, 1))
+    if not honor:
+        if first + 2 < 9 and counts[first + 1] and counts[first + 2]:
+            options += [(m + 1, t, h) for m, t, h in take(first, first + 1, first + 2)]
+        if first + 1 < 9 and counts[first + 1]:
+            options += [(m, t + 1, h) for m, t, h in take(first, first + 1)]
+        if first + 2 < 9 and counts[first + 2]:
+            options += [(m, t + 1, h) for m, t, h in take(first, first + 2)]
+    return _prune(options)
+
+def _suit_key(counts, suit):
+    if suit == 3:
+        return tuple(counts[HONOR_START:]), True
+    return tuple(counts[suit * 9:suit * 9 + 9]), False
+
+def shanten(counts, melds_needed=None):
+    """
+    計算向聽數（-1 為已胡牌，0 為聽牌）
+
+    Args:
+        counts: 34 格計數向量（手牌張數為 3k+1 或 3k+2）
+        melds_needed: 需要的面子數，預設為張數 // 3
+    """
+    if melds_needed is None:
+        melds_needed = sum(counts) // 3
+
+    combined = ((0, 0, 0),)
+    for suit in range(4):
+        suit_options = _suit_options(*_suit_key(counts, suit))
+        combined = _prune(
+            (min(m1 + m2, melds_needed), min(t1 + t2, melds_needed), h1 + h2)
+            for m1, t1, h1 in combined
+            for m2, t2, h2 in suit_options
+            if h1 + h2 <= 1
+        )
+
+    return min(
+        2 * melds_needed - 2 * m - min(t, melds_needed - m) - h
+        for m, t, h in combined
+    )
+
+def useful_tiles(counts, current=None):
+    """列出摸進後會降低向聽數的牌"""
+    current = shanten(counts) if current is None else current
+    melds_needed = sum(counts) // 3
+    useful = []
+    for tile in range(TILE_KINDS):
+        if counts[tile] >= 4:
+            continue
+        counts[tile] += 1
+        if shanten(counts, melds_needed) < current:
+            useful.append(tile)
+        counts[tile] -= 1
+    return useful
+
+# ---- 蒙地卡羅模擬 ----
+
+@lru_cache(maxsize=16384)
+def _useful_set(hand, current):
+    """有效牌集合（依手牌快取，不同模擬常走到相同的手牌）"""
+    return frozenset(useful_tiles(list(hand), current))
+
+@lru_cache(maxsize=16384)
+def _after_draw(hand, tile, target):
+    """
+    摸進 tile 後打掉一張牌，使向聽數降為 target（字牌、邊張優先打出）
+
+    Returns:
+        tuple: 打牌後的手牌計數
+    """
+    counts = list(hand)
+    counts[tile] += 1
+    melds_needed = sum(hand) // 3
+    order = sorted((t for t in range(TILE_KINDS) if counts[t]),
+                   key=lambda t: (t < HONOR_START, min(t % 9, 8 - t % 9)))
+    for discard in order:
+        counts[discard] -= 1
+        if shanten(counts, melds_needed) == target:
+            return tuple(counts)
+        counts[discard] += 1
+    counts[tile] -= 1
+    return tuple(counts)
+
+def simulate_batch(hand_counts, wall_counts, draws, trials, seed, deadline):
+    """
+    在子程序中執行一批模擬
+
+    策略：摸到有效牌就留下並打掉一張不影響向聽數的牌，否則摸打。
+
+    Returns:
+        tuple: (完成次數, 胡牌次數)
+    """
+    rng = random.Random(seed)
+    wall = [tile for tile in range(TILE_KINDS) for _ in range(wall_counts[tile])]
+    draws = min(draws, len(wall))
+    start_hand = tuple(hand_counts)
+    start_shanten = shanten(hand_counts)
+
+    done = wins = 0
+    for _ in range(trials):
+        if time.time() > deadline:
+            break
+        hand, current = start_hand, start_shanten
+        useful = _useful_set(hand, current)
+        for tile in rng.sample(wall, draws):
+            if tile not in useful:
+                continue
+            if current == 0:
+                wins += 1
+                break
+            current -= 1
+            hand = _after_draw(hand, tile, current)
+            useful = _useful_set(hand, current)
+        done += 1
+    return done, wins
+
+def canonical_key(hand_counts, visible_counts, draws):
+    """
+    正規化手牌作為快取鍵
+
+    萬、筒、條三個花色互換不影響機率，字牌之間也可以互換。
+    """
+    suits = sorted(
+        (tuple(hand_counts[s * 9:s * 9 + 9]), tuple(visible_counts[s * 9:s * 9 + 9]))
+        for s in range(3)
+    )
+    honors = sorted(
+        (hand_counts[tile], visible_counts[tile]) for tile in range(HONOR_START, TILE_KINDS)
+    )
+    return tuple(suits), tuple(honors), draws
+
+_executor = None
+_executor_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_pending = 0  # 已開始、尚未呼叫 on_done 的模擬數
+_pending_done = threading.Condition()
+
+def _get_executor(reset=False):
+    global _executor
+    with _executor_lock:
+        if reset and _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=SIMULATION_WORKERS, mp_context=get_context("spawn"))
+        return _executor
+
+def _submit_batches(hand_counts, wall_counts, draws, trials, deadline):
+    """將模擬分批送進程序池，程序池損壞時重建一次"""
+    seed = random.randrange(1 << 30)
+    for attempt in range(2):
+        executor = _get_executor(reset=attempt > 0)
+        try:
+            return [
+                executor.submit(simulate_batch, list(hand_counts), wall_counts, draws,
+                                min(SIMULATION_BATCH, trials - start), seed + start, deadline)
+                for start in range(0, trials, SIMULATION_BATCH)
+            ]
+        except BrokenProcessPool:
+            if attempt:
+                raise
+
+def cached_result(key):
+    """讀取快取結果"""
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+def _store_result(key, result):
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def start_simulation(hand_counts, visible_counts, draws, on_done, trials=None, budget=None):
+    """
+    非同步執行模擬，完成或時間到時呼叫 on_done(SimulationResult)
+
+    Returns:
+        SimulationResult: 命中快取時直接回傳（此時不會呼叫 on_done），否則為 None
+    """
+    key = canonical_key(hand_counts, visible_counts, draws)
+    cached = cached_result(key)
+    if cached is not None:
+        return cached
+
+    trials = trials or SIMULATION_TRIALS
+    budget = budget or SIMULATION_BUDGET_SECONDS
+    wall_counts = [4 - hand_counts[t] - visible_counts[t] for t in range(TILE_KINDS)]
+    current = shanten(list(hand_counts))
+    live_useful = sum(wall_counts[t] for t in useful_tiles(list(hand_counts), current))
+
+    deadline = time.time() + budget
+    futures = _submit_batches(hand_counts, wall_counts, draws, trials, deadline)
+    _track(1)
+
+    state = {"finished": False}
+    lock = threading.Lock()
+
+    def finish(timer_fired=False):
+        with lock:
+            if state["finished"]:
+                return
+            if not timer_fired and not all(f.done() for f in futures):
+                return
+            state["finished"] = True
+        timer.cancel()
+        done = wins = 0
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                batch_done, batch_wins = future.result()
+                done += batch_done
+                wins += batch_wins
+            else:
+                future.cancel()
+        result = SimulationResult(done, wins, current, live_useful, done >= trials)
+        if result.completed:
+            _store_result(key, result)
+        try:
+            on_done(result)
+        finally:
+            _track(-1)
+
+    # 子程序會在期限後自行停止，計時器多留一點時間收結果
+    timer = threading.Timer(budget + 0.5, finish, kwargs={"timer_fired": True})
+    timer.daemon = True
+    timer.start()
+    for future in futures:
+        future.add_done_callback(lambda _: finish())
+    return None
+
+def _track(delta):
+    global _pending
+    with _pending_done:
+        _pending += delta
+        if _pending == 0:
+            _pending_done.notify_all()
+
+def shutdown(timeout):
+    """
+    等進行中的模擬回覆完畢（最多 timeout 秒），再關閉程序池
+
+    Returns:
+        int: 期限到時仍未回覆的模擬數
+    """
+    global _executor
+    with _pending_done:
+        _pending_done.wait_for(lambda: _pending == 0, timeout)
+        remaining = _pending
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+    return remaining
+
+def estimate(hand_counts, visible_counts, draws, trials=None, budget=None):
+    """同步版本的 start_simulation（供離線分析與測試使用）"""
+    results = []
+    finished = threading.Event()
+
+    def on_done(result):
+        results.append(result)
+        finished.set()
+
+    cached = start_simulation(hand_counts, visible_counts, draws, on_done, trials, budget)
+    if cached is not None:
+        return cached
+    finished.wait()
+    return results[0]
@@ -0,0 +1,106 @@
+"""
+個人統計引擎 - 結算時將每一手的結果累加到 user_stats
+
+每位使用者只有一列累計值，每手牌只做 O(1) 的加總與比較，
+/我的統計 讀取單一列即可，不必掃描歷史對局。
+統計在 /結算 時才寫入，對局中的 /撤銷、/重做 不需要回補統計。
+同一位玩家可能同時在兩個群組結算，統計列先依 line_user_id 排序以 SELECT ... FOR UPDATE 鎖住再累加。
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from models.game_event import GameEvent
+from models.user_stats import UserStats
+
+def lock_stats(db, line_user_ids):
+    """
+    依 line_user_id 排序鎖住使用者的統計列（SELECT ... FOR UPDATE），沒有的建立
+
+    Returns:
+        dict: {line_user_id: UserStats}
+    """
+    ids = sorted(set(line_user_ids))
+    rows = {s.line_user_id: s for s in db.scalars(
+        select(UserStats).where(UserStats.line_user_id.in_(ids))
+        .order_by(UserStats.line_user_id).with_for_update()
+        .execution_options(populate_existing=True)
+    )}
+    for line_user_id in ids:
+        if line_user_id not in rows:
+            rows[line_user_id] = UserStats(
+                line_user_id=line_user_id, games=0, hands_played=0, hands_won=0,
+                self_drawn_count=0, deal_in_count=0, total_tai=0, biggest_win=0,
+                current_streak=0, best_streak=0
+            )
+            db.add(rows[line_user_id])
+    return rows
+
+def record_hand(winner, loser, is_self_drawn, tai, amount):
+    """
+    累加一手胡牌結果
+
+    Args:
+        winner: 胡牌者的 UserStats
+        loser: 放槍者的 UserStats，自摸時為 None
+        tai: 本手總台數（含莊家台）
+        amount: 胡牌者本手總收入
+    """
+    winner.hands_won += 1
+    winner.total_tai += tai
+    winner.biggest_win = max(winner.biggest_win, amount)
+    if is_self_drawn:
+        winner.self_drawn_count += 1
+    elif loser is not None:
+        loser.deal_in_count += 1
+
+def record_game(stats, score, hands_played, now=None):
+    """累加一局的局數、手數與連勝／連敗"""
+    stats.games += 1
+    stats.hands_played += hands_played
+    if score > 0:
+        stats.current_streak = stats.current_streak + 1 if stats.current_streak > 0 else 1
+    elif score < 0:
+        stats.current_streak = stats.current_streak - 1 if stats.current_streak < 0 else -1
+    else:
+        stats.current_streak = 0
+    stats.best_streak = max(stats.best_streak, stats.current_streak)
+    stats.last_game_at = now or datetime.now(timezone.utc)
+
+def apply_game_stats(db, game, players, hands):
+    """
+    對局結算時更新所有玩家的個人統計
+
+    Args:
+        game: 結算中的對局
+        players: 本局玩家（Player 列）
+        hands: 本局胡牌記錄（Hand 列）
+    """
+    rows = lock_stats(db, [p.line_user_id for p in players])
+    stats_by_player = {p.id: rows[p.line_user_id] for p in players}
+
+    for hand in hands:
+        winner = stats_by_player.get(hand.winner_player_id)
+        if winner is None:
+            continue
+        # 莊家台只在莊家胡牌或付款時計入（與 compute_payments 一致）
+        tai = hand.tai or 0
+        if hand.dealer_player_id in (hand.winner_player_id, hand.loser_player_id) or hand.is_self_drawn:
+            tai += hand.dealer_tai or 0
+        record_hand(
+            winner,
+            stats_by_player.get(hand.loser_player_id),
+            hand.is_self_drawn,
+            tai,
+            hand.amount or 0
+        )
+
+    draws = db.query(GameEvent).filter(
+        GameEvent.game_id == game.id,
+        GameEvent.event_type == "draw",
+        GameEvent.seq <= game.event_seq
+    ).count()
+
+    now = datetime.now(timezone.utc)
+    for p in players:
+        record_game(stats_by_player[p.id], p.score or 0, len(hands) + draws, now)
@@ -0,0 +1,232 @@
+"""
+指令工作佇列 - 有上限的佇列與背景執行緒，過載時先捨棄低優先的查詢指令
+
+webhook 只把事件放進佇列就回 200，由固定數量的執行緒處理：
+- 佇列長度超過 WORK_QUEUE_SHED_DEPTH，或最舊的事件已等待超過 WORK_QUEUE_SHED_SECONDS 時，
+  新進的低優先指令（排行榜、統計等查詢）直接回覆「忙碌中」
+- 低優先指令取出時已等待過久，同樣回覆「忙碌中」而不處理
+- 修改對局的指令一律保留，只有達到硬上限 WORK_QUEUE_MAX 才拒絕
+- 高優先的指令先處理
+
+同一群組的事件永遠交給同一個執行緒（依群組 ID 的穩定雜湊分配），修改對局的指令依收到的順序執行，
+例如 /胡 之後的 /撤銷、/選風 之後的 /我當莊 不會顛倒；群組鎖只保證不同時執行，不保證順序。
+低優先的查詢可能排在同群組較晚的修改之後，看到的是較新的狀態。
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from utils.hashing import stable_hash
+
+WORK_QUEUE_THREADS = int(os.getenv("WORK_QUEUE_THREADS", "4"))
+WORK_QUEUE_MAX = int(os.getenv("WORK_QUEUE_MAX", "200"))
+WORK_QUEUE_SHED_DEPTH = int(os.getenv("WORK_QUEUE_SHED_DEPTH", "50"))
+WORK_QUEUE_SHED_SECONDS = float(os.getenv("WORK_QUEUE_SHED_SECONDS", "5"))
+
+HIGH = "high"
+LOW = "low"
+
+logger = logging.getLogger(__name__)
+
+BUSY_TEXT = "⏳ 目前忙碌中，請稍後再試"
+
+# 只讀取資料、晚點再查也無妨的指令
+LOW_PRIORITY_COMMANDS = (
+    "/排行榜", "/排行", "/週排行", "/本週排行", "/月排行", "/本月排行",
+    "/我的統計", "/統計", "/個人記錄", "/今日戰績", "/今日",
+    "/查詢牌型", "/勝率", "/暱稱資訊", "/我的暱稱",
+)
+
+def command_priority(text):
+    """指令文字 → HIGH 或 LOW"""
+    return LOW if text.strip().startswith(LOW_PRIORITY_COMMANDS) else HIGH
+
+class _Shard:
+    """一個處理執行緒的兩級優先佇列"""
+
+    __slots__ = ("queues", "condition")
+
+    def __init__(self, lock):
+        self.queues = {HIGH: deque(), LOW: deque()}  # (放入時間, 事件)
+        self.condition = threading.Condition(lock)
+
+class WorkQueue:
+    """
+    有上限的兩級優先佇列，同一個鍵（群組）的事件由同一個執行緒依序處理
+
+    Args:
+        handle: 處理事件的函式 handle(item)
+        on_shed: 捨棄事件時呼叫 on_shed(item, reason)，reason 為 closed（已停止）、full（硬上限）、
+                 overload（過載捨棄查詢）或 stale（查詢等待過久）
+        threads: 處理執行緒數
+    """
+
+    def __init__(self, handle, on_shed=None, threads=None, max_depth=None, shed_depth=None, shed_seconds=None):
+        self.handle = handle
+        self.on_shed = on_shed
+        self.threads = threads or WORK_QUEUE_THREADS
+        self.max_depth = max_depth or WORK_QUEUE_MAX
+        self.shed_depth = shed_depth or WORK_QUEUE_SHED_DEPTH
+        self.shed_seconds = shed_seconds or WORK_QUEUE_SHED_SECONDS
+        self._lock = threading.Lock()
+        self._shards = []
+        self._depth = 0
+        self._round_robin = itertools.count()
+        self._workers = []
+        self._running = False
+        self._stats = {"accepted": 0, "processed": 0, "failed": 0,
+                       "shed_closed": 0, "shed_full": 0, "shed_overload": 0, "shed_stale": 0,
+                       "total_wait": 0.0, "max_wait": 0.0, "max_depth": 0}
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._shards = [_Shard(self._lock) for _ in range(self.threads)]
+        self._workers = []
+        for i, shard in enumerate(self._shards):
+            worker = threading.Thread(target=self._run, args=(shard,), name=f"work-queue-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def depth(self):
+        with self._lock:
+            return self._depth
+
+    def _oldest_age(self, now):
+        heads = [queue[0][0] for shard in self._shards for queue in shard.queues.values() if queue]
+        return now - min(heads) if heads else 0.0
+
+    def _shard_for(self, key):
+        # 沒有鍵的事件輪流分配；有鍵的固定交給同一個執行緒
+        index = next(self._round_robin) if key is None else stable_hash(key)
+        return self._shards[index % len(self._shards)]
+
+    def submit(self, item, priority=HIGH, key=None):
+        """
+        放入事件
+
+        Args:
+            key: 需要依序處理的鍵（群組 ID），同一個鍵的事件由同一個執行緒處理
+
+        Returns:
+            bool: 是否收下（False 時已呼叫 on_shed）
+        """
+        now = time.monotonic()
+        with self._lock:
+            depth = self._depth
+            reason = None
+            if not self._running:
+                reason = "shed_closed"
+            elif depth >= self.max_depth:
+                reason = "shed_full"
+            elif priority == LOW and (depth >= self.shed_depth or self._oldest_age(now) >= self.shed_seconds):
+                reason = "shed_overload"
+            if reason is None:
+                shard = self._shard_for(key)
+                shard.queues[priority].append((now, item))
+                self._depth += 1
+                self._stats["accepted"] += 1
+                self._stats["max_depth"] = max(self._stats["max_depth"], depth + 1)
+                shard.condition.notify()
+                return True
+            self._stats[reason] += 1
+        self._shed(item, reason[len("shed_"):])
+        return False
+
+    def _shed(self, item, reason):
+        if self.on_shed is None:
+            return
+        try:
+            self.on_shed(item, reason)
+        except Exception:
+            logger.exception("回覆忙碌訊息失敗")
+
+    def _next(self, shard):
+        """取出此執行緒的下一個事件（高優先先），佇列停止且清空時回傳 None"""
+        with self._lock:
+            queues = shard.queues
+            while not (queues[HIGH] or queues[LOW]):
+                if not self._running:
+                    return None
+                shard.condition.wait()
+            priority = HIGH if queues[HIGH] else LOW
+            enqueued, item = queues[priority].popleft()
+            self._depth -= 1
+            waited = time.monotonic() - enqueued
+            self._stats["total_wait"] += waited
+            self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+            stale = priority == LOW and waited >= self.shed_seconds
+            if stale:
+                self._stats["shed_stale"] += 1
+            return item, stale
+
+    def _run(self, shard):
+        while True:
+            entry = self._next(shard)
+            if entry is None:
+                return
+            item, stale = entry
+            if stale:
+                self._shed(item, "stale")
+                continue
+            try:
+                self.handle(item)
+                outcome = "processed"
+            except Exception:
+                logger.exception("處理事件失敗")
+                outcome = "failed"
+            with self._lock:
+                self._stats[outcome] += 1
+
+    def _close(self):
+        with self._lock:
+            self._running = False
+            for shard in self._shards:
+                shard.condition.notify_all()
+
+    def stop(self, timeout=None):
+        """停止收新事件，處理完佇列中的事件後結束執行緒"""
+        self._close()
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def drain(self, timeout):
+        """
+        停止收新事件，在期限內處理完佇列
+
+        Returns:
+            list: 期限到時仍在佇列中的事件，依收到的順序（已從佇列移除，交由呼叫端保存）
+        """
+        deadline = time.monotonic() + timeout
+        self._close()
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            entries = [entry for shard in self._shards for queue in shard.queues.values() for entry in queue]
+            for shard in self._shards:
+                for queue in shard.queues.values():
+                    queue.clear()
+            self._depth = 0
+        entries.sort(key=lambda entry: entry[0])
+        return [item for _, item in entries]
+
+    def stats(self):
+        """
+        佇列統計
+
+        Returns:
+            dict: depth、oldest_wait（秒）、accepted／processed／failed、
+                  shed_closed／shed_full／shed_overload／shed_stale（各原因捨棄數）、avg_wait／max_wait（秒）、max_depth
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["depth"] = self._depth
+            stats["oldest_wait"] = self._oldest_age(time.monotonic())
+        dequeued = stats["processed"] + stats["failed"] + stats["shed_stale"]
+        stats["avg_wait"] = stats["total_wait"] / dequeued if dequeued else 0.0
+        return stats
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+測試 app factory：匯入 main 不連線資料庫，gunicorn 設定由 master 檢查資料庫結構
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+def run_python(script, **env):
+    """在乾淨的子程序執行程式碼，回傳標準輸出"""
+    env = {**os.environ, "LINE_CHANNEL_ACCESS_TOKEN": "x", "LINE_CHANNEL_SECRET": "y", **env}
+    env.pop("MAHJONG_SCHEMA_READY", None)
+    return subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, env=env).stdout
+
+def test_import_does_not_touch_database():
+    """測試匯入 main 只建立應用程式與路由，不建立資料庫檔案"""
+    print("🧪 測試匯入 main 不連線資料庫...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "factory.db")
+        output = run_python(
+            "import main; print(sorted(r.path for r in main.app.routes if r.path.startswith(('/metrics', '/webhook'))))",
+            DATABASE_URL=f"sqlite:///{path}",
+        )
+        assert "/webhook" in output and "/metrics/queue" in output, output
+        assert not os.path.exists(path), "匯入 main 不應建立資料庫"
+    print("✅ 匯入時沒有連線資料庫")
+
+def test_gunicorn_hooks():
+    """測試 master 的 on_starting 升級資料庫並設定旗標，post_fork 捨棄連線池"""
+    print("\n🦄 測試 gunicorn 設定...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hooks.db")
+        script = (
+            "import os, runpy, sqlalchemy\n"
+            "conf = runpy.run_path('gunicorn.conf.py')\n"
+            "assert conf['preload_app'] and conf['worker_class'] == 'uvicorn.workers.UvicornWorker'\n"
+            "conf['on_starting'](None)\n"
+            "from models.database import engine\n"
+            "print(os.environ['MAHJONG_SCHEMA_READY'], engine.pool.checkedout())\n"
+            "conf['post_fork'](None, None)\n"
+            "print('games' in sqlalchemy.inspect(engine).get_table_names())\n"
+        )
+        output = run_python(script, DATABASE_URL=f"sqlite:///{path}").split()
+        assert output == ["1", "0", "True"], output
+    print("✅ master 升級資料庫後不保留連線")
+
+if __name__ == "__main__":
+    print("🚀 開始 app factory 測試...")
+
+    test_import_does_not_touch_database()
+    test_gunicorn_hooks()
+
+    print("\n🎉 所有 app factory 測試通過！")
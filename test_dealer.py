@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+測試莊家輪替、連莊狀態機與莊錢計算
+"""
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.game import Game
+from models.player import Player
+from services.dealer import (
+    start_round_state, advance_round_state, unpack_round_state,
+    round_label, seat_wind, dealer_money
+)
+from services.event_store import append_event
+from handlers.hand_handler import handle_win_command, handle_draw_command
+from handlers.history_handler import handle_undo_command
+import testkit
+from testkit import FakeLineBotApi
+
+GROUP_ID = "test_dealer_group"
+
+def make_event(user_id):
+    """建立本群組的假訊息事件"""
+    return testkit.make_event(user_id, GROUP_ID)
+
+def test_round_state_machine():
+    """測試狀態機推進"""
+    print("🧪 測試莊家狀態機...")
+
+    # 南家先當莊
+    state = start_round_state(1)
+    assert round_label(state) == "東風東局"
+    assert seat_wind(state, "南") == 0 and seat_wind(state, "西") == 1
+
+    state = advance_round_state(state, dealer_kept=True)
+    state = advance_round_state(state, dealer_kept=True)
+    assert unpack_round_state(state).streak == 2
+    assert round_label(state) == "東風東局 連2拉2"
+    assert dealer_money(10, state, True) == 50
+    assert dealer_money(10, state, False) == 0
+    print(f"✅ 連莊兩次：{round_label(state)}，莊錢 50 元")
+
+    # 下莊四次回到第一任莊家 → 換南風圈
+    for _ in range(4):
+        state = advance_round_state(state, dealer_kept=False)
+    decoded = unpack_round_state(state)
+    assert decoded.round_wind == 1 and decoded.dealer_position == 1 and decoded.streak == 0
+    assert round_label(state) == "南風東局"
+    print(f"✅ 莊家輪一圈後換圈：{round_label(state)}")
+
+    # 打完四圈
+    for _ in range(12):
+        state = advance_round_state(state, dealer_kept=False)
+    assert unpack_round_state(state).completed
+    print(f"✅ 四圈結束：{round_label(state)}")
+
+    assert unpack_round_state(0) is None and round_label(0) == "尚未開始"
+
+def test_dealer_rotation_flow():
+    """測試胡牌與流局推進莊家，撤銷可以還原"""
+    print("\n🀄 測試莊家輪替流程...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = FakeLineBotApi()
+
+    testkit.cleanup(db, GROUP_ID, "dealer_user")
+
+    try:
+        game = Game(group_id=GROUP_ID, per_point=10, base_score=30, collect_money=True, status="created")
+        db.add(game)
+        db.commit()
+
+        users = [f"dealer_user{i}" for i in range(1, 5)]
+        for i, (user_id, wind) in enumerate(zip(users, ["東", "南", "西", "北"]), 1):
+            append_event(db, game, "join", {"line_user_id": user_id, "nickname": f"玩家{i}"})
+            append_event(db, game, "wind", {"line_user_id": user_id, "nickname": f"玩家{i}", "wind": wind})
+        append_event(db, game, "dealer", {"line_user_id": users[0], "nickname": "玩家1"})
+        db.commit()
+        assert round_label(game.round_state) == "東風東局"
+
+        # 流局：玩家1 連莊
+        handle_draw_command(make_event(users[2]), api, GROUP_ID)
+        db.expire_all()
+        assert round_label(game.round_state) == "東風東局 連1拉1", api.replies[-1]
+        print("✅ 流局連莊")
+
+        # 玩家2 胡玩家1（莊家）放槍：平胡 2 台 + 莊家 1 台 + 連1拉1 2 台 = 底 30 + 50
+        handle_win_command(make_event(users[1]), api, "/胡 123m456m789p99s123s 吃234p 放槍 玩家1", GROUP_ID)
+        print(api.replies[-1])
+        db.expire_all()
+        scores = {p.nickname: p.score for p in db.query(Player).filter(Player.game_id == game.id)}
+        assert scores["玩家2"] == 80 and scores["玩家1"] == -80, scores
+        dealer = db.query(Player).filter(Player.game_id == game.id, Player.is_dealer == "yes").one()
+        assert dealer.nickname == "玩家2"
+        assert round_label(game.round_state) == "東風南局"
+        print("✅ 莊家放槍後下莊，莊錢正確計入")
+
+        # 撤銷胡牌：莊家與連莊恢復
+        handle_undo_command(make_event(users[0]), api, GROUP_ID)
+        db.expire_all()
+        dealer = db.query(Player).filter(Player.game_id == game.id, Player.is_dealer == "yes").one()
+        assert dealer.nickname == "玩家1"
+        assert round_label(game.round_state) == "東風東局 連1拉1"
+        print("✅ 撤銷後莊家狀態還原")
+
+        # 不收莊錢：莊家台不計
+        game.collect_money = False
+        db.commit()
+        handle_win_command(make_event(users[1]), api, "/胡 123m456m789p99s123s 吃234p 放槍 玩家1", GROUP_ID)
+        db.expire_all()
+        scores = {p.nickname: p.score for p in db.query(Player).filter(Player.game_id == game.id)}
+        assert scores["玩家2"] == 50, scores
+        print("✅ 不收莊錢時只算台型")
+
+    finally:
+        testkit.cleanup(db, GROUP_ID, "dealer_user")
+        db.close()
+        print("🧹 測試資料已清理")
+
+if __name__ == "__main__":
+    print("🚀 開始莊家狀態機測試...")
+
+    test_round_state_machine()
+    test_dealer_rotation_flow()
+
+    print("\n🎉 所有莊家狀態機測試通過！")
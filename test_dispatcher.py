@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+測試群組黏著分派：一致性雜湊環的分布與換手比例、同群組事件由同一程序依序處理，以及送出佇列的上限
+"""
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from services.dispatcher import Dispatcher, HashRing, routing_key
+from services.work_queue import HIGH, LOW
+
+def record_event(payload):
+    """worker 中執行：把 (程序, 群組, 序號) 附加到記錄檔"""
+    with open(payload["path"], "a") as f:
+        f.write(f"{os.getpid()} {payload['group']} {payload['seq']}\n")
+
+def record_slowly(payload):
+    """worker 中執行：處理很慢的事件"""
+    time.sleep(0.2)
+    record_event(payload)
+
+def save_leftover(payloads):
+    """worker 中執行：關機期限到時保存還沒處理的事件"""
+    for payload in payloads:
+        with open(payload["path"] + ".leftover", "a") as f:
+            f.write(f"{payload['group']} {payload['seq']}\n")
+
+def test_hash_ring():
+    """測試分布平均、同一鍵固定，以及增減節點時只有少數群組換手"""
+    print("🧪 測試一致性雜湊環...")
+
+    groups = [f"C{i:05d}" for i in range(4000)]
+    ring = HashRing([f"worker-{i}" for i in range(4)])
+    before = {group: ring.node_for(group) for group in groups}
+    assert before == {group: ring.node_for(group) for group in groups}
+
+    counts = {}
+    for node in before.values():
+        counts[node] = counts.get(node, 0) + 1
+    assert len(counts) == 4 and min(counts.values()) > 4000 / 4 * 0.6, counts
+
+    ring.add("worker-4")
+    after = {group: ring.node_for(group) for group in groups}
+    moved = [group for group in groups if before[group] != after[group]]
+    assert all(after[group] == "worker-4" for group in moved)
+    assert len(moved) < 4000 * 0.35, len(moved)  # 理想值約 1/5
+
+    ring.remove("worker-4")
+    assert before == {group: ring.node_for(group) for group in groups}
+
+    assert routing_key(SimpleNamespace(group_id="G1", user_id="U1")) == "G1"
+    assert routing_key(SimpleNamespace(user_id="U1")) == "U1"
+    print(f"✅ 分布 {sorted(counts.values())}，加入第 5 個 worker 只換手 {len(moved)} 個群組")
+
+def test_dispatcher_sticky_and_ordered():
+    """測試同群組的事件都交給同一個 worker，且依送出順序處理"""
+    print("\n📨 測試事件分派...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.log")
+        dispatcher = Dispatcher(record_event, workers=3)
+        try:
+            for seq in range(15):
+                for group in [f"G{i}" for i in range(8)]:
+                    dispatcher.submit(group, {"path": path, "group": group, "seq": seq})
+        finally:
+            dispatcher.stop()
+
+        with open(path) as f:
+            rows = [line.split() for line in f]
+    assert len(rows) == 120
+
+    pids, sequences = {}, {}
+    for pid, group, seq in rows:
+        pids.setdefault(group, set()).add(pid)
+        sequences.setdefault(group, []).append(int(seq))
+    assert all(len(owners) == 1 for owners in pids.values()), pids
+    assert all(seqs == list(range(15)) for seqs in sequences.values())
+    print(f"✅ 8 個群組由 {len({next(iter(p)) for p in pids.values()})} 個 worker 各自依序處理")
+
+def test_stop_saves_unprocessed():
+    """測試關機期限到時，Pipe 中還沒處理的事件交給 on_leftover 保存，一筆都不少"""
+    print("\n💾 測試分派模式關機保存...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.log")
+        dispatcher = Dispatcher(record_slowly, workers=1, on_leftover=save_leftover)
+        for seq in range(10):
+            dispatcher.submit("G1", {"path": path, "group": "G1", "seq": seq})
+        deadline = time.monotonic() + 10
+        while not os.path.exists(path) and time.monotonic() < deadline:  # 等 worker 啟動並處理第一筆
+            time.sleep(0.01)
+        dispatcher.stop(timeout=0.3)
+
+        with open(path) as f:
+            processed = [int(line.split()[2]) for line in f]
+        with open(path + ".leftover") as f:
+            saved = [int(line.split()[1]) for line in f]
+    assert processed and saved and processed + saved == list(range(10)), (processed, saved)
+    print(f"✅ 處理 {len(processed)} 筆，保存 {len(saved)} 筆")
+
+def test_submit_bounded():
+    """測試 worker 塞住時 submit 不阻塞：先捨棄查詢指令，達到上限時一律拒絕，收下的事件不遺失"""
+    print("\n🚦 測試送出佇列上限...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.log")
+        shed = []
+        dispatcher = Dispatcher(record_slowly, workers=1, on_leftover=save_leftover,
+                                on_shed=lambda payload, reason: shed.append((payload["seq"], reason)),
+                                max_depth=4, shed_depth=2)
+        pad = "x" * 200_000  # 比 Pipe 的緩衝區大，送出執行緒會卡在寫入
+        started = time.monotonic()
+        assert dispatcher.submit("G1", {"path": path, "group": "G1", "seq": 0, "pad": pad})
+        while dispatcher.depth():  # 送出執行緒已取走第一筆，卡在 Pipe 上
+            time.sleep(0.001)
+        results = [dispatcher.submit("G1", {"path": path, "group": "G1", "seq": seq, "pad": pad}, priority)
+                   for seq, priority in ((1, HIGH), (2, HIGH), (3, LOW), (4, HIGH), (5, HIGH), (6, HIGH))]
+        elapsed = time.monotonic() - started
+        assert results == [True, True, False, True, True, False], results
+        assert shed == [(3, "overload"), (6, "full")], shed
+        assert elapsed < 0.5, elapsed
+        stats = dispatcher.stats()
+        assert stats["accepted"] == 5 and stats["shed_overload"] == 1 and stats["shed_full"] == 1, stats
+        dispatcher.stop(timeout=0.3)
+
+        processed, saved = [], []
+        if os.path.exists(path):
+            with open(path) as f:
+                processed = [int(line.split()[2]) for line in f]
+        with open(path + ".leftover") as f:
+            saved = [int(line.split()[1]) for line in f]
+    assert sorted(processed + saved) == [0, 1, 2, 4, 5], (processed, saved)
+    print(f"✅ submit 共 {elapsed * 1000:.0f} ms，捨棄 {shed}，收下的 5 筆都處理或保存")
+
+if __name__ == "__main__":
+    print("🚀 開始分派測試...")
+
+    test_hash_ring()
+    test_dispatcher_sticky_and_ordered()
+    test_stop_saves_unprocessed()
+    test_submit_bounded()
+
+    print("\n🎉 所有分派測試通過！")
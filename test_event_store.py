@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+測試對局事件記錄、快照重建與 /撤銷、/重做
+"""
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.game import Game
+from models.player import Player
+from models.hand import Hand
+from models.game_snapshot import GameSnapshot
+from services import event_store
+from handlers.join_handler import handle_join_command, handle_wind_selection
+from handlers.status_handler import handle_dealer_command
+from handlers.hand_handler import handle_win_command
+from handlers.history_handler import handle_undo_command, handle_redo_command
+import testkit
+
+GROUP_ID = "test_event_group"
+
+def make_event(user_id):
+    """建立本群組的假訊息事件"""
+    return testkit.make_event(user_id, GROUP_ID)
+
+def cleanup(db):
+    """清理本測試建立的資料"""
+    testkit.cleanup(db, GROUP_ID, "event_user")
+
+def scores(db, game_id):
+    return {p.nickname: p.score for p in db.query(Player).filter(Player.game_id == game_id)}
+
+def test_undo_redo_flow():
+    """測試完整流程中的撤銷與重做"""
+    print("🧪 測試撤銷與重做...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = testkit.FakeLineBotApi(lambda user_id: f"玩家{user_id[-1]}")
+    original_interval = event_store.SNAPSHOT_INTERVAL
+    event_store.SNAPSHOT_INTERVAL = 4
+
+    try:
+        cleanup(db)
+        game = Game(group_id=GROUP_ID, per_point=10, base_score=30, status="created")
+        db.add(game)
+        db.commit()
+
+        users = [f"event_user{i}" for i in range(1, 5)]
+        for user_id in users:
+            handle_join_command(make_event(user_id), api, "/加入", GROUP_ID)
+        for user_id, wind in zip(users, ["東", "南", "西", "北"]):
+            handle_wind_selection(make_event(user_id), api, wind, GROUP_ID)
+        handle_dealer_command(make_event(users[0]), api, GROUP_ID)
+
+        db.expire_all()
+        assert game.status == "playing", api.replies[-1]
+        assert game.event_seq == 9
+        print("✅ 9 筆事件：4 加入、4 選風、1 當莊")
+
+        handle_win_command(make_event(users[1]), api, "/胡 123m456m789p99s123s 吃234p 放槍 玩家4", GROUP_ID)
+        db.expire_all()
+        after_hand = scores(db, game.id)
+        assert after_hand == {"玩家1": 0, "玩家2": 50, "玩家3": 0, "玩家4": -50}, after_hand
+        print(f"✅ 胡牌後分數：{after_hand}")
+
+        # 撤銷胡牌：分數與胡牌記錄都回到原狀
+        handle_undo_command(make_event(users[0]), api, GROUP_ID)
+        db.expire_all()
+        assert "已撤銷" in api.replies[-1], api.replies[-1]
+        assert set(scores(db, game.id).values()) == {0}
+        assert db.query(Hand).filter(Hand.game_id == game.id).count() == 0
+        print("✅ 撤銷胡牌成功")
+
+        # 重做胡牌
+        handle_redo_command(make_event(users[0]), api, GROUP_ID)
+        db.expire_all()
+        assert scores(db, game.id) == after_hand
+        assert db.query(Hand).filter(Hand.game_id == game.id).count() == 1
+        print("✅ 重做胡牌成功")
+
+        # 連續撤銷到莊家之前：對局回到未開始
+        handle_undo_command(make_event(users[0]), api, GROUP_ID)
+        handle_undo_command(make_event(users[0]), api, GROUP_ID)
+        db.expire_all()
+        assert game.status == "created"
+        assert not any(p.is_dealer == "yes" for p in db.query(Player).filter(Player.game_id == game.id))
+        print("✅ 撤銷當莊後對局回到準備階段")
+
+        # 撤銷後新增事件會清除重做堆疊
+        handle_dealer_command(make_event(users[1]), api, GROUP_ID)
+        handle_redo_command(make_event(users[0]), api, GROUP_ID)
+        assert "沒有可以重做" in api.replies[-1], api.replies[-1]
+        print("✅ 新動作清除重做堆疊")
+
+    finally:
+        event_store.SNAPSHOT_INTERVAL = original_interval
+        cleanup(db)
+        db.close()
+        print("🧹 測試資料已清理")
+
+def test_rebuild_from_snapshot():
+    """測試重建狀態只重播快照之後的事件"""
+    print("\n📸 測試快照重建...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    original_interval = event_store.SNAPSHOT_INTERVAL
+    event_store.SNAPSHOT_INTERVAL = 3
+
+    try:
+        cleanup(db)
+        game = Game(group_id=GROUP_ID, status="created")
+        db.add(game)
+        db.commit()
+
+        for i in range(1, 5):
+            event_store.append_event(db, game, "join", {"line_user_id": f"event_user{i}", "nickname": f"玩家{i}"})
+        event_store.append_event(db, game, "quit", {"line_user_id": "event_user2", "nickname": "玩家2"})
+        db.commit()
+
+        snapshots = [s.seq for s in db.query(GameSnapshot).filter(GameSnapshot.game_id == game.id)]
+        assert snapshots == [3], snapshots
+
+        state, replayed = event_store.rebuild_state(db, game.id, 5)
+        assert len(replayed) == 2, replayed
+        assert state == event_store.state_from_rows(db, game)
+        seats = {p["nickname"]: p["seat_number"] for p in state["players"].values()}
+        assert seats == {"玩家1": 1, "玩家3": 2, "玩家4": 3}, seats
+        print(f"✅ 從序號 3 的快照重播 {len(replayed)} 筆事件，座位：{seats}")
+
+    finally:
+        event_store.SNAPSHOT_INTERVAL = original_interval
+        cleanup(db)
+        db.close()
+
+if __name__ == "__main__":
+    print("🚀 開始事件記錄測試...")
+
+    test_undo_redo_flow()
+    test_rebuild_from_snapshot()
+
+    print("\n🎉 所有事件記錄測試通過！")
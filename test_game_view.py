@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+測試對局唯讀檢視：Core select() 組成 namedtuple、群組版本號未變時使用快取、快取大小
+"""
+import sys
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from services import game_view
+from services.game_lookup import find_active_game
+from services.game_view import GameView, PlayerView, find_active_view, get_active_game
+from handlers.game_handler import handle_game_command
+from handlers.join_handler import handle_join_command, handle_wind_selection
+from handlers.status_handler import handle_status_command
+from utils.templates import render_stats
+import testkit
+from testkit import FakeLineBotApi
+
+GROUP_ID = "test_game_view_group"
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def make_event(user_id):
+    """建立本群組的假訊息事件"""
+    return testkit.make_event(user_id, GROUP_ID)
+
+def cleanup(db):
+    """清理本測試建立的資料"""
+    testkit.cleanup(db, GROUP_ID, "view_user")
+
+def deep_size(obj, seen=None):
+    """namedtuple 與其中欄位值的大小總和（共用的物件只算一次）"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, tuple):
+        return sys.getsizeof(obj) + sum(deep_size(item, seen) for item in obj)
+    return sys.getsizeof(obj)
+
+def test_views_and_cache():
+    """測試檢視內容與 ORM 一致，未變動時命中快取，寫入後重新讀取"""
+    print("🧪 測試對局唯讀檢視...")
+
+    upgrade_schema()
+    game_view.reset_cache()
+    db = SessionLocal()
+    api = FakeLineBotApi()
+    try:
+        cleanup(db)
+        handle_game_command(make_event("view_user1"), api, "/開局", GROUP_ID)
+        for i in range(1, 5):
+            handle_join_command(make_event(f"view_user{i}"), api, "/加入", GROUP_ID)
+        assert "人數已滿" in api.replies[-1], api.replies[-1]
+
+        game = find_active_game(db, GROUP_ID, "view_user2")
+        view = find_active_view(db, GROUP_ID, "view_user2")
+        assert isinstance(view, GameView)
+        assert view.id == game.id and view.table_code == game.table_code and view.per_point == game.per_point
+        db.rollback()
+
+        active = get_active_game(db, view.id, GROUP_ID)
+        assert [p.nickname for p in active.players] == [f"view_user{i}" for i in range(1, 5)]
+        assert all(isinstance(p, PlayerView) for p in active.players)
+        assert get_active_game(db, view.id, GROUP_ID) is active  # 未變動：同一個快取物件
+
+        size = deep_size(active)
+        assert size < 2000, size
+        print(f"✅ 快取的對局（含 4 位玩家）約 {size} bytes")
+
+        # 選風會遞增群組版本號，下一次讀取拿到新資料
+        handle_wind_selection(make_event("view_user1"), api, "東", GROUP_ID)
+        refreshed = get_active_game(db, view.id, GROUP_ID)
+        assert refreshed is not active and refreshed.version > active.version
+        assert refreshed.players[0].wind_position == "東"
+
+        handle_status_command(make_event("view_user1"), api, GROUP_ID)
+        assert "1號: view_user1 (東風)" in api.replies[-1], api.replies[-1]
+        print("✅ 寫入後重新讀取，/狀態 顯示最新風位")
+
+        # 群組沒有變動：再次 /狀態 直接使用上次渲染的訊息
+        hits = render_stats()["hits"]
+        handle_status_command(make_event("view_user3"), api, GROUP_ID)
+        assert api.replies[-1] is api.replies[-2] and render_stats()["hits"] == hits + 1
+        print("✅ 重複 /狀態 命中渲染快取")
+    finally:
+        cleanup(db)
+        db.close()
+        game_view.reset_cache()
+
+if __name__ == "__main__":
+    print("🚀 開始對局唯讀檢視測試...")
+
+    test_views_and_cache()
+
+    print("\n🎉 所有對局唯讀檢視測試通過！")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+測試關機排空：期限內處理佇列、來不及處理的事件存進 pending_events，重新啟動後再處理；延遲的修改指令改以 push 通知，重複的事件不處理
+"""
+import os
+import threading
+import time
+
+os.environ.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "test_token")
+os.environ.setdefault("LINE_CHANNEL_SECRET", "test_secret")
+
+from linebot.models import MessageEvent
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.pending_event import PendingEvent
+from models.processed_event import ProcessedEvent
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from services.retry import already_processed, claim_pending, claiming, persist_events, reply_expired
+from services.work_queue import HIGH, WorkQueue
+from testkit import FakeLineBotApi
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def make_payload(text, seconds_ago=0):
+    """建立 LINE 文字訊息事件的 JSON"""
+    timestamp = int((time.time() - seconds_ago) * 1000)
+    return {"type": "message", "mode": "active", "timestamp": timestamp, "replyToken": f"token-{text}",
+            "source": {"type": "group", "groupId": "shutdown_group", "userId": "shutdown_user"},
+            "message": {"type": "text", "id": "1", "text": text}}
+
+def test_persist_and_claim():
+    """測試保存、認領與捨棄超過保留期限的事件"""
+    print("🧪 測試待重試事件...")
+
+    upgrade_schema()
+    db = SessionLocal()
+    try:
+        db.query(PendingEvent).delete()
+        payloads = [make_payload("/胡 123m", seconds_ago=120), make_payload("/結算", seconds_ago=7200)]
+        assert persist_events(db, payloads, "drain_timeout") == 2
+        db.commit()
+
+        payloads, expired = claim_pending(db, max_age=600)
+        db.commit()
+        assert [p["message"]["text"] for p in payloads] == ["/胡 123m"] and expired == 1
+        assert claim_pending(db) == ([], 0)  # 已被認領，不會重複處理
+        print("✅ 保留期限內的事件取回（即使回覆 token 已失效），超過期限的事件捨棄")
+    finally:
+        db.query(PendingEvent).delete()
+        db.commit()
+        db.close()
+
+def test_expired_and_duplicate_events():
+    """測試回覆 token 失效的判斷，同一個 webhookEventId 只處理一次"""
+    print("\n🔂 測試重複事件...")
+
+    assert not reply_expired(make_payload("/胡")["timestamp"])
+    assert reply_expired(make_payload("/胡", seconds_ago=120)["timestamp"])
+    assert not reply_expired(None)
+
+    upgrade_schema()
+    db = SessionLocal()
+    try:
+        db.query(ProcessedEvent).filter(ProcessedEvent.webhook_event_id.like("shutdown-%")).delete(synchronize_session=False)
+        db.commit()
+        def handle(webhook_event_id, fail=False):
+            """模擬 handler：在自己的 Session 中提交（或中途失敗回滾）"""
+            with claiming(webhook_event_id), SessionLocal() as handler_db:
+                handler_db.execute(select(1))
+                if fail:
+                    handler_db.rollback()
+                else:
+                    handler_db.commit()
+                    handler_db.execute(select(1))
+                    handler_db.commit()  # 同一事件之後的提交不再重複記錄
+
+        handle("shutdown-1", fail=True)
+        assert not already_processed(db, "shutdown-1")  # handler 中途失敗，下次重送仍會處理
+        handle("shutdown-1")
+        assert already_processed(db, "shutdown-1")  # LINE 重送或重新處理時略過
+        assert not already_processed(db, "shutdown-2") and not already_processed(db, None)
+        try:
+            handle("shutdown-1")  # 同一事件同時被處理兩次：後提交的交易整筆回滾
+            assert False, "重複的事件應該無法提交"
+        except IntegrityError:
+            pass
+        print("✅ 重複事件只處理一次")
+    finally:
+        db.query(ProcessedEvent).filter(ProcessedEvent.webhook_event_id.like("shutdown-%")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+def test_expired_commands():
+    """測試回覆 token 失效後，修改指令照常處理並改用 push 通知，查詢指令捨棄"""
+    print("\n📮 測試延遲處理的事件...")
+
+    import main
+
+    upgrade_schema()
+    fake_api = FakeLineBotApi()
+    original_api = main.line_bot_api
+    main.line_bot_api = fake_api
+    try:
+        main.handle_message(MessageEvent.new_from_json_dict(make_payload("/排行榜", seconds_ago=120)))
+        assert fake_api.replies == [] and fake_api.pushes == []
+        main.handle_message(MessageEvent.new_from_json_dict(make_payload("/狀態", seconds_ago=120)))
+        assert fake_api.replies == [] and len(fake_api.pushes) == 1
+        assert fake_api.pushes[0][0] == "shutdown_group"
+        print(f"✅ 查詢指令捨棄，修改指令改以 push 回覆：{fake_api.pushes[0][1][:20]}")
+    finally:
+        main.line_bot_api = original_api
+
+def test_busy_reply_off_loop():
+    """測試佇列拒收時，忙碌回覆在背景執行緒送出，不阻塞呼叫端（事件迴圈）"""
+    print("\n🐢 測試背景回覆忙碌...")
+
+    import main
+
+    class SlowLineBotApi(FakeLineBotApi):
+        def reply_message(self, reply_token, message):
+            time.sleep(0.3)
+            super().reply_message(reply_token, message)
+
+    slow_api = SlowLineBotApi()
+    original_api = main.line_bot_api
+    main.line_bot_api = slow_api
+    try:
+        started = time.monotonic()
+        main.reply_busy(MessageEvent.new_from_json_dict(make_payload("/排行榜")), "overload")
+        elapsed = time.monotonic() - started
+        assert elapsed < 0.1 and slow_api.replies == [], elapsed
+        main.wait_shed_replies(2)
+        assert slow_api.replies == [main.QUEUE_BUSY_TEXT], slow_api.replies
+        print(f"✅ reply_busy 在 {elapsed * 1000:.1f} ms 內返回，回覆稍後送出")
+    finally:
+        main.line_bot_api = original_api
+
+def test_drain_returns_leftover():
+    """測試期限到時回傳仍在佇列中的事件"""
+    print("\n⏳ 測試佇列排空期限...")
+
+    gate = threading.Event()
+    handled = []
+
+    def handle(item):
+        gate.wait(1)
+        handled.append(item)
+
+    queue = WorkQueue(handle, threads=1)
+    queue.start()
+    for item in ("a", "b", "c"):
+        queue.submit(item, HIGH)
+    leftover = queue.drain(0.2)
+    gate.set()
+    assert handled == ["a"] or handled == [], handled
+    assert leftover == ["b", "c"], leftover
+    assert queue.depth() == 0
+    print(f"✅ 期限到時留下 {leftover}")
+
+def test_shutdown_and_replay():
+    """測試 worker 關機時保存未處理事件，下次啟動重新處理"""
+    print("\n🔁 測試關機保存與重新處理...")
+
+    import main
+
+    upgrade_schema()
+    db = SessionLocal()
+    db.query(PendingEvent).delete()
+    db.commit()
+
+    gate = threading.Event()
+    handled = []
+    original_handle, original_drain = main.handle_message, main.SHUTDOWN_DRAIN_SECONDS
+    original_threads = main.work_queue.threads
+
+    def slow_handle(event):
+        gate.wait(2)
+        handled.append(event.message.text)
+
+    main.handle_message = slow_handle
+    main.SHUTDOWN_DRAIN_SECONDS = 0.2
+    main.work_queue.threads = 1  # 一個執行緒卡在第一個事件，其餘留在佇列
+    try:
+        main.start_background_workers()
+        for text in ("/加入 小明", "/加入 小華", "/狀態"):
+            main.enqueue_event(MessageEvent.new_from_json_dict(make_payload(text)))
+        while main.work_queue.depth() > 2:
+            time.sleep(0.005)
+
+        main.stop_background_workers()
+        gate.set()
+        assert db.query(PendingEvent).count() == 2
+
+        # 重新啟動：事件依原本順序重新處理
+        main.start_background_workers()
+        deadline = time.monotonic() + 2
+        while len(handled) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert handled == ["/加入 小明", "/加入 小華", "/狀態"], handled
+        assert db.query(PendingEvent).count() == 0
+        print(f"✅ 關機保存 2 筆，重新啟動後處理完畢：{handled}")
+    finally:
+        gate.set()
+        main.SHUTDOWN_DRAIN_SECONDS = 1
+        main.stop_background_workers()
+        main.handle_message, main.SHUTDOWN_DRAIN_SECONDS = original_handle, original_drain
+        main.work_queue.threads = original_threads
+        db.query(PendingEvent).delete()
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    print("🚀 開始關機排空測試...")
+
+    test_persist_and_claim()
+    test_expired_and_duplicate_events()
+    test_expired_commands()
+    test_busy_reply_off_loop()
+    test_drain_returns_leftover()
+    test_shutdown_and_replay()
+
+    print("\n🎉 所有關機排空測試通過！")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+測試群組鎖：鎖鍵跨程序穩定、同群組依序執行、不同群組互不阻擋與等待統計
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from services.group_lock import lock_group, lock_key, lock_stats, reset_lock_stats
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def test_lock_key_is_stable():
+    """測試鎖鍵不受 PYTHONHASHSEED 影響，且落在 bigint 範圍內"""
+    print("🧪 測試群組鎖鍵...")
+
+    key = lock_key("C1234567890abcdef")
+    assert -2**63 <= key < 2**63
+    assert lock_key("C1234567890abcdef") == key and lock_key("Cother") != key
+
+    script = "from services.group_lock import lock_key; print(lock_key('C1234567890abcdef'))"
+    for seed in ("1", "2"):
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                                env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        assert int(output) == key, (seed, output)
+    print(f"✅ 各程序算出相同的鎖鍵：{key}")
+
+def hold_lock(group_id, seconds, log):
+    """取得群組鎖後停留一段時間，記錄進入與離開的時間"""
+    db = SessionLocal()
+    try:
+        lock_group(db, group_id)
+        log.append(("enter", group_id, time.perf_counter()))
+        time.sleep(seconds)
+        log.append(("leave", group_id, time.perf_counter()))
+        db.commit()
+    finally:
+        db.close()
+
+def test_same_group_serialized():
+    """測試同群組的交易依序執行，交易結束即釋放"""
+    print("\n🔒 測試同群組依序執行...")
+
+    reset_lock_stats()
+    counter = {"value": 0}
+
+    def increment():
+        db = SessionLocal()
+        try:
+            lock_group(db, "lock_test_group")
+            value = counter["value"]
+            time.sleep(0.01)  # 沒有鎖時其他執行緒會讀到相同的舊值
+            counter["value"] = value + 1
+            db.commit()
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=increment) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter["value"] == 8, counter
+
+    stats = lock_stats()
+    assert stats["acquired"] == 8 and stats["max_wait"] >= 0.005, stats
+    print(f"✅ 8 次讀改寫沒有遺失更新，平均等待 {stats['avg_wait'] * 1000:.1f} ms")
+
+    # rollback 與 close 也會釋放
+    db = SessionLocal()
+    lock_group(db, "lock_test_group")
+    db.rollback()
+    lock_group(db, "lock_test_group")
+    db.close()
+
+def test_other_groups_not_blocked():
+    """測試持有某群組的鎖時，其他群組不必等待"""
+    print("\n🚦 測試不同群組互不阻擋...")
+
+    log = []
+    holder = threading.Thread(target=hold_lock, args=("lock_group_a", 0.3, log))
+    holder.start()
+    while not log:
+        time.sleep(0.005)
+
+    db = SessionLocal()
+    try:
+        waited = lock_group(db, "lock_group_b")
+        assert waited < 0.1, waited
+    finally:
+        db.close()
+    holder.join()
+    print(f"✅ 其他群組等待 {waited * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    print("🚀 開始群組鎖測試...")
+
+    test_lock_key_is_stable()
+    test_same_group_serialized()
+    test_other_groups_not_blocked()
+
+    print("\n🎉 所有群組鎖測試通過！")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+測試胡牌台型倒排索引與 /查詢牌型 指令
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.user import User
+from services.hand_index import (ALL_WINS, PATTERN_CODES, count_pattern, index_hands, pattern_codes,
+                                 pattern_counts, period_since, top_feeders)
+from services.scoring import PATTERN_BITS
+from handlers.pattern_handler import handle_pattern_query_command
+from utils.parser import parse_pattern_query
+import testkit
+from testkit import FakeLineBotApi, make_event
+
+def test_pattern_codes_and_parser():
+    """測試位元遮罩拆解與指令解析"""
+    print("🧪 測試台型編號與指令解析...")
+
+    mask = PATTERN_BITS["清一色"] | PATTERN_BITS["自摸"]
+    assert pattern_codes(mask) == [PATTERN_CODES["自摸"], PATTERN_CODES["清一色"]]
+    assert "莊家" not in PATTERN_CODES and "連莊" not in PATTERN_CODES
+
+    assert parse_pattern_query("/查詢牌型") == {"pattern": None, "period": "全部"}
+    assert parse_pattern_query("/查詢牌型 今年 清一色") == {"pattern": "清一色", "period": "今年"}
+    try:
+        parse_pattern_query("/查詢牌型 清一色 碰碰胡")
+    except ValueError as e:
+        print(f"✅ 正確拒絕多個台型：{e}")
+    else:
+        raise AssertionError("多個台型應該要失敗")
+
+def test_index_queries_and_command():
+    """測試索引寫入、期間查詢與 /查詢牌型 回覆"""
+    print("\n🔍 測試台型索引查詢...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = FakeLineBotApi()
+
+    players = [SimpleNamespace(id=9100 + i, line_user_id=f"idx_user{i}") for i in range(1, 5)]
+    now = datetime.now(timezone.utc)
+    last_year = now - timedelta(days=400)
+    flush = PATTERN_BITS["清一色"] | PATTERN_BITS["門清"]
+    hands = [
+        # 小明：今年兩次清一色（小華放槍、小美放槍）、一次自摸平常手，去年一次清一色（小華放槍）
+        SimpleNamespace(id=990001, winner_player_id=9101, loser_player_id=9102, pattern_mask=flush, created_at=now),
+        SimpleNamespace(id=990002, winner_player_id=9101, loser_player_id=9103, pattern_mask=flush, created_at=now),
+        SimpleNamespace(id=990003, winner_player_id=9101, loser_player_id=None,
+                        pattern_mask=PATTERN_BITS["自摸"], created_at=now),
+        SimpleNamespace(id=990004, winner_player_id=9101, loser_player_id=9102,
+                        pattern_mask=PATTERN_BITS["清一色"], created_at=last_year),
+        SimpleNamespace(id=990005, winner_player_id=9104, loser_player_id=9101, pattern_mask=0, created_at=now),
+    ]
+
+    try:
+        testkit.cleanup(db, user_prefix="idx_user")
+        for i, name in enumerate(["小明", "小華", "小美", "小王"], 1):
+            db.add(User(line_user_id=f"idx_user{i}", display_name=name))
+        assert index_hands(db, players, hands) == 11
+        db.commit()
+
+        this_year = period_since("今年", now)
+        flush_code = PATTERN_CODES["清一色"]
+        assert count_pattern(db, "idx_user1", flush_code) == 3
+        assert count_pattern(db, "idx_user1", flush_code, this_year) == 2
+        assert count_pattern(db, "idx_user1", ALL_WINS, this_year) == 3
+        assert pattern_counts(db, "idx_user1")[0] == ("清一色", 3)
+        assert [tuple(row) for row in top_feeders(db, "idx_user1")] == [("idx_user2", 2), ("idx_user3", 1)]
+        print("✅ 台型次數與放槍者統計正確")
+
+        handle_pattern_query_command(make_event("idx_user1"), api, "/查詢牌型 清一色 今年")
+        assert "今年以「清一色」胡牌：2 次" in api.replies[-1], api.replies[-1]
+        assert "小華: 1 次" in api.replies[-1] and "小美: 1 次" in api.replies[-1]
+
+        handle_pattern_query_command(make_event("idx_user1"), api, "/查詢牌型")
+        assert "全部胡牌：4 次" in api.replies[-1] and "自摸: 1 次" in api.replies[-1], api.replies[-1]
+        assert "小華: 2 次" in api.replies[-1]
+
+        handle_pattern_query_command(make_event("idx_user1"), api, "/查詢牌型 十三么")
+        assert "找不到台型" in api.replies[-1]
+        print(api.replies[1])
+
+    finally:
+        testkit.cleanup(db, user_prefix="idx_user")
+        db.close()
+
+if __name__ == "__main__":
+    print("🚀 開始台型索引測試...")
+
+    test_pattern_codes_and_parser()
+    test_index_queries_and_command()
+
+    print("\n🎉 所有台型索引測試通過！")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+測試啟動時間：以 python -X importtime 匯入 main，整理成報告，並確認少用的模組延後匯入
+
+少用的 handler、資料表遷移與勝率模擬都應在第一次使用時才匯入。
+耗時受機器負載影響，預設只印出報告；設定 IMPORT_TIME_BUDGET_MS 時才檢查是否超過預算。
+"""
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "0"))  # 0 表示不檢查
+
+# 匯入 main 時不應載入的模組（由指令註冊表或 prepare_database 延後載入）
+LAZY_MODULES = (
+    "handlers.game_handler", "handlers.join_handler", "handlers.user_handler",
+    "handlers.session_handler", "handlers.odds_handler", "handlers.pattern_handler",
+    "services.simulator", "services.leaderboard", "models.migrations", "models.game",
+)
+
+def import_profile(module="main"):
+    """
+    在乾淨的子程序匯入模組，解析 -X importtime 的輸出
+
+    Returns:
+        tuple: (總耗時毫秒, [(模組, 自身毫秒, 累計毫秒)]，依匯入順序)
+    """
+    env = {**os.environ, "LINE_CHANNEL_ACCESS_TOKEN": "x", "LINE_CHANNEL_SECRET": "y"}
+    # 先匯入一次，讓 .pyc 已編譯好，量到的是正常啟動的時間
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True, env=env, capture_output=True)
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            check=True, env=env, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    total = sum(cumulative for name, _, cumulative in rows if name == module)
+    return total, rows
+
+def format_report(total, rows, top=10, module="main"):
+    """啟動時間報告：總耗時與累計耗時最多的頂層套件"""
+    top_level = {}
+    for name, _, cumulative in rows:
+        package = name.split(".")[0]
+        if package == module:
+            continue
+        top_level[package] = max(top_level.get(package, 0.0), cumulative)
+    budget = f"預算 {IMPORT_TIME_BUDGET_MS:.0f} ms" if IMPORT_TIME_BUDGET_MS else "未設定預算"
+    lines = [f"匯入 main 共 {total:.0f} ms（{budget}）"]
+    for package, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {cumulative:8.1f} ms  {package}")
+    return "\n".join(lines)
+
+def test_import_time_budget():
+    """測試少用的模組沒有在匯入 main 時載入（有設定預算時也檢查耗時）"""
+    print("🧪 測試啟動時間...")
+
+    total, rows = import_profile()
+    report = format_report(total, rows)
+    print(report)
+
+    loaded = {name for name, _, _ in rows}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    assert not eager, f"這些模組應在第一次使用時才匯入：{eager}"
+    print("✅ 少用的模組都延後匯入")
+    if IMPORT_TIME_BUDGET_MS:
+        assert total <= IMPORT_TIME_BUDGET_MS, f"啟動時間超過預算\n{report}"
+        print("✅ 啟動時間在預算內")
+
+def test_registry_resolves_on_first_use():
+    """測試指令註冊表找到對應 handler，且第一次使用時才匯入模組"""
+    print("\n📋 測試指令註冊表...")
+
+    script = (
+        "import sys\n"
+        "from handlers.registry import COMMANDS, find_command, preload\n"
+        "assert find_command('/查詢牌型 123m').target.endswith('handle_pattern_query_command')\n"
+        "assert find_command('/查詢').target.endswith('handle_status_command')\n"
+        "assert find_command('/週排行').target.endswith('handle_weekly_leaderboard_command')\n"
+        "assert find_command('/選風 東').target.endswith('handle_wind_command')\n"
+        "assert find_command('你好') is None and find_command('/未知') is None\n"
+        "assert 'handlers.user_handler' not in sys.modules\n"
+        "preload()\n"
+        "assert 'handlers.user_handler' in sys.modules\n"
+        "assert all(callable(command.handler()) for command in COMMANDS)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True)
+    print("✅ 指令對應正確，handler 延後匯入")
+
+def test_dispatch_passes_context():
+    """測試 dispatch 依註冊的參數呼叫 handler"""
+    print("\n📨 測試指令分派...")
+
+    from handlers import registry
+
+    calls = []
+    command = registry.find_command("/胡 123m")
+    original = command._handler
+    command._handler = lambda *args: calls.append(args)
+    try:
+        event = SimpleNamespace()
+        assert registry.dispatch(event, "api", "/胡 123m", "G1", "B")
+        assert not registry.dispatch(event, "api", "聊天內容", "G1", None)
+        assert calls == [(event, "api", "/胡 123m", "G1", "B")], calls
+    finally:
+        command._handler = original
+    print("✅ handler 收到 text、group_id、table_code")
+
+if __name__ == "__main__":
+    print("🚀 開始啟動時間測試...")
+
+    test_import_time_budget()
+    test_registry_resolves_on_first_use()
+    test_dispatch_passes_context()
+
+    print("\n🎉 所有啟動時間測試通過！")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+測試跨 worker 快取失效通知：提交時遞增群組版本號、本程序通知、版本表輪詢與預設規則快取清除
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.group_preset import GroupPreset
+from models.group_version import GroupVersion
+from services import invalidation, presets
+from services.invalidation import (InvalidationConsumer, bump_version, current_version, poll_versions,
+                                   subscribe, touch_group)
+
+GROUP_ID = "test_invalidation_group"
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+received = []
+
+@subscribe
+def record(group_id, version):
+    if group_id.startswith(GROUP_ID):
+        received.append((group_id, version))
+
+def cleanup(db):
+    """清理本測試建立的資料"""
+    db.query(GroupVersion).filter(or_(
+        GroupVersion.group_id.like(f"{GROUP_ID}%"), GroupVersion.group_id == presets.preset_key(GROUP_ID)
+    )).delete(synchronize_session=False)
+    db.query(GroupPreset).filter(GroupPreset.group_id == GROUP_ID).delete()
+    db.commit()
+    invalidation.reset_known()
+    presets.reset_cache()
+    received.clear()
+
+def test_commit_bumps_version():
+    """測試有寫入的提交才遞增版本號並通知本程序"""
+    print("🧪 測試提交時遞增群組版本號...")
+
+    upgrade_schema()
+    db = SessionLocal()
+    try:
+        cleanup(db)
+
+        touch_group(db, GROUP_ID)
+        presets.save_preset(db, GROUP_ID, {"mode": "台麻", "per_point": 10, "base_score": 30, "collect_money": True})
+        db.commit()
+        assert current_version(db, GROUP_ID) == 1 and received == [(GROUP_ID, 1)], received
+
+        # 沒有寫入的提交、rollback 都不遞增
+        db.commit()
+        presets.delete_preset(db, GROUP_ID)
+        db.rollback()
+        assert current_version(db, GROUP_ID) == 1 and len(received) == 1
+
+        # 批次刪除不經過 flush，也要遞增
+        presets.delete_preset(db, GROUP_ID)
+        db.commit()
+        assert current_version(db, GROUP_ID) == 2 and received[-1] == (GROUP_ID, 2), received
+        print("✅ 版本號只在有寫入的提交時遞增")
+
+    finally:
+        cleanup(db)
+        db.close()
+
+def test_poll_and_consumer():
+    """測試其他 worker 的修改可由版本表輪詢收到，且同一版本只通知一次"""
+    print("\n📡 測試版本表輪詢...")
+
+    db = SessionLocal()
+    consumer = None
+    try:
+        cleanup(db)
+        since = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        # 模擬另一個 worker：直接遞增版本號，本程序沒有收到提交通知
+        bump_version(db, GROUP_ID)
+        db.commit()
+        assert received == []
+        assert poll_versions(db, since) == 1 and received == [(GROUP_ID, 1)]
+        assert poll_versions(db, since) == 0 and len(received) == 1
+
+        consumer = InvalidationConsumer(engine, poll_seconds=0.05)
+        consumer.start()
+        bump_version(db, f"{GROUP_ID}_other")
+        db.commit()
+        deadline = time.monotonic() + 2
+        while len(received) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert received[-1] == (f"{GROUP_ID}_other", 1), received
+        print("✅ 背景執行緒輪詢到其他 worker 的修改")
+
+    finally:
+        if consumer is not None:
+            consumer.stop()
+            consumer.join(timeout=1)
+        cleanup(db)
+        db.close()
+
+def test_preset_cache_invalidated():
+    """測試預設規則的失效鍵更新時才清除預設規則快取"""
+    print("\n📌 測試預設規則快取失效...")
+
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        assert presets.get_preset(db, GROUP_ID) is None  # 快取「沒有預設」
+
+        # 群組的一般變動只遞增群組版本號，預設規則的快取保留
+        bump_version(db, GROUP_ID)
+        db.commit()
+        assert poll_versions(db, datetime.now(timezone.utc) - timedelta(seconds=5)) >= 1
+        assert GROUP_ID in presets._cache
+
+        # 另一個 Session（模擬另一個 worker）寫入後提交，preset:<group_id> 的通知清除快取
+        other = SessionLocal()
+        try:
+            presets.save_preset(other, GROUP_ID, {"mode": "港麻", "per_point": 20, "base_score": 50,
+                                                  "collect_money": False})
+            other.commit()
+        finally:
+            other.close()
+
+        assert presets.get_preset(db, GROUP_ID)["mode"] == "港麻"
+        print("✅ 不必等快取過期就讀到新的預設規則")
+
+    finally:
+        cleanup(db)
+        db.close()
+
+if __name__ == "__main__":
+    print("🚀 開始快取失效通知測試...")
+
+    test_commit_bumps_version()
+    test_poll_and_consumer()
+    test_preset_cache_invalidated()
+
+    print("\n🎉 所有快取失效通知測試通過！")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+測試週／月排行分桶、時區切分與過期資料清除
+"""
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.leaderboard_bucket import LeaderboardBucket
+from services.leaderboard import WEEKLY, MONTHLY, period_start, record_game_buckets, top_players, prune_buckets
+from handlers.user_handler import handle_period_leaderboard_command
+
+GROUP_ID = "test_leaderboard_group"
+
+class FakeLineBotApi:
+    """記錄回覆內容的假 LINE Bot API"""
+
+    def __init__(self):
+        self.replies = []
+
+    def reply_message(self, reply_token, message):
+        self.replies.append(message.text)
+
+def make_players(scores):
+    """建立假的玩家列"""
+    return [SimpleNamespace(line_user_id=f"board_{name}", nickname=name, score=score) for name, score in scores.items()]
+
+def test_period_start_timezone():
+    """測試期間依台北時間切分"""
+    print("🧪 測試期間切分...")
+    # UTC 週日 20:00 = 台北週一 04:00，屬於新的一週
+    sunday_night = datetime(2024, 6, 2, 20, 0, tzinfo=timezone.utc)
+    assert period_start(WEEKLY, sunday_night) == date(2024, 6, 3)
+    # UTC 5/31 18:00 = 台北 6/1 02:00，屬於六月
+    assert period_start(MONTHLY, datetime(2024, 5, 31, 18, 0, tzinfo=timezone.utc)) == date(2024, 6, 1)
+    print("✅ 期間以 Asia/Taipei 切分")
+
+def test_buckets_and_prune():
+    """測試結算累計、排行讀取與整批清除"""
+    print("\n🏆 測試週／月排行...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = FakeLineBotApi()
+    game = SimpleNamespace(group_id=GROUP_ID)
+
+    try:
+        db.query(LeaderboardBucket).filter(LeaderboardBucket.group_id == GROUP_ID).delete()
+        db.commit()
+
+        # 每局結算各自提交；另有一筆一年前的舊資料
+        now = datetime.now(timezone.utc)
+        old = datetime(now.year - 1, now.month, 1, tzinfo=timezone.utc)
+        for scores, when in (
+            ({"小明": 120, "小華": -20, "小美": -40, "小王": -60}, now),
+            ({"小明": -30, "小華": 90, "小美": 0, "小王": -60}, now),
+            ({"小明": 500, "小華": -500, "小美": 0, "小王": 0}, old),
+        ):
+            record_game_buckets(db, game, make_players(scores), when)
+            db.commit()
+
+        weekly = top_players(db, GROUP_ID, WEEKLY, now)
+        assert [(r.nickname, r.net_amount, r.games) for r in weekly[:2]] == [("小明", 90, 2), ("小華", 70, 2)], weekly
+        print(f"✅ 本週排行：{[(r.nickname, r.net_amount) for r in weekly]}")
+
+        handle_period_leaderboard_command(SimpleNamespace(reply_token="token"), api, GROUP_ID, MONTHLY)
+        assert "本月排行榜" in api.replies[-1] and "小明" in api.replies[-1], api.replies[-1]
+
+        deleted = prune_buckets(db, now, keep_weeks=4, keep_months=3)
+        db.commit()
+        assert deleted == 8, deleted
+        remaining = db.query(LeaderboardBucket).filter(LeaderboardBucket.group_id == GROUP_ID).count()
+        assert remaining == 8, remaining
+        print(f"✅ 清除 {deleted} 筆過期排行資料")
+
+    finally:
+        db.query(LeaderboardBucket).filter(LeaderboardBucket.group_id == GROUP_ID).delete()
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    print("🚀 開始排行榜測試...")
+
+    test_period_start_timezone()
+    test_buckets_and_prune()
+
+    print("\n🎉 所有排行榜測試通過！")
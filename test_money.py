@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+測試整數最小單位金額、舊版 Float 欄位的回填遷移、帳本期初餘額與收支彙總累加
+"""
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from models import migrations
+from models.migrations import upgrade_schema
+from models.user import User
+from models.user_balance import UserBalance
+from models.database import engine
+from services.ledger import OPENING_ACCOUNT, account_net, apply_balances
+from testkit import cleanup
+from utils.money import to_minor, from_minor
+
+def test_minor_units():
+    """測試元與最小單位的換算"""
+    print("\n💰 測試金額換算...")
+
+    assert to_minor(190) == 19000
+    assert to_minor(0.1) == 10 and to_minor(-0.105) == -11
+    assert to_minor(None) == 0
+    assert from_minor(19000) == 190 and isinstance(from_minor(19000), int)
+    assert from_minor(-1050) == -10.5
+
+    # 反覆累加不會產生浮點誤差
+    user = User(line_user_id="money_user", display_name="小明", total_games=0,
+                total_win_minor=0, total_lose_minor=0, net_minor=0)
+    for _ in range(10):
+        user.net_minor += to_minor(0.1)
+    assert user.net_minor == 100 and user.net_amount == 1, user.net_minor
+    user.total_lose_amount = 3
+    user.net_amount -= 3
+    assert user.net_amount == -2 and user.total_lose_minor == 300
+    print("✅ 金額換算與累加正確")
+
+def test_backfill_legacy_float_columns():
+    """測試舊版 users 表的 Float 金額分批回填，且只執行一次"""
+    print("\n🗄️ 測試舊版金額欄位回填...")
+
+    legacy = create_engine("sqlite://")
+    with legacy.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, line_user_id VARCHAR(255) NOT NULL UNIQUE, "
+            "display_name VARCHAR(100) NOT NULL, preferred_nickname VARCHAR(100), total_games INTEGER, "
+            "total_win_amount FLOAT, total_lose_amount FLOAT, net_amount FLOAT, "
+            "created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO users (id, line_user_id, display_name, total_games, total_win_amount, total_lose_amount, net_amount) "
+            "VALUES (:id, :uid, :name, 1, :win, :lose, :win - :lose)"
+        ), [
+            {"id": i, "uid": f"legacy_{i}", "name": f"玩家{i}", "win": win, "lose": lose}
+            for i, (win, lose) in enumerate([(300.0, 110.0), (0.3, 0.1), (0.0, 250.0), (None, None), (75.5, 0.0)], 1)
+        ])
+
+    original_batch = migrations.BACKFILL_BATCH_SIZE
+    migrations.BACKFILL_BATCH_SIZE = 2
+    try:
+        added = upgrade_schema(bind=legacy)
+        assert "users.net_minor" in added and "migration.user_money_minor" in added, added
+
+        db = sessionmaker(bind=legacy)()
+        users = {u.line_user_id: u for u in db.query(User).order_by(User.net_minor.desc())}
+        assert users["legacy_1"].net_minor == 19000 and users["legacy_1"].net_amount == 190
+        assert users["legacy_2"].net_minor == 20, users["legacy_2"].net_minor
+        assert users["legacy_3"].net_amount == -250 and users["legacy_3"].total_lose_amount == 250
+        assert users["legacy_4"].net_minor == 0
+        assert users["legacy_5"].total_win_amount == 75.5
+        ranked = [u.line_user_id for u in db.query(User).order_by(User.net_minor.desc())]
+        assert ranked[0] == "legacy_1" and ranked[-1] == "legacy_3", ranked
+
+        # 期初餘額寫成對 __opening__ 帳戶的分錄，彙總與分錄加總一致
+        balances = {b.line_user_id: b for b in db.query(UserBalance)}
+        assert len(balances) == 5 and balances["legacy_1"].net_minor == 19000
+        assert balances["legacy_1"].received_minor == 30000 and balances["legacy_1"].paid_minor == 11000
+        assert all(account_net(db, user_id) == b.net_minor for user_id, b in balances.items())
+        assert account_net(db, OPENING_ACCOUNT) == -sum(b.net_minor for b in balances.values())
+
+        # 已記錄的遷移不再重跑，不會覆蓋之後的新資料
+        users["legacy_4"].net_amount = 50
+        db.commit()
+        db.close()
+        assert "migration.user_money_minor" not in upgrade_schema(bind=legacy)
+        with legacy.connect() as conn:
+            assert conn.execute(text("SELECT net_minor FROM users WHERE id = 4")).scalar() == 5000
+            assert conn.execute(text("SELECT rows FROM schema_migrations WHERE name = 'user_money_minor'")).scalar() == 5
+        print("✅ 舊版金額已分批換算為整數最小單位")
+    finally:
+        migrations.BACKFILL_BATCH_SIZE = original_batch
+
+def test_balances_not_overwritten():
+    """測試同一位玩家在另一個群組先結算時，彙總列重新讀取後才累加，不會蓋掉對方的金額"""
+    print("\n🔒 測試收支彙總累加...")
+
+    upgrade_schema()
+    Session = sessionmaker(bind=engine)
+    first, second = Session(), Session()
+    try:
+        cleanup(first, user_prefix="money_race_")
+        apply_balances(first, ["money_race_a", "money_race_b"], [("money_race_b", "money_race_a", 10000)])
+        first.commit()
+        loaded = first.get(UserBalance, "money_race_a")  # 讀進 identity map 並保留參照
+        assert loaded.net_minor == 10000
+
+        # 另一個群組的結算先提交
+        apply_balances(second, ["money_race_a", "money_race_c"], [("money_race_c", "money_race_a", 5000)])
+        second.commit()
+
+        balances = apply_balances(first, ["money_race_a", "money_race_b"], [("money_race_a", "money_race_b", 2000)])
+        first.commit()
+        assert balances["money_race_a"].net_minor == 13000, balances["money_race_a"].net_minor
+        assert balances["money_race_a"].entry_count == 3
+        print("✅ 兩個群組的結算都計入彙總")
+    finally:
+        second.close()
+        cleanup(first, user_prefix="money_race_")
+        first.close()
+
+if __name__ == "__main__":
+    print("🚀 開始金額欄位測試...")
+
+    test_minor_units()
+    test_backfill_legacy_float_columns()
+    test_balances_not_overwritten()
+
+    print("\n🎉 所有金額欄位測試通過！")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+測試同一群組同時開多桌：桌號分配、依座位與 #桌號 路由
+"""
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.game import Game
+from models.active_seat import ActiveSeat
+from services.game_lookup import find_active_game, AmbiguousTableError
+from utils.parser import extract_table_code
+from handlers.game_handler import handle_game_command
+from handlers.join_handler import handle_join_command
+from handlers.status_handler import handle_status_command
+from handlers.hand_handler import handle_settle_command
+import testkit
+from testkit import FakeLineBotApi
+
+GROUP_ID = "test_multi_table_group"
+
+def make_event(user_id):
+    """建立本群組的假訊息事件"""
+    return testkit.make_event(user_id, GROUP_ID)
+
+def cleanup(db):
+    """清理本測試建立的資料"""
+    testkit.cleanup(db, GROUP_ID, "table_")
+
+def test_extract_table_code():
+    """測試從指令取出桌號"""
+    print("🧪 測試桌號解析...")
+    assert extract_table_code("/加入 #b 小明") == ("B", "/加入 小明")
+    assert extract_table_code("/狀態") == (None, "/狀態")
+    assert extract_table_code("/胡 #AB") == (None, "/胡 #AB")
+    print("✅ 桌號解析正確")
+
+def test_two_tables_in_one_group():
+    """測試兩桌同時進行時的路由"""
+    print("\n🀄 測試同群組兩桌...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = FakeLineBotApi()
+
+    try:
+        cleanup(db)
+
+        # A 桌開局並坐滿四人
+        handle_game_command(make_event("table_userA1"), api, "/開局", GROUP_ID)
+        for i in range(1, 5):
+            handle_join_command(make_event(f"table_userA{i}"), api, "/加入", GROUP_ID)
+        assert "A 桌" in api.replies[-1], api.replies[-1]
+
+        # 已入座的人不能再開新桌，其他人可以開 B 桌
+        handle_game_command(make_event("table_userA1"), api, "/開局", GROUP_ID)
+        assert "❌" in api.replies[-1], api.replies[-1]
+        handle_game_command(make_event("table_userB1"), api, "/開局", GROUP_ID)
+        handle_join_command(make_event("table_userB1"), api, "/加入", GROUP_ID)
+        assert "B 桌" in api.replies[-1], api.replies[-1]
+        print("✅ 第二桌分配到桌號 B")
+
+        games = {g.table_code: g for g in db.query(Game).filter(Game.group_id == GROUP_ID)}
+        assert set(games) == {"A", "B"}
+
+        # 依座位找到各自的桌，旁觀者必須指定桌號
+        assert find_active_game(db, GROUP_ID, "table_userA3").id == games["A"].id
+        assert find_active_game(db, GROUP_ID, "table_userB1").id == games["B"].id
+        assert find_active_game(db, GROUP_ID, table_code="B").id == games["B"].id
+        try:
+            find_active_game(db, GROUP_ID, "table_outsider")
+            assert False, "應該要提示指定桌號"
+        except AmbiguousTableError as e:
+            assert e.table_codes == ["A", "B"]
+        print("✅ 依座位與桌號路由正確")
+
+        handle_status_command(make_event("table_outsider"), api, GROUP_ID)
+        assert "A" in api.replies[-1] and "B" in api.replies[-1], api.replies[-1]
+        handle_status_command(make_event("table_outsider"), api, GROUP_ID, "B")
+        assert "B 桌" in api.replies[-1], api.replies[-1]
+
+        # 結算 A 桌後只剩 B 桌，座位釋放
+        handle_settle_command(make_event("table_userA1"), api, GROUP_ID)
+        db.expire_all()
+        assert db.query(ActiveSeat).filter(ActiveSeat.game_id == games["A"].id).count() == 0
+        assert find_active_game(db, GROUP_ID, "table_outsider").id == games["B"].id
+        print("✅ 結算後釋放座位")
+
+    finally:
+        cleanup(db)
+        db.close()
+        print("🧹 測試資料已清理")
+
+if __name__ == "__main__":
+    print("🚀 開始多桌測試...")
+
+    test_extract_table_code()
+    test_two_tables_in_one_group()
+
+    print("\n🎉 所有多桌測試通過！")
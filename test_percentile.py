@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+測試 KLL 分位數草圖與全體玩家排名百分位
+"""
+import random
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.user_balance import UserBalance
+from models.quantile_sketch import QuantileSketch
+from services import percentile
+from utils.kll import KLLSketch
+
+def test_kll_accuracy_and_merge():
+    """測試草圖大小有上限、排名誤差小且可合併"""
+    print("🧪 測試 KLL 草圖...")
+
+    rng = random.Random(7)
+    values = [rng.randint(-10000, 10000) for _ in range(100000)]
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    for i, value in enumerate(values):
+        (left if i % 2 else right).update(value)
+
+    merged = KLLSketch.from_dict(left.to_dict(), seed=3).merge(right)
+    stored = sum(len(level) for level in merged.levels)
+    assert merged.n == len(values)
+    assert stored < 2000, stored
+
+    ordered = sorted(values)
+    for q in (0.1, 0.5, 0.9):
+        value = ordered[int(q * len(values))]
+        error = abs(merged.rank(value) / len(values) - q)
+        assert error < 0.02, (q, error)
+    print(f"✅ 10 萬筆資料只保留 {stored} 筆，合併後排名誤差 < 2%")
+
+def test_top_percent():
+    """測試結算後的排名百分位與持久化"""
+    print("\n🌏 測試全體玩家排名...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    original_every = percentile.PERSIST_EVERY
+
+    try:
+        percentile.reset_cache()
+        percentile.PERSIST_EVERY = 1
+        for i, amount in enumerate([-900, -300, 0, 200, 800], 1):
+            db.add(UserBalance(line_user_id=f"pct_user{i}", net_minor=amount * 100))
+        db.commit()
+
+        # 草圖列由資料遷移建立（這裡直接重建，包含剛加入的玩家）
+        population = percentile.rebuild_sketch(engine)
+        row = db.get(QuantileSketch, percentile.SKETCH_NAME)
+        assert population >= 5 and row.item_count == row.population == population
+
+        # 結算回滾：寫回的增量放回本程序，下次再寫回
+        percentile.record_net_amounts(db, [800])
+        db.rollback()
+        assert percentile._delta.n == 1
+        percentile.record_net_amounts(db, [800])
+        db.commit()
+        db.refresh(row)
+        assert row.item_count == population + 2 and percentile._delta.n == 0
+
+        percentile.reset_cache()
+        best = percentile.top_percent(db, 10 ** 9)
+        worst = percentile.top_percent(db, -10 ** 9)
+        assert best <= 20, best
+        assert worst == 100, worst
+        print(f"✅ 最高淨輸贏為前 {best}%，最低為前 {worst}%")
+
+        # 草圖列不見時不在結算交易中建立，改由背景重建補回
+        db.query(QuantileSketch).delete()
+        db.commit()
+        assert percentile.record_net_amounts(db, [100]) is None
+        db.commit()
+        percentile._rebuilding.join(timeout=10)
+        row = db.get(QuantileSketch, percentile.SKETCH_NAME)
+        assert row is not None and row.population == population
+        print("✅ 回滾時保留增量，草圖列由背景重建")
+
+    finally:
+        percentile.PERSIST_EVERY = original_every
+        db.query(UserBalance).filter(UserBalance.line_user_id.like("pct_user%")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+        percentile.rebuild_sketch(engine)
+        percentile.reset_cache()
+
+if __name__ == "__main__":
+    print("🚀 開始排名百分位測試...")
+
+    test_kll_accuracy_and_merge()
+    test_top_percent()
+
+    print("\n🎉 所有排名百分位測試通過！")
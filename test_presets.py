@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+測試群組預設開局規則：/設定預設、/開局 套用預設與 LRU 快取
+"""
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.game import Game
+from services import presets
+from services.invalidation import current_version
+from handlers.game_handler import handle_game_command, handle_preset_command
+import testkit
+from testkit import FakeLineBotApi
+
+GROUP_ID = "test_preset_group"
+
+def make_event(user_id="preset_user1"):
+    """建立本群組的假訊息事件"""
+    return testkit.make_event(user_id, GROUP_ID)
+
+def cleanup(db):
+    """清理本測試建立的資料"""
+    testkit.cleanup(db, GROUP_ID, "preset_user")
+    presets.reset_cache()
+
+def test_preset_cache():
+    """測試 LRU 快取命中、沒有預設的群組也會快取，以及容量上限"""
+    print("🧪 測試預設規則快取...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    original_size = presets.PRESET_CACHE_SIZE
+
+    try:
+        cleanup(db)
+        assert presets.get_preset(db, GROUP_ID) is None
+
+        # 群組的一般變動（/加入、/胡、/開局）不會清掉預設規則的快取
+        presets._on_key_changed(GROUP_ID, 10 ** 6)
+        assert GROUP_ID in presets._cache
+
+        # save_preset 遞增 preset:<group_id>，提交後快取被清除，下一次讀到新的設定
+        params = {"mode": "港麻", "per_point": 20, "base_score": 50, "collect_money": False}
+        presets.save_preset(db, GROUP_ID, params)
+        db.commit()
+        assert GROUP_ID not in presets._cache
+        cached = presets.get_preset(db, GROUP_ID)
+        assert cached == params, cached
+
+        # 回傳值是複本，修改不影響快取
+        cached["per_point"] = 999
+        assert presets.get_preset(db, GROUP_ID)["per_point"] == 20
+
+        presets.PRESET_CACHE_SIZE = 2
+        for other in ("preset_other1", "preset_other2"):
+            presets.get_preset(db, other)
+        assert GROUP_ID not in presets._cache and len(presets._cache) == 2
+        print("✅ 快取命中、複本回傳與 LRU 淘汰正確")
+
+    finally:
+        presets.PRESET_CACHE_SIZE = original_size
+        cleanup(db)
+        db.close()
+
+def test_preset_commands():
+    """測試 /設定預設 與不帶參數的 /開局"""
+    print("\n📌 測試預設規則指令...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = FakeLineBotApi()
+
+    try:
+        cleanup(db)
+
+        version = current_version(db, GROUP_ID)
+        handle_preset_command(make_event(), api, "/設定預設", GROUP_ID)
+        assert "尚未設定預設規則" in api.replies[-1]
+        assert current_version(db, GROUP_ID) == version  # 只查看不遞增群組版本號
+
+        handle_preset_command(make_event(), api, "/設定預設 台麻 每台0 底30", GROUP_ID)
+        assert "每台金額必須在 1-1000 元之間" in api.replies[-1], api.replies[-1]
+
+        handle_preset_command(make_event(), api, "/設定預設 台麻 每台50 底100 不收莊錢", GROUP_ID)
+        assert "已設定群組預設規則：台麻 每台50 底100 不收莊錢" in api.replies[-1], api.replies[-1]
+
+        handle_game_command(make_event(), api, "/開局", GROUP_ID)
+        assert "已套用群組預設規則" in api.replies[-1], api.replies[-1]
+        game = db.query(Game).filter(Game.group_id == GROUP_ID).one()
+        assert (game.per_point, game.base_score, game.collect_money) == (50, 100, False)
+        print(api.replies[-1])
+
+        # 帶參數的 /開局 不使用預設
+        game.status = "finished"
+        db.commit()
+        handle_game_command(make_event("preset_user2"), api, "/開局 每台10", GROUP_ID)
+        assert "已套用群組預設規則" not in api.replies[-1]
+        game = db.query(Game).filter(Game.group_id == GROUP_ID, Game.status != "finished").one()
+        assert (game.per_point, game.base_score, game.collect_money) == (10, 30, True)
+
+        handle_preset_command(make_event(), api, "/設定預設 清除", GROUP_ID)
+        assert "已清除" in api.replies[-1]
+        assert presets.get_preset(db, GROUP_ID) is None
+        print("✅ 預設規則設定、套用與清除正確")
+
+    finally:
+        cleanup(db)
+        db.close()
+
+if __name__ == "__main__":
+    print("🚀 開始群組預設規則測試...")
+
+    test_preset_cache()
+    test_preset_commands()
+
+    print("\n🎉 所有群組預設規則測試通過！")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+測試指令頻率限制：token bucket 見底與補充、跨程序共用額度，以及使用者／群組統計
+"""
+import os
+import subprocess
+import sys
+from services import rate_limit
+from multiprocessing import shared_memory
+from services.rate_limit import (
+    ALLOW, DROP, NOTIFY, TokenBuckets, check_rate_limit, rate_limit_stats, segment_name, unlink_segment,
+)
+from services.work_queue import command_priority
+
+SEGMENT = f"mahjong_rate_limit_test_{os.getpid()}"
+
+def test_bucket_refill():
+    """測試額度用完後只提醒一次，token 補回後恢復放行"""
+    print("🧪 測試 token bucket...")
+
+    buckets = TokenBuckets(slots=64, segment=None)
+    now = 1_000_000.0
+    results = [buckets.take("user", "U1", 60, 3, now) for _ in range(5)]
+    assert results == [ALLOW, ALLOW, ALLOW, NOTIFY, DROP], results
+
+    # 每分鐘 60 個：一秒後補回一個，再用完時重新提醒
+    assert buckets.take("user", "U1", 60, 3, now + 1) == ALLOW
+    assert buckets.take("user", "U1", 60, 3, now + 1) == NOTIFY
+    assert buckets.take("user", "U2", 60, 3, now + 1) == ALLOW  # 其他使用者不受影響
+    print("✅ 見底提醒一次，補回後恢復")
+
+def test_shared_across_processes():
+    """測試另一個程序看到同一份額度"""
+    print("\n🤝 測試跨程序共用額度...")
+
+    buckets = TokenBuckets(slots=64, segment=SEGMENT)
+    try:
+        for _ in range(3):
+            assert buckets.take("user", "U1", 1, 3) == ALLOW
+
+        script = ("from services.rate_limit import TokenBuckets; "
+                  f"b = TokenBuckets(slots=64, segment='{SEGMENT}'); "
+                  "print(b.take('user', 'U1', 1, 3), b.take('user', 'U9', 1, 3)); b.close()")
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+        assert output.split() == [NOTIFY, ALLOW], output
+        assert buckets.take("user", "U1", 1, 3) == DROP
+        print("✅ 另一個程序扣到同一個桶子")
+    finally:
+        buckets.close(unlink=True)
+
+def test_segment_lifecycle():
+    """測試殘留的舊區段大小不符時重建，以及 unlink_segment 刪除區段"""
+    print("\n🧹 測試共享記憶體區段...")
+
+    stale = shared_memory.SharedMemory(name=segment_name(SEGMENT, 64), create=True, size=16)
+    stale.close()
+    buckets = TokenBuckets(slots=64, segment=SEGMENT)
+    try:
+        assert buckets.take("user", "U1", 60, 3) == ALLOW
+    finally:
+        buckets.close()
+    assert unlink_segment(SEGMENT, 64)
+    assert not unlink_segment(SEGMENT, 64)
+    print("✅ 舊區段重建，結束時刪除")
+
+def test_check_rate_limit_counters():
+    """測試使用者與群組額度，以及統計數字"""
+    print("\n📊 測試頻率限制統計...")
+
+    original = (rate_limit.RATE_LIMIT_USER_BURST, rate_limit.RATE_LIMIT_GROUP_BURST)
+    rate_limit.RATE_LIMIT_USER_BURST, rate_limit.RATE_LIMIT_GROUP_BURST = 2, 3
+    rate_limit.reset_rate_limit(TokenBuckets(slots=256, segment=None))
+    try:
+        now = 2_000_000.0
+        assert [check_rate_limit("Ua", "G1", now) for _ in range(3)] == [ALLOW, ALLOW, NOTIFY]
+        # 群組額度剩一個：其他使用者第二個指令被群組擋下
+        assert check_rate_limit("Ub", "G1", now) == ALLOW
+        assert check_rate_limit("Ub", "G1", now) == NOTIFY
+        assert check_rate_limit("Uc", None, now) == ALLOW  # 私訊只看使用者額度
+        # 被群組擋下的指令退還使用者的 token：Ub 還剩一個
+        assert check_rate_limit("Ub", None, now) == ALLOW
+        assert check_rate_limit("Ub", None, now) == NOTIFY
+
+        stats = rate_limit_stats()
+        assert stats == {"allowed": 5, "limited_user": 2, "limited_group": 1, "notified": 3, "dropped": 0}, stats
+        print(f"✅ 統計：{stats}")
+    finally:
+        rate_limit.RATE_LIMIT_USER_BURST, rate_limit.RATE_LIMIT_GROUP_BURST = original
+        rate_limit.reset_rate_limit()
+
+def test_mutating_commands_exempt():
+    """測試額度用完後，修改對局的指令仍然放行，也不扣額度"""
+    print("\n🀄 測試修改指令不受限制...")
+
+    original = rate_limit.RATE_LIMIT_USER_BURST
+    rate_limit.RATE_LIMIT_USER_BURST = 1
+    rate_limit.reset_rate_limit(TokenBuckets(slots=256, segment=None))
+    try:
+        now = 3_000_000.0
+        assert check_rate_limit("Ud", "G2", now, priority=command_priority("/排行榜")) == ALLOW
+        assert check_rate_limit("Ud", "G2", now, priority=command_priority("/排行榜")) == NOTIFY
+        assert check_rate_limit("Ud", "G2", now, priority=command_priority("/胡 123m")) == ALLOW
+        assert check_rate_limit("Ud", "G2", now, priority=command_priority("/撤銷")) == ALLOW
+        assert check_rate_limit("Ud", "G2", now, priority=command_priority("/統計")) == DROP
+        assert rate_limit_stats()["allowed"] == 1
+        print("✅ 額度見底時 /胡、/撤銷 照常處理")
+    finally:
+        rate_limit.RATE_LIMIT_USER_BURST = original
+        rate_limit.reset_rate_limit()
+
+if __name__ == "__main__":
+    print("🚀 開始頻率限制測試...")
+
+    test_bucket_refill()
+    test_shared_across_processes()
+    test_segment_lifecycle()
+    test_check_rate_limit_counters()
+    test_mutating_commands_exempt()
+
+    print("\n🎉 所有頻率限制測試通過！")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+測試四人 Elo 積分：單局更新、逐局與向量化重播一致、依結算順序重算歷史、跨群組同時結算
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.game import Game
+from models.player import Player
+from models.user_rating import UserRating
+from services import rating
+from testkit import cleanup
+
+GROUP_ID = "test_rating_group"
+
+def random_games(count, player_count, seed=3):
+    """產生隨機的四人對局歷史（分數總和為 0）"""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        user_ids = rng.sample([f"rating_user{i}" for i in range(player_count)], 4)
+        scores = [rng.choice([-150, -50, 0, 50, 100]) for _ in range(3)]
+        games.append((user_ids, scores + [-sum(scores)]))
+    return games
+
+def test_rating_deltas():
+    """測試單局積分變化"""
+    print("🧪 測試單局積分...")
+    deltas = rating.rating_deltas([1500] * 4, [190, -20, -60, -110], k=32)
+    assert abs(sum(deltas)) < 1e-9
+    assert deltas[0] == 16 and deltas[3] == -16, deltas
+    # 強者贏弱者得分較少
+    strong, weak = rating.rating_deltas([1700, 1300], [50, -50], k=32)
+    assert 0 < strong < 16 and abs(strong + weak) < 1e-9
+    print(f"✅ 同分開局的積分變化：{[round(d, 1) for d in deltas]}")
+
+def test_numpy_matches_python():
+    """測試向量化重播與逐局重播結果相同"""
+    print("\n⚡ 測試向量化重播...")
+    games = random_games(20000, 40)
+    started = time.perf_counter()
+    expected = rating.replay_python(games, k=32)
+    python_time = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = rating.replay_numpy(games, k=32)
+    numpy_time = time.perf_counter() - started
+
+    assert expected.keys() == actual.keys()
+    for user_id, (value, count) in expected.items():
+        assert abs(actual[user_id][0] - value) < 1e-6 and actual[user_id][1] == count
+    print(f"✅ 2 萬局結果一致（逐局 {python_time:.2f} 秒，向量化 {numpy_time:.2f} 秒）")
+
+def test_recompute_ratings():
+    """測試從歷史對局重算積分"""
+    print("\n🔁 測試歷史重算...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+
+    try:
+        history = random_games(30, 6)
+        # 依結算時間重播：倒序建立對局，game_id 的順序與結算順序相反
+        started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for minutes, (user_ids, scores) in reversed(list(enumerate(history))):
+            game = Game(group_id=GROUP_ID, status="finished", round_state=1 << 12,
+                        finished_at=started + timedelta(minutes=minutes))
+            db.add(game)
+            db.flush()
+            for seat, (user_id, score) in enumerate(zip(user_ids, scores), 1):
+                db.add(Player(game_id=game.id, line_user_id=user_id, nickname=user_id, seat_number=seat, score=score))
+        # 未開始就取消的對局不計入
+        db.add(Game(group_id=GROUP_ID, status="finished", round_state=0))
+        db.commit()
+
+        count = rating.recompute_ratings(db, k=32)
+        db.commit()
+        expected = rating.replay_python(history, k=32)
+        stored = {r.line_user_id: r for r in db.query(UserRating).filter(UserRating.line_user_id.like("rating_user%"))}
+        assert count >= len(expected)
+        for user_id, (value, games) in expected.items():
+            assert abs(stored[user_id].rating - value) < 1e-6 and stored[user_id].games == games
+        print(f"✅ 重算 {len(expected)} 位玩家積分")
+
+    finally:
+        game_ids = [g.id for g in db.query(Game).filter(Game.group_id == GROUP_ID)]
+        db.query(Player).filter(Player.game_id.in_(game_ids)).delete(synchronize_session=False)
+        db.query(Game).filter(Game.group_id == GROUP_ID).delete()
+        db.query(UserRating).delete()
+        db.commit()
+        db.close()
+
+def test_concurrent_settlements():
+    """測試同一位玩家在另一個群組先結算時，以最新的積分與局數累加"""
+    print("\n🔒 測試積分列鎖定...")
+
+    upgrade_schema()
+    Session = sessionmaker(bind=engine)
+    first, second = Session(), Session()
+    players = [SimpleNamespace(line_user_id=f"rating_race_{i}", score=score) for i, score in enumerate((30, -30))]
+    try:
+        cleanup(first, user_prefix="rating_race_")
+        rating.apply_game_rating(first, players)
+        first.commit()
+        loaded = first.get(UserRating, "rating_race_0")  # 讀進 identity map 並保留參照
+        assert loaded.rating == rating.INITIAL_RATING + rating.K_FACTOR / 2
+
+        # 另一個群組的結算先提交
+        rating.apply_game_rating(second, [players[0], SimpleNamespace(line_user_id="rating_race_9", score=-30)])
+        second.commit()
+        after_second = second.get(UserRating, "rating_race_0").rating
+
+        rating.apply_game_rating(first, players)
+        first.commit()
+        assert loaded.games == 3 and loaded.rating > after_second, (loaded.games, loaded.rating)
+        print(f"✅ 三局都計入：{loaded.rating:.1f}")
+    finally:
+        second.close()
+        cleanup(first, user_prefix="rating_race_")
+        first.close()
+
+if __name__ == "__main__":
+    print("🚀 開始積分測試...")
+
+    test_rating_deltas()
+    test_numpy_matches_python()
+    test_recompute_ratings()
+    test_concurrent_settlements()
+
+    print("\n🎉 所有積分測試通過！")
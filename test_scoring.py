@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+測試台數計算引擎與 /胡、/結算 流程
+"""
+from sqlalchemy.orm import sessionmaker
+from models.database import engine, Base
+from models.game import Game
+from models.player import Player
+from models.user import User
+from models.user_stats import UserStats
+from models.user_rating import UserRating
+from models.ledger_entry import LedgerEntry
+from models.hand_pattern import HandPattern
+from models.user_balance import UserBalance
+from handlers.hand_handler import handle_win_command, handle_settle_command
+from handlers.user_handler import handle_my_stats_command
+import testkit
+from services.ledger import UnbalancedBatchError, account_net, hand_transfers
+from services.scoring import calculate_tai, compute_payments, pattern_names
+from utils.parser import parse_win_command
+from utils.tiles import parse_tiles
+
+GROUP_ID = "test_scoring_group"
+
+def make_event(user_id):
+    """建立本群組的假訊息事件"""
+    return testkit.make_event(user_id, GROUP_ID)
+
+def test_tai_patterns():
+    """測試各台型判斷"""
+    print("🧪 測試台型判斷...")
+
+    cases = [
+        # (說明, 手牌, 面子, 其他參數, 預期台型, 預期台數)
+        ("門清自摸清一色", "111222333456789m99m", [], {"self_drawn": True},
+         {"門清", "自摸", "不求人", "清一色"}, 11),
+        ("平胡", "123m456m789p99s", [("chow", 21, False), ("chow", 9, False)], {},
+         {"平胡"}, 2),
+        ("碰碰胡小三元門風", "白白白發發發中中東東東", [("pung", 0, False), ("pung", 10, False)],
+         {"seat_wind": 0}, {"碰碰胡", "圈風", "門風", "小三元"}, 10),
+        ("大三元取代三元牌", "白白白發發發中中中東東123m", [("chow", 9, False)], {},
+         {"大三元"}, 8),
+        ("正花與花槓", "123m456m789p99s123s", [("chow", 9, False)],
+         {"flowers": [1, 2, 3, 4, 5], "seat_wind": 0}, {"花", "花槓"}, 4),
+    ]
+
+    for name, tiles, exposed, kwargs, expected_patterns, expected_tai in cases:
+        result = calculate_tai(parse_tiles(tiles), exposed=exposed, **kwargs)
+        patterns = {pattern for pattern, _tai in result.patterns}
+        assert patterns == expected_patterns, f"{name}: {patterns}"
+        assert result.tai == expected_tai, f"{name}: {result.tai}"
+        assert set(pattern_names(result.pattern_mask)) == expected_patterns
+        print(f"✅ {name}：{result.tai} 台")
+
+    # 連莊：莊家 1 台 + 每連莊 2 台
+    result = calculate_tai(parse_tiles("123m456m789p99s123s"), exposed=[("chow", 9, False)], dealer_streak=2)
+    assert result.dealer_tai == 5
+    print("✅ 連二拉二：莊家台 5 台")
+
+def test_invalid_hands():
+    """測試不合法的牌"""
+    print("\n🔍 測試不合法的牌...")
+
+    invalid_cases = [
+        ("牌數不足", "123m456m789p99s"),
+        ("無法胡牌", "1357m2468p13579s東南西北"),
+        ("超過四張", "11111m234m567m789m999p"),
+    ]
+
+    for name, tiles in invalid_cases:
+        try:
+            calculate_tai(parse_tiles(tiles))
+        except ValueError as e:
+            print(f"✅ {name}：{e}")
+        else:
+            raise AssertionError(f"{name} 應該要失敗")
+
+def test_payments():
+    """測試支付計算"""
+    print("\n💰 測試支付計算...")
+
+    result = calculate_tai(parse_tiles("123m456m789p99s123s"), exposed=[("chow", 9, False)],
+                           flowers=[1, 5], seat_wind=0)
+
+    # 放槍：只有放槍者付錢，莊家不相關時不計莊家台
+    deltas = compute_payments(10, 30, result, 1, 2, [1, 2, 3, 4], 3)
+    assert deltas == {1: 50, 2: -50, 3: 0, 4: 0}, deltas
+    print("✅ 放槍支付正確")
+
+    # 自摸：三家都付，莊家多付莊家台
+    deltas = compute_payments(10, 30, result, 1, None, [1, 2, 3, 4], 3)
+    assert deltas == {1: 160, 2: -50, 3: -60, 4: -50}, deltas
+    assert sum(deltas.values()) == 0
+    print("✅ 自摸支付正確（莊家多付 1 台）")
+
+def test_parse_win_command():
+    """測試 /胡 指令解析"""
+    print("\n📝 測試 /胡 指令解析...")
+
+    params = parse_win_command("/胡 123m456m東東 碰555z 吃345s 暗槓9999p 花春5 放槍 小明")
+    assert params["loser_nickname"] == "小明"
+    assert params["exposed"] == [("pung", 31, False), ("chow", 20, False), ("kong", 17, True)]
+    assert params["flowers"] == [1, 5]
+    print(f"✅ 解析成功：{params['exposed']}")
+
+    for bad_command in ["/胡 123m", "/胡 123m 自摸 放槍小明", "/胡 123m 吃135s 自摸"]:
+        try:
+            parse_win_command(bad_command)
+        except ValueError as e:
+            print(f"✅ 正確拒絕 '{bad_command}'：{e}")
+        else:
+            raise AssertionError(f"{bad_command} 應該要失敗")
+
+def test_hand_transfers():
+    """測試一手的分數變動轉為平衡的分錄"""
+    print("\n📒 測試帳本分錄...")
+
+    transfers = hand_transfers({"a": 190, "b": -70, "c": -60, "d": -60}, "a")
+    assert transfers == [("b", "a", 7000), ("c", "a", 6000), ("d", "a", 6000)], transfers
+    assert hand_transfers({"a": -50, "b": 50, "c": 0}, "b") == [("a", "b", 5000)]
+
+    try:
+        hand_transfers({"a": 100, "b": -90}, "a")
+    except UnbalancedBatchError as e:
+        print(f"✅ 正確拒絕不平衡的分錄：{e}")
+    else:
+        raise AssertionError("加總不為零的分錄應該要失敗")
+
+def test_win_and_settle_flow():
+    """測試 /胡 與 /結算 完整流程"""
+    print("\n🀄 測試胡牌與結算流程...")
+
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = testkit.FakeLineBotApi(lambda user_id: f"玩家{user_id}")
+
+    try:
+        testkit.cleanup(db, GROUP_ID, "score_user")
+        game = Game(group_id=GROUP_ID, per_point=10, base_score=30, status="playing")
+        db.add(game)
+        db.commit()
+
+        for i, (nickname, wind) in enumerate(zip(["小明", "小華", "小美", "小王"], ["東", "南", "西", "北"]), 1):
+            db.add(Player(
+                game_id=game.id,
+                line_user_id=f"score_user{i}",
+                nickname=nickname,
+                wind_position=wind,
+                is_dealer="yes" if i == 1 else "no",
+                seat_number=i
+            ))
+            db.add(User(line_user_id=f"score_user{i}", display_name=nickname))
+        db.commit()
+
+        # 小華胡小王放槍的平胡：底 30 + 2 台 × 10 = 50
+        handle_win_command(make_event("score_user2"), api, "/胡 123m456m789p99s123s 吃234p 放槍 小王", GROUP_ID)
+        assert "第 1 手" in api.replies[-1], api.replies[-1]
+
+        # 小明自摸 門清自摸 3 台：上一手小華胡牌後由小華接莊，莊家多付 1 台
+        handle_win_command(make_event("score_user1"), api, "/胡 123m456m789p99s123s456s 自摸", GROUP_ID)
+        print(api.replies[-1])
+
+        scores = {p.nickname: p.score for p in db.query(Player).filter(Player.game_id == game.id)}
+        assert scores == {"小明": 190, "小華": -20, "小美": -60, "小王": -110}, scores
+        print(f"✅ 分數正確：{scores}")
+
+        handle_settle_command(make_event("score_user1"), api, GROUP_ID)
+        print(api.replies[-1])
+
+        db.expire_all()
+        assert db.query(Game).filter(Game.id == game.id).first().status == "finished"
+        winner = db.query(User).filter(User.line_user_id == "score_user1").first()
+        assert winner.total_games == 1
+
+        # 帳本：放槍一手 1 筆、自摸一手 3 筆，每一手的分錄屬於同一個 hand_id
+        entries = db.query(LedgerEntry).filter(LedgerEntry.game_id == game.id).all()
+        assert len(entries) == 4 and len({e.hand_id for e in entries}) == 2, entries
+        balances = {b.line_user_id: b for b in db.query(UserBalance).filter(UserBalance.line_user_id.like("score_user%"))}
+        assert balances["score_user1"].net_amount == 190 and balances["score_user1"].received_amount == 190
+        assert balances["score_user2"].received_amount == 50 and balances["score_user2"].paid_amount == 70
+        assert sum(b.net_minor for b in balances.values()) == 0
+        assert all(account_net(db, user_id) == b.net_minor for user_id, b in balances.items())
+        assert "總輸贏：+190 元" in winner.get_stats_summary(balance=balances["score_user1"])
+        print("✅ 帳本分錄與收支彙總一致")
+
+        # 台型索引：小明自摸一手（胡牌 + 門清、自摸、不求人），小華放槍胡一手（胡牌 + 平胡）
+        postings = db.query(HandPattern).filter(HandPattern.line_user_id.like("score_user%")).all()
+        assert sorted((p.line_user_id, p.pattern) for p in postings) == [
+            ("score_user1", -1), ("score_user1", 2), ("score_user1", 3), ("score_user1", 4),
+            ("score_user2", -1), ("score_user2", 5)
+        ], postings
+        assert {p.loser_id for p in postings if p.line_user_id == "score_user2"} == {"score_user4"}
+
+        stats = {p.nickname: db.get(UserStats, p.line_user_id) for p in db.query(Player).filter(Player.game_id == game.id)}
+        assert stats["小明"].hands_won == 1 and stats["小明"].self_drawn_count == 1
+        assert stats["小明"].biggest_win == 190 and stats["小明"].current_streak == 1
+        assert stats["小華"].hands_won == 1 and stats["小華"].average_tai == 2
+        assert stats["小王"].deal_in_count == 1 and stats["小王"].current_streak == -1
+        assert all(s.games == 1 and s.hands_played == 2 for s in stats.values())
+        assert "胡牌率 50.0%" in winner.get_stats_summary(stats["小明"])
+        assert db.get(UserRating, "score_user1").rating > db.get(UserRating, "score_user4").rating
+
+        handle_my_stats_command(make_event("score_user1"), api)
+        assert "總輸贏：+190 元" in api.replies[-1] and "📅 最近 3 局：\n1. " in api.replies[-1], api.replies[-1]
+        print("✅ 結算後個人統計已更新")
+
+    finally:
+        testkit.cleanup(db, GROUP_ID, "score_user")
+        db.close()
+        print("🧹 測試資料已清理")
+
+if __name__ == "__main__":
+    print("🚀 開始台數計算測試...")
+
+    Base.metadata.create_all(bind=engine)
+
+    test_tai_patterns()
+    test_invalid_hands()
+    test_payments()
+    test_parse_win_command()
+    test_hand_transfers()
+    test_win_and_settle_flow()
+
+    print("\n🎉 所有台數計算測試通過！")
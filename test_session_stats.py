@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+測試聚會場次：多桌對局歸入同一場次、結算時累計輸贏與 /今日戰績
+"""
+from datetime import timedelta
+from sqlalchemy.orm import sessionmaker
+from models.database import engine
+from models.migrations import upgrade_schema
+from models.game import Game
+from models.game_session import GameSession
+from services import session_stats
+from services.event_store import append_event
+from handlers.game_handler import handle_game_command
+from handlers.hand_handler import handle_win_command, handle_settle_command
+from handlers.session_handler import handle_session_report_command
+import testkit
+from testkit import FakeLineBotApi
+
+GROUP_ID = "test_session_group"
+
+def make_event(user_id):
+    """建立本群組的假訊息事件"""
+    return testkit.make_event(user_id, GROUP_ID)
+
+def cleanup(db):
+    """清理本測試建立的資料"""
+    testkit.cleanup(db, GROUP_ID, "session_")
+
+def seat_players(db, game, names):
+    """讓四位玩家入座、選風並開始對局"""
+    for name, wind in zip(names, ["東", "南", "西", "北"]):
+        append_event(db, game, "join", {"line_user_id": f"session_{name}", "nickname": name})
+        append_event(db, game, "wind", {"line_user_id": f"session_{name}", "nickname": name, "wind": wind})
+    append_event(db, game, "dealer", {"line_user_id": f"session_{names[0]}", "nickname": names[0]})
+    db.commit()
+
+def test_session_totals_across_tables():
+    """測試兩桌結算後的場次累計"""
+    print("🧪 測試聚會場次累計...")
+
+    upgrade_schema()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    api = FakeLineBotApi()
+
+    try:
+        cleanup(db)
+
+        # A 桌開局坐滿後，另一群人開 B 桌
+        handle_game_command(make_event("session_小明"), api, "/開局", GROUP_ID)
+        game_a = db.query(Game).filter(Game.group_id == GROUP_ID).one()
+        seat_players(db, game_a, ["小明", "小華", "小美", "小王"])
+        handle_game_command(make_event("session_阿花"), api, "/開局", GROUP_ID)
+        games = {g.table_code: g for g in db.query(Game).filter(Game.group_id == GROUP_ID)}
+        assert games["A"].session_id and games["A"].session_id == games["B"].session_id
+        print("✅ 同一晚的兩桌歸入同一場次")
+
+        # A 桌：小華胡小王（非莊家）平胡，+50 / -50；B 桌：阿草胡阿樹
+        handle_win_command(make_event("session_小華"), api, "/胡 123m456m789p99s123s 吃234p 放槍 小王", GROUP_ID)
+        seat_players(db, games["B"], ["阿花", "阿草", "阿樹", "阿石"])
+        handle_win_command(make_event("session_阿草"), api, "/胡 123m456m789p99s123s 吃234p 放槍 阿樹", GROUP_ID)
+
+        handle_session_report_command(make_event("session_小明"), api, GROUP_ID)
+        assert "尚無結算完成" in api.replies[-1] and "A、B 桌" in api.replies[-1], api.replies[-1]
+
+        handle_settle_command(make_event("session_小明"), api, GROUP_ID)
+        handle_settle_command(make_event("session_阿花"), api, GROUP_ID)
+
+        db.expire_all()
+        session = db.get(GameSession, games["A"].session_id)
+        assert session.game_count == 2
+        standings = session_stats.session_standings(db, session.id)
+        totals = {row.nickname: row.net_amount for row in standings}
+        assert totals["小華"] == 50 and totals["小王"] == -50 and totals["阿草"] == 50, totals
+        assert len(standings) == 8
+        print(f"✅ 場次累計：{totals}")
+
+        handle_session_report_command(make_event("session_小明"), api, GROUP_ID)
+        report = api.replies[-1]
+        print(report)
+        assert "已結算 2 局" in report and "小華: +50 元（1 局）" in report, report
+
+        # 閒置超過設定時間後開局會開新場次
+        later = session_stats._as_utc(session.last_activity_at) + timedelta(hours=session_stats.SESSION_IDLE_HOURS + 1)
+        new_session = session_stats.open_session(db, GROUP_ID, now=later)
+        db.commit()
+        db.expire_all()
+        assert new_session.id != session.id
+        assert db.get(GameSession, session.id).status == "closed"
+        print("✅ 閒置過久自動開新場次")
+
+    finally:
+        cleanup(db)
+        db.close()
+        print("🧹 測試資料已清理")
+
+if __name__ == "__main__":
+    print("🚀 開始聚會場次測試...")
+
+    test_session_totals_across_tables()
+
+    print("\n🎉 所有聚會場次測試通過！")
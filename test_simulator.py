@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+測試向聽數引擎、/勝率 指令解析與蒙地卡羅模擬
+"""
+import threading
+from types import SimpleNamespace
+from utils.parser import parse_odds_command
+from utils.tiles import parse_tiles, to_counts
+from services import simulator
+from handlers.odds_handler import handle_odds_command
+
+class FakeLineBotApi:
+    """記錄回覆內容的假 LINE Bot API（回覆可能來自背景執行緒）"""
+
+    def __init__(self):
+        self.replies = []
+        self.replied = threading.Event()
+
+    def reply_message(self, reply_token, message):
+        self.replies.append(message.text)
+        self.replied.set()
+
+def counts(text):
+    return to_counts(parse_tiles(text))
+
+def test_shanten():
+    """測試向聽數與有效牌"""
+    print("🧪 測試向聽數...")
+    assert simulator.shanten(counts("123m456m789p99s123s456s")) == -1
+    assert simulator.shanten(counts("123m456m789p99s123s45s")) == 0
+    assert simulator.useful_tiles(counts("123m456m789p99s123s45s")) == parse_tiles("36s")
+    assert simulator.shanten(counts("123m456m789p9s123s45s東")) == 1
+    # 單吊：五組面子加一張孤張
+    assert simulator.shanten(counts("123m456m789p123s456s東")) == 0
+    print("✅ 向聽數正確")
+
+def test_parse_odds_command():
+    """測試 /勝率 指令解析"""
+    print("\n📝 測試 /勝率 解析...")
+    params = parse_odds_command("/勝率 123m456m789p9s123s45s東 見 999p東 摸 12")
+    assert len(params["hand"]) == 16 and len(params["visible"]) == 4 and params["draws"] == 12
+    for bad in ("/勝率 123m", "/勝率 123m456m789p9s123s45s東 摸100", "/勝率 1111m456m789p9s123s4s 見1m"):
+        try:
+            parse_odds_command(bad)
+        except ValueError as e:
+            print(f"✅ 正確拒絕 '{bad}'：{e}")
+        else:
+            raise AssertionError(f"{bad} 應該要失敗")
+
+def test_canonical_key():
+    """花色互換後快取鍵相同"""
+    a = simulator.canonical_key(counts("123m456p9s東東"), counts("9m"), 10)
+    b = simulator.canonical_key(counts("123s456m9p中中"), counts("9s"), 10)
+    assert a == b
+
+def test_estimate_and_cache():
+    """測試程序池模擬、時間上限與快取（只快取完成的結果）"""
+    print("\n🎲 測試蒙地卡羅模擬...")
+    hand = counts("123m456m789p99s123s45s")
+    result = simulator.estimate(hand, [0] * 34, 10, trials=500, budget=10)
+    assert result.completed and result.trials == 500
+    assert result.shanten == 0 and result.useful_tiles == 7
+    # 聽 3s6s 共剩 7 張、牌牆 120 張摸 10 張：1 - C(113,10)/C(120,10) ≈ 47%
+    assert 0.37 < result.wins / result.trials < 0.57, result
+    print(f"✅ 聽牌摸 10 張自摸約 {result.wins * 100 / result.trials:.1f}%")
+
+    # 花色互換的相同牌型直接命中快取
+    cached = simulator.start_simulation(counts("123p456p789m99s123s45s"), [0] * 34, 10, on_done=None)
+    assert cached == result
+    print("✅ 正規化後命中快取")
+
+    # 極差的牌在時間上限內回覆部分結果
+    slow = simulator.estimate(counts("159m159p159s東南西北白發中"), [0] * 34, 20, trials=100000, budget=0.5)
+    assert not slow.completed and slow.trials < 100000
+    # 部分結果不快取，下次請求重新模擬
+    key = simulator.canonical_key(counts("159m159p159s東南西北白發中"), [0] * 34, 20)
+    assert simulator.cached_result(key) is None
+    print(f"✅ 時間上限內完成 {slow.trials} 次模擬")
+
+def test_odds_command_replies_in_background():
+    """測試 /勝率 指令以背景執行完成後回覆"""
+    api = FakeLineBotApi()
+    handle_odds_command(SimpleNamespace(reply_token="token"), api, "/勝率 123m456m789p9s123s45s東 摸8")
+    assert api.replied.wait(10)
+    assert "1 向聽" in api.replies[-1] and "自摸機率" in api.replies[-1], api.replies[-1]
+    print(api.replies[-1])
+
+if __name__ == "__main__":
+    print("🚀 開始勝率模擬測試...")
+
+    test_shanten()
+    test_parse_odds_command()
+    test_canonical_key()
+    test_estimate_and_cache()
+    test_odds_command_replies_in_background()
+
+    print("\n🎉 所有勝率模擬測試通過！")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+測試訊息樣板：預先解析後的渲染結果與 str.format 相同，渲染結果依 (樣板, 對局, 版本號) 快取
+"""
+from types import SimpleNamespace
+from models.game import Game
+from handlers.status_handler import DEALER_SUMMARY, STATUS_HEADER, _status_text
+from utils.templates import MessageTemplate, render_cached, render_stats, reset_render_cache
+
+def test_render_matches_format():
+    """測試渲染結果與 str.format 一致，不支援的語法在建立時就報錯"""
+    print("🧪 測試樣板渲染...")
+
+    text = "🀄 {name} 桌\n💰 {amount:+d} 元（{rate:.1f}%）\n{{不是欄位}}"
+    template = MessageTemplate("sample", text)
+    values = {"name": "A", "amount": 30, "rate": 12.345}
+    assert template.render(**values) == text.format(**values)
+    assert template.fields == ("name", "amount", "rate")
+
+    for bad in ("{player.nickname}", "{players[0]}", "{name!r}"):
+        try:
+            MessageTemplate("bad", bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"應拒絕 {bad}")
+
+    game = Game(group_id="G", table_code="B", mode="台麻", per_point=15, base_score=40, collect_money=False)
+    summary = game.get_summary_text()
+    assert "（B 桌）" in summary and "15 元" in summary and "收莊錢：否" in summary and "/加入 #B" in summary
+    assert set(DEALER_SUMMARY.fields) >= {"dealer_nickname", "player_info", "round_text"}
+    print("✅ 渲染結果與 str.format 相同")
+
+def test_status_text():
+    """測試狀態訊息的內容"""
+    print("\n📊 測試狀態訊息...")
+
+    game = SimpleNamespace(table_code="A", mode="台麻", per_point=10, base_score=30, collect_money=True,
+                           status="created", round_state=0)
+    players = tuple(SimpleNamespace(seat_number=i, nickname=f"玩家{i}", wind_position="東" if i == 1 else None,
+                                    is_dealer="no", score=0) for i in range(1, 5))
+    text = _status_text(game, players)
+    assert text.startswith("📊 對局狀態（A 桌）") and "👥 人數：4/4 人" in text
+    assert "1號: 玩家1 (東風)\n2號: 玩家2\n" in text
+    assert text.endswith("🎲 等待選擇風位：玩家2, 玩家3, 玩家4")
+    assert _status_text(game, ()).endswith("💡 使用 `/加入 暱稱` 指令加入遊戲")
+    print("✅ 狀態訊息正確")
+
+def test_render_cache():
+    """測試同一版本只渲染一次，版本號或資料來源改變時重新渲染"""
+    print("\n🗂️ 測試渲染快取...")
+
+    reset_render_cache()
+    calls = []
+
+    def build(label):
+        calls.append(label)
+        return f"訊息 {label}"
+
+    source = object()
+    first = render_cached(STATUS_HEADER, 7, 3, lambda: build("v3"), source=source)
+    again = render_cached(STATUS_HEADER, 7, 3, lambda: build("v3 again"), source=source)
+    assert first is again and calls == ["v3"]
+
+    assert render_cached(STATUS_HEADER, 7, 4, lambda: build("v4"), source=source) == "訊息 v4"
+    assert render_cached(STATUS_HEADER, 8, 3, lambda: build("other game"), source=source) == "訊息 other game"
+    # 同一版本號但資料已重新載入（例如快取逾時）：不沿用舊的結果
+    assert render_cached(STATUS_HEADER, 7, 3, lambda: build("reloaded"), source=object()) == "訊息 reloaded"
+
+    stats = render_stats()
+    assert stats == {"hits": 1, "misses": 4, "size": 3}, stats
+    reset_render_cache()
+    print(f"✅ 快取統計：{stats}")
+
+if __name__ == "__main__":
+    print("🚀 開始訊息樣板測試...")
+
+    test_render_matches_format()
+    test_status_text()
+    test_render_cache()
+
+    print("\n🎉 所有訊息樣板測試通過！")
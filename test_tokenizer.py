@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+測試單次掃描的指令斷詞：中文數字、全形數字、與舊版解析器比對的模糊測試及微基準
+"""
+import random
+import re
+import time
+from utils.parser import parse_game_command, parse_join_command, parse_odds_command
+from utils.tokenizer import chinese_number, to_number
+
+def legacy_parse_game_command(command_text):
+    """舊版 /開局 解析（多次 re.search），作為比對基準"""
+    params = {"mode": "台麻", "per_point": 10, "base_score": 30, "collect_money": True}
+    text = command_text.replace("/開局", "").strip()
+    if not text:
+        return params
+    mode_match = re.search(r'(台麻|港麻|四川麻將|國標麻將)', text)
+    if mode_match:
+        params["mode"] = mode_match.group(1)
+    per_point_match = re.search(r'每台(\d+)', text)
+    if per_point_match:
+        params["per_point"] = int(per_point_match.group(1))
+    base_score_match = re.search(r'底(\d+)', text)
+    if base_score_match:
+        params["base_score"] = int(base_score_match.group(1))
+    if "不收莊錢" in text:
+        params["collect_money"] = False
+    elif "收莊錢" in text:
+        params["collect_money"] = True
+    return params
+
+def legacy_parse_join_command(command_text):
+    """舊版 /加入 解析，作為比對基準"""
+    text = command_text.replace("/加入", "").strip()
+    if not text:
+        return {"nickname": None}
+    nickname = re.sub(r'[^\w\u4e00-\u9fff]', '', text)
+    if len(nickname) > 20:
+        nickname = nickname[:20]
+    return {"nickname": nickname if nickname else None}
+
+# 模糊測試用的詞彙：只包含舊版能理解的寫法（阿拉伯數字），以及容易混淆的片段
+_GAME_VOCABULARY = [
+    "台麻", "港麻", "四川麻將", "國標麻將", "收莊錢", "不收莊錢", "每台", "底", "台", "麻", "莊錢",
+    "不", "收", "元", "小明", "abc", "!", "#", "/", "-", "每", "四川", "將",
+]
+
+def random_game_command(rng):
+    parts = []
+    for _ in range(rng.randint(0, 8)):
+        roll = rng.random()
+        if roll < 0.25:
+            parts.append(f"每台{rng.randint(0, 2000)}")
+        elif roll < 0.45:
+            parts.append(f"底{rng.randint(0, 20000)}")
+        elif roll < 0.55:
+            parts.append(str(rng.randint(0, 99)))
+        else:
+            parts.append(rng.choice(_GAME_VOCABULARY))
+    return "/開局" + rng.choice([" ", "", "  "]) + rng.choice([" ", ""]).join(parts)
+
+def test_chinese_and_fullwidth_numbers():
+    """測試中文數字與全形數字"""
+    print("🧪 測試中文數字與全形數字...")
+
+    cases = {"十": 10, "十五": 15, "三十": 30, "一百零五": 105, "兩百": 200, "三〇": 30,
+             "一千二百三十四": 1234, "十二萬三千": 123000, "零": 0}
+    for text, expected in cases.items():
+        assert chinese_number(text) == expected, (text, chinese_number(text))
+    assert to_number("２０") == 20 and to_number("30") == 30
+    for bad in ("", "三x", "abc"):
+        try:
+            chinese_number(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad!r} 應該要失敗")
+
+    params = parse_game_command("/開局 港麻 每台２０ 底三十 不收莊錢")
+    assert params == {"mode": "港麻", "per_point": 20, "base_score": 30, "collect_money": False}, params
+    assert parse_game_command("/開局　每台一百五十　底台兩百")["base_score"] == 200
+    # 「四川麻將」的四不會被「底」吃掉
+    assert parse_game_command("/開局 底四川麻將") == legacy_parse_game_command("/開局 底四川麻將")
+    assert parse_odds_command("/勝率 １２３ｍ456m789p9s123s45s東 摸十二".replace("ｍ", "m"))["draws"] == 12
+    print("✅ 中文數字與全形數字解析正確")
+
+def test_fuzz_against_legacy_parser():
+    """以隨機指令比對新舊 /開局、/加入 解析結果"""
+    print("\n🎲 模糊測試新舊解析器...")
+
+    rng = random.Random(20240601)
+    for _ in range(5000):
+        command = random_game_command(rng)
+        assert parse_game_command(command) == legacy_parse_game_command(command), command
+
+    alphabet = "小明華美王abcXYZ019 _-!?@#．，、　😀"
+    for _ in range(3000):
+        body = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        command = "/加入" + body
+        assert parse_join_command(command) == legacy_parse_join_command(command), command
+    print("✅ 8000 筆隨機指令結果與舊版相同")
+
+def benchmark(rounds=20000):
+    """
+    微基準：比較新舊 /開局 解析器處理長訊息的耗時
+
+    Returns:
+        tuple: (舊版秒數, 新版秒數)
+    """
+    command = "/開局 " + "大家今晚老樣子 " * 20 + "台麻 每台10 底30 不收莊錢 " + "記得帶零錢 " * 20
+    results = []
+    for parse in (legacy_parse_game_command, parse_game_command):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            parse(command)
+        results.append(time.perf_counter() - started)
+    return tuple(results)
+
+def test_benchmark():
+    """微基準：單次掃描不應比舊版的多次搜尋慢太多"""
+    legacy, current = benchmark(rounds=2000)
+    print(f"\n⏱️ 舊版 {legacy * 1e6 / 2000:.1f} µs／次，新版 {current * 1e6 / 2000:.1f} µs／次")
+    assert current < legacy * 3, (legacy, current)
+
+if __name__ == "__main__":
+    print("🚀 開始指令斷詞測試...")
+
+    test_chinese_and_fullwidth_numbers()
+    test_fuzz_against_legacy_parser()
+    legacy_seconds, current_seconds = benchmark()
+    print(f"\n⏱️ 2 萬次長訊息解析：舊版 {legacy_seconds:.3f} 秒，新版 {current_seconds:.3f} 秒")
+
+    print("\n🎉 所有指令斷詞測試通過！")
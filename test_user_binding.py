@@ -7,6 +7,9 @@ from models.database import engine, Base
 from models.user import User
 from models.game import Game
 from models.player import Player
+from models.ledger_entry import LedgerEntry
+from models.user_balance import UserBalance
+from services.ledger import apply_balances, post_batch
 
 def test_user_binding_system():
     """測試用戶身份綁定功能"""
@@ -101,14 +104,14 @@ def test_user_binding_system():
         # 5. 測試統計功能模擬
         print("\n📊 測試統計功能模擬...")
         
-        # 模擬遊戲結果更新
-        for user in created_users[:2]:  # 只更新前兩個用戶的統計
-            user.update_game_result(win_amount=150, lose_amount=50)  # 贏100元
-            print(f"✅ 更新 {user.get_effective_nickname()} 統計：+100元")
-        
-        for user in created_users[2:]:  # 後兩個用戶輸錢
-            user.update_game_result(win_amount=0, lose_amount=50)  # 輸50元
-            print(f"✅ 更新 {user.get_effective_nickname()} 統計：-50元")
+        # 模擬遊戲結果寫入帳本：後兩個用戶各付 100 元給前兩個用戶
+        user_ids = [user.line_user_id for user in created_users]
+        transfers = [(user_ids[2], user_ids[0], 10000), (user_ids[3], user_ids[1], 10000)]
+        post_batch(db, transfers, game_id=test_game.id, group_id=test_game.group_id)
+        balances = apply_balances(db, user_ids, transfers)
+        for user in created_users:
+            user.total_games = (user.total_games or 0) + 1
+            print(f"✅ 更新 {user.get_effective_nickname()} 統計：{balances[user.line_user_id].net_minor // 100:+d}元")
         
         db.commit()
         
@@ -116,20 +119,20 @@ def test_user_binding_system():
         print("\n📈 測試統計摘要...")
         for user in created_users:
             db.refresh(user)
-            stats_summary = user.get_stats_summary()
+            stats_summary = user.get_stats_summary(balance=db.get(UserBalance, user.line_user_id))
             print(f"\n{user.get_effective_nickname()} 的統計:")
             print(stats_summary.replace('\n', '\n  '))
         
         # 7. 測試排行榜功能模擬
         print("\n🏆 測試排行榜（按淨輸贏排序）...")
         
-        ranked_users = db.query(User).filter(
-            User.total_games > 0
-        ).order_by(User.net_amount.desc()).all()
+        ranked_users = db.query(User, UserBalance).join(
+            UserBalance, UserBalance.line_user_id == User.line_user_id
+        ).filter(User.total_games > 0).order_by(UserBalance.net_minor.desc()).all()
         
-        for i, user in enumerate(ranked_users, 1):
-            status_emoji = "📈" if user.net_amount > 0 else "📉" if user.net_amount < 0 else "➖"
-            print(f"{i}. {user.get_effective_nickname()}: {user.net_amount:+.0f}元 {status_emoji} ({user.total_games}局)")
+        for i, (user, balance) in enumerate(ranked_users, 1):
+            status_emoji = "📈" if balance.net_amount > 0 else "📉" if balance.net_amount < 0 else "➖"
+            print(f"{i}. {user.get_effective_nickname()}: {balance.net_amount:+.0f}元 {status_emoji} ({user.total_games}局)")
         
         # 8. 測試暱稱更改場景
         print("\n🔄 測試暱稱更改場景...")
@@ -144,6 +147,8 @@ def test_user_binding_system():
         print(f"✅ {user_xiaomei.display_name} 設定慣用暱稱：'{old_effective}' → '{new_effective}'")
         
         # 清理測試資料
+        db.query(LedgerEntry).filter(LedgerEntry.game_id == test_game.id).delete()
+        db.query(UserBalance).filter(UserBalance.line_user_id.in_(user_ids)).delete(synchronize_session=False)
         db.query(Player).filter(Player.game_id == test_game.id).delete()
         db.delete(test_game)
         for user in created_users:
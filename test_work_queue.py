@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+測試指令工作佇列：過載時先捨棄低優先指令、高優先先處理、等待過久的查詢不處理、同群組依序處理與停止時清空佇列
+"""
+import random
+import threading
+import time
+from services.work_queue import HIGH, LOW, WorkQueue, command_priority
+
+def test_command_priority():
+    """測試查詢指令為低優先，修改對局的指令為高優先"""
+    print("🧪 測試指令優先順序...")
+
+    assert command_priority("/排行榜") == LOW and command_priority("/我的統計") == LOW
+    assert command_priority("/週排行") == LOW and command_priority("/查詢牌型 清一色") == LOW
+    assert command_priority("/胡 123m 自摸") == HIGH and command_priority("/結算") == HIGH
+    assert command_priority("/加入 小明") == HIGH and command_priority("/狀態") == HIGH
+    print("✅ 優先順序正確")
+
+def test_overload_shedding():
+    """測試佇列過長時捨棄低優先指令，硬上限才拒絕高優先指令"""
+    print("\n🚧 測試過載捨棄...")
+
+    gate = threading.Event()
+    handled, shed = [], []
+
+    def handle(item):
+        gate.wait(5)
+        handled.append(item)
+
+    queue = WorkQueue(handle, on_shed=lambda item, reason: shed.append(item),
+                      threads=1, max_depth=6, shed_depth=3, shed_seconds=60)
+    queue.start()
+    try:
+        assert queue.submit("blocker", HIGH)
+        while queue.depth():  # 等執行緒取走第一個事件並卡住
+            time.sleep(0.005)
+
+        assert queue.submit("low-1", LOW) and queue.submit("high-1", HIGH) and queue.submit("high-2", HIGH)
+        assert not queue.submit("low-2", LOW)  # 長度 3 已達捨棄門檻
+        for i in range(3, 6):
+            assert queue.submit(f"high-{i}", HIGH)
+        assert not queue.submit("high-6", HIGH)  # 硬上限
+        assert shed == ["low-2", "high-6"]
+
+        stats = queue.stats()
+        assert (stats["depth"], stats["shed_overload"], stats["shed_full"]) == (6, 1, 1), stats
+    finally:
+        gate.set()
+        queue.stop(timeout=5)
+
+    # 高優先先處理，低優先排最後
+    assert handled == ["blocker", "high-1", "high-2", "high-3", "high-4", "high-5", "low-1"], handled
+    assert not queue.submit("late", HIGH) and queue.stats()["shed_closed"] == 1
+    print(f"✅ 捨棄 {shed}，停止前處理完佇列中的 {len(handled)} 個事件")
+
+def test_stale_low_priority_shed():
+    """測試取出時已等待過久的低優先指令不處理"""
+    print("\n⌛ 測試等待過久的查詢...")
+
+    gate = threading.Event()
+    handled, shed = [], []
+
+    def handle(item):
+        gate.wait(5)
+        handled.append(item)
+
+    queue = WorkQueue(handle, on_shed=lambda item, reason: shed.append(item), threads=1, shed_seconds=0.05)
+    queue.start()
+    try:
+        queue.submit("blocker", HIGH)
+        while queue.depth():
+            time.sleep(0.005)
+        queue.submit("query", LOW)
+        queue.submit("win", HIGH)
+        time.sleep(0.1)
+    finally:
+        gate.set()
+        queue.stop(timeout=5)
+
+    assert handled == ["blocker", "win"] and shed == ["query"], (handled, shed)
+    stats = queue.stats()
+    assert stats["shed_stale"] == 1 and stats["max_wait"] >= 0.05, stats
+    print(f"✅ 最長等待 {stats['max_wait'] * 1000:.0f} ms，過期查詢回覆忙碌中")
+
+def test_same_group_in_order():
+    """測試同一群組的事件由同一個執行緒依收到的順序處理"""
+    print("\n🔢 測試同群組依序處理...")
+
+    handled = {}
+    lock = threading.Lock()
+
+    def handle(item):
+        group, seq = item
+        time.sleep(random.random() * 0.002)
+        with lock:
+            handled.setdefault(group, []).append((seq, threading.current_thread().name))
+
+    queue = WorkQueue(handle, threads=4)
+    queue.start()
+    groups = [f"G{i}" for i in range(8)]
+    for seq in range(20):
+        for group in groups:
+            assert queue.submit((group, seq), HIGH, key=group)
+    queue.stop(timeout=5)
+
+    for group in groups:
+        assert [seq for seq, _ in handled[group]] == list(range(20)), handled[group]
+        assert len({name for _, name in handled[group]}) == 1
+    threads = {handled[group][0][1] for group in groups}
+    assert len(threads) > 1, threads  # 不同群組仍分散到多個執行緒
+    print(f"✅ 8 個群組由 {len(threads)} 個執行緒各自依序處理")
+
+if __name__ == "__main__":
+    print("🚀 開始工作佇列測試...")
+
+    test_command_priority()
+    test_overload_shedding()
+    test_stale_low_priority_shed()
+    test_same_group_in_order()
+
+    print("\n🎉 所有工作佇列測試通過！")
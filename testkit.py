@@ -0,0 +1,86 @@
+"""
+測試共用工具 - 假的 LINE Bot API、假的訊息事件，以及依群組與使用者前綴清除測試資料
+
+各個 test_*.py 也能直接以 python 執行，所以共用的程式放在一般模組，而不是 conftest.py。
+"""
+from types import SimpleNamespace
+
+from sqlalchemy import or_, select
+
+from models import migrations  # noqa: F401  匯入所有模型，Base.metadata 才有全部表格
+from models.database import Base
+from models.game import Game
+from models.game_session import GameSession
+from models.hand import Hand
+
+# 跨群組共用的表格，不隨單一測試刪除
+# （group_versions 刪除後版本號會從 1 重新開始，比本程序記得的版本小，快取會以為沒有變動）
+SHARED_TABLES = {"group_versions", "quantile_sketches", "schema_migrations", "pending_events", "processed_events"}
+
+# 存放 LINE 使用者 ID 的欄位
+USER_COLUMNS = ("line_user_id", "payer_id", "payee_id", "loser_id")
+
+class FakeLineBotApi:
+    """
+    記錄回覆內容的假 LINE Bot API
+
+    Args:
+        display_name: user_id → 顯示名稱的函式，預設直接使用 user_id
+    """
+
+    def __init__(self, display_name=None):
+        self.replies = []
+        self.pushes = []  # (to, 訊息文字)
+        self.display_name = display_name or (lambda user_id: user_id)
+
+    def reply_message(self, reply_token, message):
+        self.replies.append(message.text)
+
+    def push_message(self, to, message):
+        self.pushes.append((to, message.text))
+
+    def get_profile(self, user_id):
+        return SimpleNamespace(display_name=self.display_name(user_id))
+
+def make_event(user_id, group_id=None, text=""):
+    """建立假的 LINE 訊息事件（group_id 為 None 時是私訊）"""
+    return SimpleNamespace(
+        reply_token="token",
+        source=SimpleNamespace(user_id=user_id, group_id=group_id),
+        message=SimpleNamespace(text=text)
+    )
+
+def cleanup(db, group_id=None, user_prefix=None):
+    """
+    刪除測試在所有表格留下的資料並提交
+
+    依外鍵順序由子表格刪到父表格：屬於群組（group_id）的列、屬於群組對局或場次的列，
+    以及使用者 ID 以 user_prefix 開頭的列。
+
+    Returns:
+        int: 刪除的資料列數
+    """
+    game_ids, session_ids, hand_ids = [], [], []
+    if group_id:
+        game_ids = db.scalars(select(Game.id).where(Game.group_id == group_id)).all()
+        session_ids = db.scalars(select(GameSession.id).where(GameSession.group_id == group_id)).all()
+        hand_ids = db.scalars(select(Hand.id).where(Hand.game_id.in_(game_ids))).all() if game_ids else []
+    owners = {"group_id": [group_id] if group_id else [], "game_id": game_ids,
+              "session_id": session_ids, "hand_id": hand_ids}
+
+    count = 0
+    for table in reversed(Base.metadata.sorted_tables):
+        if table.name in SHARED_TABLES:
+            continue
+        conditions = [table.c[name].in_(ids) for name, ids in owners.items() if ids and name in table.c]
+        if table.name == "games" and game_ids:
+            conditions.append(table.c.id.in_(game_ids))
+        if table.name == "game_sessions" and session_ids:
+            conditions.append(table.c.id.in_(session_ids))
+        if user_prefix:
+            conditions += [table.c[name].startswith(user_prefix, autoescape=True)
+                           for name in USER_COLUMNS if name in table.c]
+        if conditions:
+            count += db.execute(table.delete().where(or_(*conditions))).rowcount
+    db.commit()
+    return count
@@ -0,0 +1,12 @@
+"""
+穩定雜湊 - 各程序算出相同結果的 64 位元雜湊
+
+不使用內建 hash()：字串雜湊每個程序的種子不同，各 worker 會算出不同的值。
+群組鎖鍵、分派用的雜湊環與頻率限制的桶子位置都以此計算。
+"""
+import hashlib
+
+def stable_hash(text, signed=False):
+    """字串 → 64 位元整數（signed=True 時為有號整數，可直接當 PostgreSQL bigint）"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=signed)
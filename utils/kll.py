@@ -0,0 +1,87 @@
+"""
+KLL 分位數草圖 - 以固定記憶體估計資料流中某個值的排名
+
+每一層 compactor 滿了就排序後隨機保留奇數或偶數位置的一半，升到上一層（權重加倍），
+總容量約為 k / (1 - c)，與資料量無關。兩個草圖可以直接合併，排名也可以跨草圖相加。
+"""
+import math
+import random
+from bisect import bisect_right
+
+class KLLSketch:
+    """KLL 分位數草圖"""
+
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.n = 0  # 已加入的資料筆數
+        self.levels = [[]]
+        self._rng = random.Random(seed)
+
+    def _capacity(self, height):
+        depth = len(self.levels) - height - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def _size(self):
+        return sum(len(level) for level in self.levels)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def update(self, value):
+        """加入一筆資料"""
+        self.levels[0].append(value)
+        self.n += 1
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def _compress(self):
+        for height in range(len(self.levels)):
+            level = self.levels[height]
+            if len(level) < self._capacity(height):
+                continue
+            if height + 1 == len(self.levels):
+                self.levels.append([])
+            level.sort()
+            offset = self._rng.randint(0, 1)
+            # 奇數筆時最後一筆留在原層
+            keep = level[-1:] if len(level) % 2 else []
+            paired = level[:len(level) - len(keep)]
+            self.levels[height + 1].extend(paired[offset::2])
+            self.levels[height] = keep
+            if self._size() < self._max_size():
+                break
+
+    def merge(self, other):
+        """合併另一個草圖（就地修改並回傳自己）"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for height, level in enumerate(other.levels):
+            self.levels[height].extend(level)
+        self.n += other.n
+        while self._size() >= self._max_size():
+            before = self._size()
+            self._compress()
+            if self._size() == before:
+                break
+        return self
+
+    def rank(self, value):
+        """估計小於等於 value 的資料筆數"""
+        total = 0
+        for height, level in enumerate(self.levels):
+            level.sort()
+            total += bisect_right(level, value) << height
+        return total
+
+    def to_dict(self):
+        """轉為可存成 JSON 的字典"""
+        return {"k": self.k, "c": self.c, "n": self.n, "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, data, seed=None):
+        """由 to_dict 的結果還原"""
+        sketch = cls(k=data.get("k", 200), c=data.get("c", 2 / 3), seed=seed)
+        sketch.n = data.get("n", 0)
+        sketch.levels = [list(level) for level in data.get("levels", [[]])] or [[]]
+        return sketch
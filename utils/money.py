@@ -0,0 +1,31 @@
+"""
+金額換算 - 資料庫以整數最小單位（0.01 元）儲存金額
+
+整數相加不會累積浮點誤差，SUM 與 ORDER BY 也能直接在整數索引上比較。
+顯示與計算時再換回元。
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+MONEY_SCALE = 100  # 1 元 = 100 個最小單位
+
+def to_minor(amount):
+    """元 → 最小單位（四捨五入到 0.01 元）"""
+    if amount is None:
+        return 0
+    if isinstance(amount, int):
+        return amount * MONEY_SCALE
+    return int((Decimal(str(amount)) * MONEY_SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor(minor):
+    """最小單位 → 元（整數元回傳 int，否則回傳 float）"""
+    minor = minor or 0
+    if minor % MONEY_SCALE == 0:
+        return minor // MONEY_SCALE
+    return minor / MONEY_SCALE
+
+def format_amount(minor, signed=False):
+    """最小單位 → 顯示用金額文字（整數元不顯示小數）"""
+    amount = from_minor(minor)
+    if isinstance(amount, int):
+        return f"{amount:+d}" if signed else f"{amount:d}"
+    return f"{amount:+.2f}" if signed else f"{amount:.2f}"
@@ -2,11 +2,43 @@
 指令參數解析工具
 """
 import re
+from utils.tiles import HONOR_START, parse_flowers, parse_tiles, to_counts
+from utils.tokenizer import NUMBER, Grammar, command_args, normalize, to_number
+
+# 桌號標記，例如 "/狀態 #B"
+_TABLE_CODE_PATTERN = re.compile(r'(?:^|\s)#([A-Za-z])(?=\s|$)')
+
+def extract_table_code(text):
+    """
+    取出指令中的桌號標記
+
+    Examples:
+        "/加入 #B 小明" -> ("B", "/加入 小明")
+        "/狀態" -> (None, "/狀態")
+    """
+    match = _TABLE_CODE_PATTERN.search(text)
+    if not match:
+        return None, text
+    cleaned = re.sub(r'\s+', ' ', text[:match.start()] + " " + text[match.end():]).strip()
+    return match.group(1).upper(), cleaned
+
+# /開局 參數語法：一次掃描取出模式、每台、底台與是否收莊錢（沒寫「不收莊錢」即為收）
+_GAME_GRAMMAR = Grammar([
+    ("mode", ("台麻", "港麻", "四川麻將", "國標麻將"), None, None),
+    ("per_point", ("每台",), NUMBER, to_number),
+    ("base_score", ("底台", "底"), NUMBER, to_number),
+    ("no_collect", ("不收莊錢",), None, None),
+])
+
+# 暱稱只保留中文、英文、數字
+_NICKNAME_STRIP = re.compile(r'[^\w\u4e00-\u9fff]')
 
 def parse_game_command(command_text):
     """
     解析 /開局 指令參數
     
+    數字可用全形或中文數字，例如 "每台２０"、"底三十"。
+    
     輸入範例: "/開局 台麻 每台10 底30 收莊錢"
     輸出: {
         "mode": "台麻",
@@ -23,32 +55,12 @@ def parse_game_command(command_text):
         "collect_money": True
     }
     
-    # 移除 /開局 前綴並清理空白
-    text = command_text.replace("/開局", "").strip()
-    
-    if not text:
-        return params
-    
-    # 解析模式（台麻、港麻等）
-    mode_match = re.search(r'(台麻|港麻|四川麻將|國標麻將)', text)
-    if mode_match:
-        params["mode"] = mode_match.group(1)
-    
-    # 解析每台金額
-    per_point_match = re.search(r'每台(\d+)', text)
-    if per_point_match:
-        params["per_point"] = int(per_point_match.group(1))
-    
-    # 解析底台金額
-    base_score_match = re.search(r'底(\d+)', text)
-    if base_score_match:
-        params["base_score"] = int(base_score_match.group(1))
-    
-    # 解析是否收莊錢
-    if "不收莊錢" in text:
+    found = _GAME_GRAMMAR.scan(command_args(command_text, "/開局"))
+    for name in ("mode", "per_point", "base_score"):
+        if name in found:
+            params[name] = found[name]
+    if "no_collect" in found:
         params["collect_money"] = False
-    elif "收莊錢" in text:
-        params["collect_money"] = True
     
     return params
 
@@ -96,15 +108,176 @@ def parse_join_command(command_text):
         - 如果沒有設定慣用暱稱 → 自動使用 LINE 原本名字
         - 提供的暱稱參數會被系統邏輯覆蓋，並給予說明
     """
-    text = command_text.replace("/加入", "").strip()
+    text = command_args(command_text, "/加入").strip()
     
     if not text:
         return {"nickname": None}
     
     # 移除可能的特殊字符，只保留中文、英文、數字
-    nickname = re.sub(r'[^\w\u4e00-\u9fff]', '', text)
+    nickname = _NICKNAME_STRIP.sub('', text)
     
     if len(nickname) > 20:
         nickname = nickname[:20]
     
-    return {"nickname": nickname if nickname else None}
\ No newline at end of file
+    return {"nickname": nickname if nickname else None}
+
+def parse_win_command(command_text):
+    """
+    解析 /胡 指令參數
+
+    輸入範例: "/胡 123m456m789p東東 碰555z 吃345s 花15 放槍 小明"
+    輸出: {
+        "concealed": [...],          # 手牌（含胡的那張）牌編號
+        "exposed": [("pung", 31, False), ("chow", 20, False)],
+        "flowers": [1, 5],
+        "self_drawn": False,
+        "loser_nickname": "小明",
+        "kong_draw": False,
+        "last_tile": False
+    }
+
+    Raises:
+        ValueError: 牌面或面子格式錯誤時
+    """
+    params = {
+        "concealed": [],
+        "exposed": [],
+        "flowers": [],
+        "self_drawn": False,
+        "loser_nickname": None,
+        "kong_draw": False,
+        "last_tile": False
+    }
+
+    tokens = command_args(command_text, "/胡").split()
+    index = 0
+
+    while index < len(tokens):
+        token = tokens[index]
+        index += 1
+
+        if token == "自摸":
+            params["self_drawn"] = True
+        elif token.startswith("放槍"):
+            nickname = token[len("放槍"):]
+            if not nickname and index < len(tokens):
+                nickname = tokens[index]
+                index += 1
+            if not nickname:
+                raise ValueError("請在「放槍」後面填寫放槍玩家的暱稱")
+            params["loser_nickname"] = nickname
+        elif token in ("槓上", "槓上開花"):
+            params["kong_draw"] = True
+        elif token in ("海底", "海底撈月"):
+            params["last_tile"] = True
+        elif token.startswith("花"):
+            params["flowers"].extend(parse_flowers(token[1:]))
+        elif token.startswith(("暗槓", "明槓", "槓", "碰", "吃")):
+            params["exposed"].append(_parse_meld(token))
+        else:
+            params["concealed"].extend(parse_tiles(normalize(token)))
+
+    if params["self_drawn"] and params["loser_nickname"]:
+        raise ValueError("自摸與放槍不可同時指定")
+    if not params["self_drawn"] and not params["loser_nickname"]:
+        raise ValueError("請指定「自摸」或「放槍 暱稱」")
+
+    return params
+
+
+def parse_odds_command(command_text):
+    """
+    解析 /勝率 指令參數
+
+    輸入範例: "/勝率 123m456m789p9s123s45s東 見 999p東 摸12"
+    輸出: {
+        "hand": [...],      # 待摸的手牌（3n+1 張）
+        "visible": [...],   # 桌面上已看到的牌（不會再摸到）
+        "draws": 12         # 模擬摸幾張，預設 10
+    }
+
+    Raises:
+        ValueError: 牌面或張數錯誤時
+    """
+    params = {"hand": [], "visible": [], "draws": 10}
+
+    tokens = command_args(command_text, "/勝率").split()
+    target = "hand"
+    index = 0
+
+    while index < len(tokens):
+        token = tokens[index]
+        index += 1
+
+        if token.startswith("摸"):
+            number = token[1:]
+            if not number and index < len(tokens):
+                number = tokens[index]
+                index += 1
+            try:
+                params["draws"] = to_number(number.rstrip("張"))
+            except ValueError:
+                raise ValueError("摸牌數必須是數字，例如：摸10")
+        elif token.startswith("見"):
+            target = "visible"
+            if token[1:]:
+                params["visible"].extend(parse_tiles(normalize(token[1:])))
+        else:
+            params[target].extend(parse_tiles(normalize(token)))
+
+    if not params["hand"] or len(params["hand"]) % 3 != 1:
+        raise ValueError(f"手牌必須是 3n+1 張（例如 16 張），目前 {len(params['hand'])} 張")
+    if not 1 <= params["draws"] <= 40:
+        raise ValueError("摸牌數必須介於 1-40")
+    counts = to_counts(params["hand"] + params["visible"])
+    if max(counts) > 4:
+        raise ValueError("同一種牌最多只有 4 張")
+
+    return params
+
+
+PATTERN_QUERY_PERIODS = ("今年", "本月", "全部")
+
+def parse_pattern_query(command_text):
+    """
+    解析 /查詢牌型 指令參數
+
+    輸入範例: "/查詢牌型 清一色 今年"
+    輸出: {
+        "pattern": "清一色",  # 台型名稱，未指定時為 None（列出所有台型）
+        "period": "今年"      # 今年、本月或全部，預設全部
+    }
+
+    Raises:
+        ValueError: 參數過多時
+    """
+    params = {"pattern": None, "period": "全部"}
+    for token in command_args(command_text, "/查詢牌型").split():
+        if token in PATTERN_QUERY_PERIODS:
+            params["period"] = token
+        elif params["pattern"] is None:
+            params["pattern"] = token
+        else:
+            raise ValueError(f"一次只能查詢一種台型：{params['pattern']}、{token}")
+    return params
+
+def _parse_meld(token):
+    """解析面子文字，例如 '碰555z'、'吃345s'、'暗槓東東東東'"""
+    for prefix, kind, concealed in (("暗槓", "kong", True), ("明槓", "kong", False),
+                                    ("槓", "kong", False), ("碰", "pung", False),
+                                    ("吃", "chow", False)):
+        if token.startswith(prefix):
+            tiles = sorted(parse_tiles(token[len(prefix):]))
+            break
+
+    if kind == "chow":
+        start = tiles[0] if tiles else 0
+        if (len(tiles) != 3 or start >= HONOR_START or start % 9 > 6
+                or tiles != [start, start + 1, start + 2]):
+            raise ValueError(f"吃的牌必須是同花色的三張順子：{token}")
+        return (kind, start, concealed)
+
+    expected = (3, 4) if kind == "kong" else (3,)
+    if len(tiles) not in expected or len(set(tiles)) != 1:
+        raise ValueError(f"{prefix}的牌必須是相同的牌：{token}")
+    return (kind, tiles[0], concealed)
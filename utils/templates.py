@@ -0,0 +1,94 @@
+"""
+訊息樣板 - 多行回覆訊息預先解析一次，渲染結果依 (樣板, 對局, 版本號) 快取
+
+樣板使用 str.format 的語法（{欄位} 或 {欄位:格式}），建立時就拆成固定文字與欄位，
+渲染時只需依序填入，不必每次重新解析整段字串。
+
+同一對局在群組版本號（services.invalidation）沒變之前，渲染出的訊息也不會變：
+render_cached 以 (樣板名稱, game_id, version) 為鍵，重複的 /狀態 只需一次字典查詢。
+"""
+import os
+import threading
+from collections import OrderedDict
+from string import Formatter
+
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "2048"))
+
+class MessageTemplate:
+    """
+    預先解析的訊息樣板
+
+    Args:
+        name: 樣板名稱（快取鍵的一部分）
+        text: str.format 語法的樣板文字
+    """
+
+    __slots__ = ("name", "fields", "_segments")
+
+    def __init__(self, name, text):
+        self.name = name
+        segments = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if conversion or (field is not None and not field.isidentifier()):
+                raise ValueError(f"樣板 {name} 只支援 {{欄位}} 或 {{欄位:格式}}：{field}")
+            segments.append((literal, field, spec or None))
+        self._segments = tuple(segments)
+        self.fields = tuple(field for _, field, _ in segments if field is not None)
+
+    def render(self, **values):
+        """填入欄位，回傳訊息文字"""
+        parts = []
+        for literal, field, spec in self._segments:
+            parts.append(literal)
+            if field is not None:
+                value = values[field]
+                parts.append(format(value, spec) if spec else str(value))
+        return "".join(parts)
+
+_rendered = OrderedDict()  # (樣板名稱, game_id, version) → (來源, 訊息文字)
+_rendered_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0}
+
+def render_cached(template, game_id, version, build, source=None):
+    """
+    取得快取的渲染結果，沒有時呼叫 build() 渲染並存入快取
+
+    Args:
+        template: MessageTemplate（只用到名稱）
+        version: 群組版本號，群組有變動時不同
+        build: 渲染訊息的函式
+        source: 渲染所依據的資料物件；同一版本號重新載入過資料時（例如快取逾時）不沿用舊的結果
+    """
+    key = (template.name, game_id, version)
+    with _rendered_lock:
+        entry = _rendered.get(key)
+        if entry is not None and entry[0] is source:
+            _rendered.move_to_end(key)
+            _counters["hits"] += 1
+            return entry[1]
+        _counters["misses"] += 1
+
+    text = build()
+    with _rendered_lock:
+        _rendered[key] = (source, text)
+        _rendered.move_to_end(key)
+        while len(_rendered) > RENDER_CACHE_SIZE:
+            _rendered.popitem(last=False)
+    return text
+
+def render_stats():
+    """
+    本程序的渲染快取統計
+
+    Returns:
+        dict: hits、misses、size
+    """
+    with _rendered_lock:
+        return {**_counters, "size": len(_rendered)}
+
+def reset_render_cache():
+    """清除本程序的渲染快取與統計"""
+    with _rendered_lock:
+        _rendered.clear()
+        for name in _counters:
+            _counters[name] = 0
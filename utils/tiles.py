@@ -0,0 +1,152 @@
+"""
+麻將牌編碼工具 - 將牌面文字轉為計數向量
+
+牌的編號（共 34 種）：
+    0-8   萬子 1m-9m
+    9-17  筒子 1p-9p
+    18-26 條子 1s-9s
+    27-33 字牌 東南西北白發中（1z-7z）
+花牌另外以 1-8 編號：春夏秋冬梅蘭竹菊（f1-f8）
+"""
+import re
+
+TILE_KINDS = 34
+HONOR_START = 27
+WINDS = ["東", "南", "西", "北"]
+HONOR_NAMES = ["東", "南", "西", "北", "白", "發", "中"]
+FLOWER_NAMES = ["春", "夏", "秋", "冬", "梅", "蘭", "竹", "菊"]
+SUIT_LETTERS = "mpsz"
+
+# 花色位元：萬=1、筒=2、條=4、字=8
+SUIT_BITS = (1, 2, 4, 8)
+
+# 字牌別名（含簡體與常見寫法）
+_HONOR_ALIASES = {
+    "東": 27, "东": 27,
+    "南": 28,
+    "西": 29,
+    "北": 30,
+    "白": 31,
+    "發": 32, "发": 32,
+    "中": 33,
+}
+
+_FLOWER_ALIASES = {name: i + 1 for i, name in enumerate(FLOWER_NAMES)}
+
+# 數字牌群組，例如 123m、55z
+_TILE_GROUP_PATTERN = re.compile(r'(\d+)([mpsz])')
+
+
+def tile_suit(tile):
+    """取得牌的花色索引（0 萬、1 筒、2 條、3 字）"""
+    return tile // 9 if tile < HONOR_START else 3
+
+
+def tile_name(tile):
+    """將牌編號轉為文字，例如 0 -> '1m'、27 -> '東'"""
+    if tile >= HONOR_START:
+        return HONOR_NAMES[tile - HONOR_START]
+    return f"{tile % 9 + 1}{SUIT_LETTERS[tile // 9]}"
+
+
+def wind_index(wind):
+    """將風位文字轉為 0-3 的索引，無法辨識時回傳 None"""
+    try:
+        return WINDS.index(wind)
+    except ValueError:
+        return None
+
+
+def parse_tiles(text):
+    """
+    解析牌面文字為牌編號列表
+
+    支援格式：
+        "123m456p789s"  -> 數字加花色字母
+        "11z" / "東東"   -> 字牌可用 1z-7z 或中文
+        混合寫法        -> "123m東東東"
+
+    Raises:
+        ValueError: 牌面無法辨識時
+    """
+    tiles = []
+    pos = 0
+    length = len(text)
+
+    while pos < length:
+        char = text[pos]
+
+        if char in _HONOR_ALIASES:
+            tiles.append(_HONOR_ALIASES[char])
+            pos += 1
+            continue
+
+        match = _TILE_GROUP_PATTERN.match(text, pos)
+        if not match:
+            raise ValueError(f"無法辨識的牌：{text[pos:]}")
+
+        digits, suit = match.group(1), match.group(2)
+        suit_index = SUIT_LETTERS.index(suit)
+        for digit in digits:
+            number = int(digit)
+            if suit_index == 3:
+                if not 1 <= number <= 7:
+                    raise ValueError(f"字牌編號必須是 1-7：{digit}z")
+            elif not 1 <= number <= 9:
+                raise ValueError(f"數字牌必須是 1-9：{digit}{suit}")
+            tiles.append(suit_index * 9 + number - 1)
+        pos = match.end()
+
+    return tiles
+
+
+def parse_flowers(text):
+    """
+    解析花牌文字，回傳 1-8 的花牌編號列表
+
+    支援 "15"、"春梅"、"f1f5" 等寫法
+    """
+    flowers = []
+    for char in text.replace("f", ""):
+        if char in _FLOWER_ALIASES:
+            flowers.append(_FLOWER_ALIASES[char])
+        elif char.isdigit() and 1 <= int(char) <= 8:
+            flowers.append(int(char))
+        else:
+            raise ValueError(f"無法辨識的花牌：{char}")
+
+    if len(set(flowers)) != len(flowers):
+        raise ValueError("花牌不可重複")
+
+    return flowers
+
+
+def to_counts(tiles):
+    """將牌編號列表轉為 34 格的計數向量"""
+    counts = [0] * TILE_KINDS
+    for tile in tiles:
+        counts[tile] += 1
+    return counts
+
+
+def format_tiles(tiles):
+    """將牌編號列表格式化為精簡文字，例如 [0, 1, 2, 27] -> '123m東'"""
+    parts = []
+    current_suit = None
+    buffer = ""
+    for tile in sorted(tiles):
+        if tile >= HONOR_START:
+            if buffer:
+                parts.append(buffer + SUIT_LETTERS[current_suit])
+                buffer = ""
+            parts.append(HONOR_NAMES[tile - HONOR_START])
+            continue
+        suit = tile // 9
+        if suit != current_suit and buffer:
+            parts.append(buffer + SUIT_LETTERS[current_suit])
+            buffer = ""
+        current_suit = suit
+        buffer += str(tile % 9 + 1)
+    if buffer:
+        parts.append(buffer + SUIT_LETTERS[current_suit])
+    return "".join(parts)
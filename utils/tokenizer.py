@@ -0,0 +1,106 @@
+"""
+指令參數斷詞工具 - 預先編譯的語法，一次掃描產生型別化的參數
+
+數字可用阿拉伯數字（含全形）或中文數字（三十、一百五十、兩百）。
+語法直接比對全形數字，只有取出的值才轉成半形，整段訊息只掃描一次。
+"""
+import re
+
+# 全形數字、全形空白 → 半形
+_FULLWIDTH = {0xFF10 + i: ord("0") + i for i in range(10)}
+_FULLWIDTH[0x3000] = ord(" ")
+
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4,
+              "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000, "萬": 10000}
+
+# 數字：阿拉伯數字（含全形）或中文數字（「四川麻將」的四不當成數字）
+NUMBER = r"[0-9０-９]+|[零〇一二兩三四五六七八九十百千萬]+(?!川)"
+
+def normalize(text):
+    """全形數字與全形空白轉為半形"""
+    return text.translate(_FULLWIDTH)
+
+def command_args(command_text, prefix):
+    """移除指令開頭的前綴，回傳其餘參數文字"""
+    if command_text.startswith(prefix):
+        return command_text[len(prefix):]
+    return command_text
+
+def chinese_number(text):
+    """
+    中文數字轉整數，例如 "三十" -> 30、"一百零五" -> 105、"三〇" -> 30
+
+    Raises:
+        ValueError: 含有無法辨識的字元時
+    """
+    if not text:
+        raise ValueError("缺少數字")
+    if not any(ch in _CN_UNITS for ch in text):
+        # 沒有單位時逐位讀：三〇 = 30
+        value = 0
+        for ch in text:
+            if ch not in _CN_DIGITS:
+                raise ValueError(f"無法辨識的數字：{text}")
+            value = value * 10 + _CN_DIGITS[ch]
+        return value
+
+    total = section = 0
+    digit = None
+    for ch in text:
+        if ch in _CN_DIGITS:
+            digit = _CN_DIGITS[ch]
+        elif ch in _CN_UNITS:
+            unit = _CN_UNITS[ch]
+            if unit == 10000:
+                total += (section + (digit or 0)) * unit
+                section = 0
+            else:
+                section += (1 if digit is None else digit) * unit
+            digit = None
+        else:
+            raise ValueError(f"無法辨識的數字：{text}")
+    return total + section + (digit or 0)
+
+def to_number(text):
+    """阿拉伯數字（含全形）或中文數字轉整數"""
+    text = normalize(text)
+    return int(text) if text.isdigit() else chinese_number(text)
+
+class Grammar:
+    """
+    由「關鍵字 + 值」規則組成的單一正規表示式，一次掃描取出所有參數
+
+    每個分支都以關鍵字字面值開頭，re 模組會先以開頭字元集合略過不可能的位置，
+    長訊息也只需掃描一次。
+
+    Args:
+        rules: [(名稱, 關鍵字列表, 值的正規表示式或 None, 轉換函式或 None), ...]；
+               沒有值的規則以命中的關鍵字本身為值，轉換函式接收值的文字
+    """
+
+    def __init__(self, rules):
+        branches = []
+        self._groups = {}
+        for name, keywords, value, convert in rules:
+            for i, keyword in enumerate(keywords):
+                group = f"{name}__{i}"
+                branches.append(f"{re.escape(keyword)}(?P<{group}>{value or ''})")
+                self._groups[group] = (name, keyword if value is None else None, convert)
+        self._pattern = re.compile("|".join(branches))
+
+    def scan(self, text):
+        """
+        掃描參數文字，每個名稱只保留第一次出現的值
+
+        Returns:
+            dict: {名稱: 轉換後的值}
+        """
+        found = {}
+        for match in self._pattern.finditer(text):
+            name, keyword, convert = self._groups[match.lastgroup]
+            if name in found:
+                continue
+            value = keyword if keyword is not None else match.group(match.lastgroup)
+            found[name] = convert(value) if convert else value
+        return found